@@ -36,3 +36,74 @@ def test_MC_step():
     Ts = 1.0  # Set a test temperature
     updated_arr = MC_step(arr, Ts, nmax)
     assert updated_arr.shape == (nmax, nmax), "Updated array shape is incorrect"
+
+def test_hybrid_domain():
+    import LebwohlLasher_hybrid as hybrid
+    nmax = 8
+    dom, ratio, energy, order, runtime = hybrid.run(2, nmax, 0.5, threads=1, seed=0)
+    lattice = dom[1:-1]  # one rank owns the whole lattice
+    assert lattice.shape == (nmax, nmax)
+    # Ghost rows hold the periodic neighbours after a step
+    assert np.array_equal(dom[0], lattice[-1]) and np.array_equal(dom[-1], lattice[0])
+    expected = sum(one_energy(lattice, i, j, nmax) for i in range(nmax) for j in range(nmax))
+    assert energy[-1] == pytest.approx(expected)
+    assert np.all((ratio >= 0.0) & (ratio <= 1.0))
+
+@pytest.mark.parametrize("overlap", [True, False])
+def test_hybrid_overlap_matches_blocking(overlap):
+    import LebwohlLasher_hybrid as hybrid
+    nmax = 8
+    dom, ratio, energy, order, runtime = hybrid.run(3, nmax, 0.5, threads=1, seed=1, overlap=overlap)
+    lattice = dom[1:-1]
+    assert np.array_equal(dom[0], lattice[-1]) and np.array_equal(dom[-1], lattice[0])
+    expected = sum(one_energy(lattice, i, j, nmax) for i in range(nmax) for j in range(nmax))
+    assert energy[-1] == pytest.approx(expected)
+    assert hybrid.comm_stats['exchanges'] == (6 if overlap else 0)
+    assert 0.0 <= hybrid.hidden_fraction(hybrid.exchange_time(dom)) <= 1.0
+
+def test_hybrid_multihit():
+    import LebwohlLasher_hybrid as hybrid
+    nmax = 8
+    dom, ratio, energy, order, runtime = hybrid.run(3, nmax, 0.5, threads=1, seed=2, nhit=3)
+    lattice = dom[1:-1]
+    expected = sum(one_energy(lattice, i, j, nmax) for i in range(nmax) for j in range(nmax))
+    assert energy[-1] == pytest.approx(expected)
+    # Ratio is per proposal
+    assert np.all((ratio >= 0.0) & (ratio <= 1.0))
+
+def test_MC_step_shared_window():
+    import LebwohlLasher_mpi as ll_mpi
+    nmax = 6
+    node_comm, leader_comm, node_index, nnodes = ll_mpi.split_nodes()
+    win, arr = ll_mpi.make_node_lattice(nmax, node_comm)
+    win.Lock_all()
+    start = np.random.random((nmax, nmax)) * 2 * np.pi
+    arr[:] = start
+    ll_mpi.sync_node(win, node_comm)
+    ratio = ll_mpi.MC_step_shared(arr, 0.5, nmax, win, node_comm, leader_comm, node_index, nnodes)
+    assert 0.0 <= ratio <= 1.0
+    # Updated in place in the window: exactly the accepted sites moved
+    assert np.count_nonzero(arr != start) == round(ratio * nmax * nmax)
+    win.Unlock_all()
+    del arr
+    win.Free()
+
+def test_taskfarm_jobs():
+    import ll_taskfarm
+    jobs = ll_taskfarm.make_jobs(10, [10, 40, 20], [0.5, 1.0], 2)
+    assert len(jobs) == 12
+    # Largest lattices go out first
+    assert [job[0] for job in jobs] == [40]*4 + [20]*4 + [10]*4
+    result = ll_taskfarm.run_job(8, 0.5, 3, 4)
+    assert (result['size'], result['temp'], result['seed'], result['steps']) == (8, 0.5, 3, 4)
+    assert 0.25 <= result['order'] <= 1.0
+    assert -4.0 <= result['energy'] <= 0.5
+
+def test_observables_match_serial():
+    from LebwohlLasher import all_energy, get_order
+    from LebwohlLasher_mpi import observables
+    nmax = 6
+    arr = np.random.random((nmax, nmax)) * 2 * np.pi
+    energy, order = observables(arr, 0, nmax, nmax)
+    assert energy == pytest.approx(all_energy(arr, nmax))
+    assert order == pytest.approx(get_order(arr, nmax))
@@ -0,0 +1,239 @@
+"""
+Hybrid MPI + threads version of the Lebwohl-Lasher code.
+
+Each rank owns a band of rows (its domain) plus one ghost row above and
+below, instead of a full copy of the lattice.  Inside the domain the
+sites are swept with a Numba parallel (prange) checkerboard kernel, so a
+rank uses all the cores it is given: launch one rank per node or socket
+and set the thread count with NUMBA_NUM_THREADS (or OMP_NUM_THREADS).
+
+One MC step updates the colour-0 sites ((i+j) even), exchanges the
+boundary rows with the two neighbouring ranks, updates the colour-1
+sites and exchanges again.  A site only interacts with the other
+colour, so the ghost rows are always current when they are read.  Per
+step a rank sends 4 messages of nmax doubles, against a full lattice
+Reduce and bcast per step in LebwohlLasher_mpi.py, and holds
+(nmax/P + 2)*nmax doubles.  Energy and order are reduced with one
+allreduce.  nmax must be even.
+
+With overlap=True (the default) each colour phase updates the two
+boundary rows first, posts Isend/Irecv for them, updates the interior
+rows while the messages are in flight and only then waits.  The
+interior neither writes the rows being sent nor reads the ghost rows
+being received.  The time a rank still spends blocked in
+communication is accumulated in comm_stats, and hidden_fraction()
+compares it with a blocking exchange.
+
+With nhit > 1 each site gets nhit Metropolis proposals in a row.  The
+four neighbour angles are read once per site and the current site
+energy is carried from one proposal to the next, so more moves are
+accepted per load from the lattice.
+
+Run with:
+
+mpiexec -n <ranks> python LebwohlLasher_hybrid.py <ITERATIONS> <SIZE> <TEMPERATURE> <THREADS> [<NHIT>]
+"""
+
+from mpi4py import MPI
+import sys
+import numpy as np
+import numba
+from numba import njit, prange
+
+# Initialize MPI
+comm = MPI.COMM_WORLD
+rank = comm.Get_rank()
+size = comm.Get_size()
+
+def domain_rows(nmax, nranks=size, r=rank):
+    """First global row and number of rows owned by rank r."""
+    base, extra = divmod(nmax, nranks)
+    return r*base + min(r, extra), base + (1 if r < extra else 0)
+
+def initdat(nmax, seed=None):
+    """Random domain of this rank with empty ghost rows, shape (rows+2, nmax)."""
+    row0, nrows = domain_rows(nmax)
+    rng = np.random.default_rng(None if seed is None else [seed, rank])
+    dom = np.zeros((nrows+2, nmax))
+    dom[1:-1] = rng.random((nrows, nmax))*2.0*np.pi
+    return dom
+
+# Exposed (non-hidden) communication time and number of overlapped exchanges
+comm_stats = {'exposed': 0.0, 'exchanges': 0}
+
+def exchange_halos(dom):
+    """Fill the ghost rows from the neighbouring ranks (periodic in rows)."""
+    up = (rank - 1) % size
+    down = (rank + 1) % size
+    comm.Sendrecv(dom[1], dest=up, recvbuf=dom[-1], source=down)
+    comm.Sendrecv(dom[-2], dest=down, recvbuf=dom[0], source=up)
+
+def start_exchange(dom):
+    """Post the non-blocking ghost row exchange; returns the requests."""
+    up = (rank - 1) % size
+    down = (rank + 1) % size
+    return [comm.Irecv(dom[-1], source=down, tag=0),
+            comm.Irecv(dom[0], source=up, tag=1),
+            comm.Isend(dom[1], dest=up, tag=0),
+            comm.Isend(dom[-2], dest=down, tag=1)]
+
+def exchange_time(dom, repeats=10):
+    """Average time of one blocking ghost row exchange."""
+    comm.Barrier()
+    start = MPI.Wtime()
+    for _ in range(repeats):
+        exchange_halos(dom)
+    return (MPI.Wtime() - start)/repeats
+
+def hidden_fraction(t_exchange):
+    """
+    Fraction of the exchange time hidden behind the interior updates on
+    this rank: 1 - (mean time blocked per overlapped exchange)/t_exchange.
+    Time spent waiting for a slower neighbour counts as blocked.
+    """
+    if comm_stats['exchanges'] == 0 or t_exchange <= 0.0:
+        return 0.0
+    exposed = comm_stats['exposed']/comm_stats['exchanges']
+    return min(max(1.0 - exposed/t_exchange, 0.0), 1.0)
+
+@njit(inline='always')
+def site_energy(dom, k, j, nmax):
+    """Energy of interior site (k, j) of a domain, ghost rows included."""
+    th = dom[k, j]
+    en = 0.0
+    for other in (dom[k-1, j], dom[k+1, j], dom[k, (j+1) % nmax], dom[k, (j-1) % nmax]):
+        c = np.cos(th - other)
+        en += 0.5*(1.0 - 3.0*c*c)
+    return en
+
+@njit(inline='always')
+def cached_energy(th, n0, n1, n2, n3):
+    """Energy of a site at angle th with neighbour angles n0..n3."""
+    en = 0.0
+    for other in (n0, n1, n2, n3):
+        c = np.cos(th - other)
+        en += 0.5*(1.0 - 3.0*c*c)
+    return en
+
+@njit(parallel=True)
+def sweep_rows(dom, row0, colour, Ts, k0, k1, nhit=1):
+    """nhit Metropolis attempts on every site of one colour in domain rows k0..k1, in parallel."""
+    nmax = dom.shape[1]
+    scale = 0.1 + Ts
+    accepted = np.zeros(dom.shape[0], dtype=np.int64)
+    for k in prange(k0, k1):
+        for j in range((row0 + k - 1 + colour) % 2, nmax, 2):
+            n0, n1, n2, n3 = dom[k-1, j], dom[k+1, j], dom[k, (j+1) % nmax], dom[k, (j-1) % nmax]
+            th = dom[k, j]
+            en0 = cached_energy(th, n0, n1, n2, n3)
+            for hit in range(nhit):
+                trial = th + np.random.normal(0.0, scale)
+                en1 = cached_energy(trial, n0, n1, n2, n3)
+                if en1 <= en0 or np.exp(-(en1 - en0)/Ts) >= np.random.random():
+                    accepted[k] += 1
+                    th = trial
+                    en0 = en1
+            dom[k, j] = th
+    return accepted.sum()
+
+def sweep_colour(dom, row0, colour, Ts, nhit=1):
+    """nhit Metropolis attempts on every interior site of one colour."""
+    return sweep_rows(dom, row0, colour, Ts, 1, dom.shape[0]-1, nhit)
+
+@njit(parallel=True)
+def domain_sums(dom):
+    """Energy and sums of cos(2 theta), sin(2 theta) over the interior rows."""
+    nrows = dom.shape[0] - 2
+    nmax = dom.shape[1]
+    en = 0.0
+    c2 = 0.0
+    s2 = 0.0
+    for k in prange(1, nrows+1):
+        for j in range(nmax):
+            en += site_energy(dom, k, j, nmax)
+            c2 += np.cos(2.0*dom[k, j])
+            s2 += np.sin(2.0*dom[k, j])
+    return en, c2, s2
+
+def observables(dom, nmax):
+    """Global energy and order parameter, 1/4 + 3/4|<exp(2i theta)>|."""
+    local = np.array(domain_sums(dom))
+    total = np.empty(3)
+    comm.Allreduce(local, total, op=MPI.SUM)
+    return total[0], 0.25 + 0.75*np.hypot(total[1], total[2])/(nmax*nmax)
+
+def MC_step(dom, Ts, nmax, overlap=True, nhit=1):
+    """One checkerboard MC step; ghost rows must be current on entry and are on exit."""
+    row0, nrows = domain_rows(nmax)
+    local = 0
+    for colour in (0, 1):
+        if not overlap:
+            local += sweep_colour(dom, row0, colour, Ts, nhit)
+            exchange_halos(dom)
+            continue
+        # Boundary rows first, so they can be sent while the interior is updated
+        local += sweep_rows(dom, row0, colour, Ts, 1, 2, nhit)
+        if nrows > 1:
+            local += sweep_rows(dom, row0, colour, Ts, nrows, nrows+1, nhit)
+        t0 = MPI.Wtime()
+        requests = start_exchange(dom)
+        t1 = MPI.Wtime()
+        local += sweep_rows(dom, row0, colour, Ts, 2, nrows, nhit)
+        t2 = MPI.Wtime()
+        MPI.Request.Waitall(requests)
+        t3 = MPI.Wtime()
+        comm_stats['exposed'] += (t1 - t0) + (t3 - t2)
+        comm_stats['exchanges'] += 1
+    return comm.allreduce(local, op=MPI.SUM)/(nmax*nmax*nhit)
+
+def run(nsteps, nmax, temp, threads=None, seed=None, overlap=True, nhit=1):
+    """Run on all ranks; returns the domain, per-step ratio (per proposal), energy, order and runtime."""
+    if nmax % 2:
+        raise ValueError(f"checkerboard updates need an even lattice size, got {nmax}")
+    if nmax < size:
+        raise ValueError(f"{size} ranks need at least {size} rows, got {nmax}")
+    if threads is not None:
+        numba.set_num_threads(threads)
+    dom = initdat(nmax, seed)
+    exchange_halos(dom)
+
+    ratio = np.zeros(nsteps+1)
+    energy = np.zeros(nsteps+1)
+    order = np.zeros(nsteps+1)
+    ratio[0] = 0.5
+    energy[0], order[0] = observables(dom, nmax)
+
+    comm_stats['exposed'] = 0.0
+    comm_stats['exchanges'] = 0
+    comm.Barrier()
+    initial = MPI.Wtime()
+    for it in range(1, nsteps+1):
+        ratio[it] = MC_step(dom, temp, nmax, overlap, nhit)
+        energy[it], order[it] = observables(dom, nmax)
+    final = MPI.Wtime()
+    return dom, ratio, energy, order, final - initial
+
+def main(program, nsteps, nmax, temp, threads, nhit=1):
+    """Main simulation function."""
+    # Compile outside the timed region
+    run(1, max(2*size, 4), temp, threads, nhit=nhit)
+    dom, ratio, energy, order, runtime = run(nsteps, nmax, temp, threads, nhit=nhit)
+    hidden = comm.gather(hidden_fraction(exchange_time(dom)), root=0)
+    if rank == 0:
+        print(f"{program}: Size: {nmax}, Steps: {nsteps}, T*: {temp:5.3f}: Order: {order[nsteps-1]:5.3f}, "
+              f"Time: {runtime:8.6f} s, Processes: {size}, Threads: {numba.get_num_threads()}, Hits: {nhit}")
+        for r, fraction in enumerate(hidden):
+            print(f"[Rank {r}] hidden communication: {fraction:6.1%}")
+
+if __name__ == '__main__':
+    if len(sys.argv) in (5, 6):
+        main(sys.argv[0],
+             int(sys.argv[1]),    # iterations
+             int(sys.argv[2]),    # size
+             float(sys.argv[3]),  # temperature
+             int(sys.argv[4]),    # threads per rank
+             int(sys.argv[5]) if len(sys.argv) == 6 else 1)  # proposals per site
+    else:
+        if rank == 0:
+            print(f"Usage: mpiexec -n <processes> python {sys.argv[0]} "
+                  "<ITERATIONS> <SIZE> <TEMPERATURE> <THREADS> [<NHIT>]")
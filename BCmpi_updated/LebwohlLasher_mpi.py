@@ -146,34 +146,202 @@ def MC_step(arr, Ts, nmax):
         ratio = None
     
     debug_print("Broadcasting final results")
-    arr = comm.bcast(arr, root=0)
+    # In place, so every rank's lattice is current for the observables
+    comm.Bcast(arr, root=0)
     ratio = comm.bcast(ratio, root=0)
     
     debug_print("Completed MC_step")
     return ratio
 
-def main(program, nsteps, nmax, temp, pflag):
-    """Main simulation function."""
+def local_sums(arr, r0, r1, nmax):
+    """
+    Energy of the sites in rows r0..r1, bonds to the neighbouring rows
+    included, and their sums of cos(2 theta), sin(2 theta).
+    """
+    block = arr[np.arange(r0-1, r1+1) % nmax]
+    mine = block[1:-1]
+    en = 0.0
+    for other in (block[:-2], block[2:], np.roll(mine, 1, 1), np.roll(mine, -1, 1)):
+        en += np.sum(0.5*(1.0 - 3.0*np.cos(mine - other)**2))
+    return np.array([en, np.cos(2.0*mine).sum(), np.sin(2.0*mine).sum()])
+
+def observables(arr, r0, r1, nmax):
+    """
+    Total energy and order parameter, 1/4 + 3/4|<exp(2i theta)>|, from the
+    partial sums of the rows r0..r1 this rank owns and one Allreduce.
+    """
+    total = np.empty(3)
+    comm.Allreduce(local_sums(arr, r0, r1, nmax), total, op=MPI.SUM)
+    return total[0], 0.25 + 0.75*np.hypot(total[1], total[2])/(nmax*nmax)
+
+def savedat(nsteps, Ts, runtime, ratio, energy, order, nmax):
+    """Write the per-step ratio, energy and order in the serial LebwohlLasher.py format."""
+    current_datetime = datetime.datetime.now().strftime("%a-%d-%b-%Y-at-%I-%M-%S%p")
+    filename = f"LL-Output-{current_datetime}.txt"
+    with open(filename, "w") as FileOut:
+        print("#=====================================================", file=FileOut)
+        print(f"# File created:        {current_datetime}", file=FileOut)
+        print(f"# Size of lattice:     {nmax}x{nmax}", file=FileOut)
+        print(f"# Number of MC steps:  {nsteps}", file=FileOut)
+        print(f"# Reduced temperature: {Ts:5.3f}", file=FileOut)
+        print(f"# Run time (s):        {runtime:8.6f}", file=FileOut)
+        print(f"# MPI processes:       {size}", file=FileOut)
+        print("#=====================================================", file=FileOut)
+        print("# MC step:  Ratio:     Energy:   Order:", file=FileOut)
+        print("#=====================================================", file=FileOut)
+        rows = np.column_stack((np.arange(nsteps+1), ratio, energy, order))
+        np.savetxt(FileOut, rows, fmt="   %05d    %6.4f %12.4f  %6.4f ")
+    return filename
+
+def split_nodes():
+    """
+    Split COMM_WORLD into one communicator per node and a communicator
+    of node leaders (node rank 0; MPI.COMM_NULL on the other ranks).
+    Returns (node_comm, leader_comm, node_index, nnodes).
+    """
+    node_comm = comm.Split_type(MPI.COMM_TYPE_SHARED, key=rank)
+    leader = node_comm.Get_rank() == 0
+    leader_comm = comm.Split(0 if leader else MPI.UNDEFINED, key=rank)
+    if leader:
+        node_index, nnodes = leader_comm.Get_rank(), leader_comm.Get_size()
+    else:
+        node_index, nnodes = None, None
+    node_index, nnodes = node_comm.bcast((node_index, nnodes), root=0)
+    return node_comm, leader_comm, node_index, nnodes
+
+def band(nrows, nparts, part):
+    """First row and number of rows of part `part` when nrows are split nparts ways."""
+    base, extra = divmod(nrows, nparts)
+    return part*base + min(part, extra), base + (1 if part < extra else 0)
+
+def shared_rows(nmax, node_comm, node_index, nnodes):
+    """Rows (r0, r1) of the lattice this rank updates in shared mode."""
+    nr0, nrows = band(nmax, nnodes, node_index)
+    r0, myrows = band(nrows, node_comm.Get_size(), node_comm.Get_rank())
+    return nr0 + r0, nr0 + r0 + myrows
+
+def make_node_lattice(nmax, node_comm):
+    """
+    Allocate one nmax x nmax lattice per node in an MPI shared window.
+    Node rank 0 owns the memory; every rank on the node gets a numpy
+    view of the same buffer.  Returns (win, arr).
+    """
+    itemsize = MPI.DOUBLE.Get_size()
+    nbytes = nmax*nmax*itemsize if node_comm.Get_rank() == 0 else 0
+    win = MPI.Win.Allocate_shared(nbytes, itemsize, comm=node_comm)
+    buf, itemsize = win.Shared_query(0)
+    arr = np.ndarray(buffer=buf, dtype=np.float64, shape=(nmax, nmax))
+    return win, arr
+
+def sync_node(win, node_comm):
+    """Make writes to the shared window visible to every rank on the node."""
+    win.Sync()
+    node_comm.Barrier()
+    win.Sync()
+
+def sweep_band_shared(arr, r0, r1, colour, Ts, nmax):
+    """
+    Metropolis attempt on every site of one colour ((i+j)%2 == colour) in
+    rows r0..r1 of the shared lattice.  Neighbour rows are read straight
+    from the shared buffer, whichever rank owns them; they are the other
+    colour, so nobody writes them during this phase.
+    """
+    rows = np.arange(r0-1, r1+1) % nmax
+    c2 = np.cos(2.0*arr[rows])
+    s2 = np.sin(2.0*arr[rows])
+    # Molecular field: the pair energy is -0.25 - 0.75*cos(2(a-b))
+    C = c2[:-2] + c2[2:] + np.roll(c2[1:-1], 1, 1) + np.roll(c2[1:-1], -1, 1)
+    S = s2[:-2] + s2[2:] + np.roll(s2[1:-1], 1, 1) + np.roll(s2[1:-1], -1, 1)
+    i, j = np.indices((r1-r0, nmax))
+    mask = (i + r0 + j) % 2 == colour
+    theta = arr[r0:r1][mask]
+    trial = theta + np.random.normal(scale=0.1+Ts, size=theta.shape)
+    dE = -0.75*((np.cos(2.0*trial) - np.cos(2.0*theta))*C[mask]
+                + (np.sin(2.0*trial) - np.sin(2.0*theta))*S[mask])
+    accept = (dE <= 0.0) | (np.exp(-np.maximum(dE, 0.0)/Ts) >= np.random.random(theta.shape))
+    arr[r0:r1][mask] = np.where(accept, trial, theta)
+    return int(accept.sum())
+
+def exchange_node_boundaries(arr, nr0, nr1, nmax, leader_comm):
+    """Swap the first and last rows of this node's block with the neighbouring nodes."""
+    nnodes = leader_comm.Get_size()
+    if nnodes == 1:
+        return  # the whole lattice is on this node
+    node = leader_comm.Get_rank()
+    up = (node - 1) % nnodes
+    down = (node + 1) % nnodes
+    below = np.empty(nmax)
+    above = np.empty(nmax)
+    leader_comm.Sendrecv(np.ascontiguousarray(arr[nr0]), dest=up, recvbuf=below, source=down)
+    leader_comm.Sendrecv(np.ascontiguousarray(arr[nr1-1]), dest=down, recvbuf=above, source=up)
+    arr[nr1 % nmax] = below
+    arr[(nr0 - 1) % nmax] = above
+
+def MC_step_shared(arr, Ts, nmax, win, node_comm, leader_comm, node_index, nnodes):
+    """
+    One checkerboard MC step on a node-shared lattice.  Each node owns a
+    block of rows and each rank a band of its node's block.  Ranks update
+    their band in place and only node leaders send messages, one row
+    each way to the neighbouring nodes per colour.
+    """
+    nr0, nrows = band(nmax, nnodes, node_index)
+    r0, r1 = shared_rows(nmax, node_comm, node_index, nnodes)
+    local_accept = 0
+    for colour in (0, 1):
+        local_accept += sweep_band_shared(arr, r0, r1, colour, Ts, nmax)
+        sync_node(win, node_comm)
+        if leader_comm != MPI.COMM_NULL:
+            exchange_node_boundaries(arr, nr0, nr0 + nrows, nmax, leader_comm)
+        sync_node(win, node_comm)
+    return comm.allreduce(local_accept, op=MPI.SUM)/(nmax*nmax)
+
+def main(program, nsteps, nmax, temp, pflag, shared=False):
+    """Main simulation function; shared=True uses one lattice per node in a shared window."""
     debug_print(f"Starting main with nsteps={nsteps}, nmax={nmax}, temp={temp}")
     
     # Initialize lattice
     lattice = initdat(nmax)
+    if shared:
+        if nmax % 2:
+            raise ValueError(f"checkerboard updates need an even lattice size, got {nmax}")
+        node_comm, leader_comm, node_index, nnodes = split_nodes()
+        win, node_lattice = make_node_lattice(nmax, node_comm)
+        win.Lock_all()
+        if node_comm.Get_rank() == 0:
+            node_lattice[:] = lattice
+        del lattice
+        sync_node(win, node_comm)
+        lattice = node_lattice
+        r0, r1 = shared_rows(nmax, node_comm, node_index, nnodes)
+    else:
+        r0, nrows = band(nmax, size, rank)
+        r1 = r0 + nrows
     
     if rank == 0:
         ratio = np.zeros(nsteps+1)
+        energy = np.zeros(nsteps+1)
+        order = np.zeros(nsteps+1)
         ratio[0] = 0.5
     else:
-        ratio = None
+        ratio = energy = order = None
+    step_energy, step_order = observables(lattice, r0, r1, nmax)
+    if rank == 0:
+        energy[0], order[0] = step_energy, step_order
 
     # Time the Monte Carlo steps
     initial = MPI.Wtime()
     
     for it in range(1, nsteps+1):
         debug_print(f"Starting step {it}")
-        ratio_step = MC_step(lattice, temp, nmax)
+        if shared:
+            ratio_step = MC_step_shared(lattice, temp, nmax, win, node_comm, leader_comm, node_index, nnodes)
+        else:
+            ratio_step = MC_step(lattice, temp, nmax)
+        step_energy, step_order = observables(lattice, r0, r1, nmax)
         
         if rank == 0:
             ratio[it] = ratio_step
+            energy[it], order[it] = step_energy, step_order
             if it % 5 == 0:  # Progress update every 5 steps
                 print(f"Completed {it}/{nsteps} steps")
     
@@ -181,17 +349,23 @@ def main(program, nsteps, nmax, temp, pflag):
     runtime = final - initial
     
     if rank == 0:
-        print(f"{program}: Size: {nmax}, Steps: {nsteps}, T*: {temp:5.3f}, "
+        print(f"{program}: Size: {nmax}, Steps: {nsteps}, T*: {temp:5.3f}: Order: {order[nsteps-1]:5.3f}, "
               f"Time: {runtime:8.6f} s, Processes: {size}")
+        savedat(nsteps, temp, runtime, ratio, energy, order, nmax)
+    if shared:
+        del lattice, node_lattice
+        win.Unlock_all()
+        win.Free()
 
 if __name__ == '__main__':
-    if len(sys.argv) == 5:
+    if len(sys.argv) in (5, 6):
         main(sys.argv[0], 
              int(sys.argv[1]),    # iterations
              int(sys.argv[2]),    # size
              float(sys.argv[3]),  # temperature
-             int(sys.argv[4]))    # plot flag
+             int(sys.argv[4]),    # plot flag
+             len(sys.argv) == 6 and sys.argv[5] == 'shared')
     else:
         if rank == 0:
             print(f"Usage: mpiexec -n <processes> python {sys.argv[0]} "
-                  "<ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG>")
+                  "<ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> [shared]")
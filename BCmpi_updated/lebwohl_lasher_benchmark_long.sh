@@ -39,7 +39,7 @@ ls -l *.py
 for NPROCS in 1 2 4 8 16
 do
     echo "Running benchmark with $NPROCS processes"
-    mpiexec -n $NPROCS python ll_benchmark_hpc.py $NPROCS
+    mpiexec -n $NPROCS python ll_benchmark_hpc.py
 done
 
 # Generate plots from all results
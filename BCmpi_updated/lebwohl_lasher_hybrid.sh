@@ -0,0 +1,51 @@
+#!/bin/bash
+# =================
+# lebwohl_lasher_hybrid.sh
+# =================
+# Hybrid MPI + threads benchmark on the same 16 cores as
+# lebwohl_lasher_benchmark.sh: for each point of the ranks x threads grid
+# the ranks are spread evenly over the nodes and each rank gets THREADS
+# cores for its Numba threads.
+
+#SBATCH --job-name=ll_hybrid
+#SBATCH --partition=teach_cpu
+#SBATCH --account=PHYS033185
+#SBATCH --nodes=4
+#SBATCH --ntasks-per-node=4
+#SBATCH --cpus-per-task=1
+#SBATCH --time=0:30:00
+#SBATCH --mem-per-cpu=2G
+
+# Load required modules
+module purge
+module load languages/python/3.12.3
+
+cd $SLURM_SUBMIT_DIR
+
+# Create results directory if it doesn't exist
+mkdir -p benchmark_results
+
+CORES_PER_NODE=$SLURM_NTASKS_PER_NODE
+
+for RANKS_PER_NODE in 1 2 4
+do
+    for THREADS in 1 2 4
+    do
+        if [ $((RANKS_PER_NODE * THREADS)) -gt $CORES_PER_NODE ]; then
+            continue
+        fi
+        RANKS=$((SLURM_NNODES * RANKS_PER_NODE))
+        echo "Running hybrid benchmark with $RANKS ranks x $THREADS threads"
+        # Keep Numba, OpenMP and BLAS threads inside the cores of each rank
+        export NUMBA_NUM_THREADS=$THREADS
+        export OMP_NUM_THREADS=$THREADS
+        export OPENBLAS_NUM_THREADS=1
+        srun --nodes=$SLURM_NNODES --ntasks=$RANKS --ntasks-per-node=$RANKS_PER_NODE \
+             --cpus-per-task=$THREADS --cpu-bind=cores \
+             python ll_benchmark_hybrid.py $THREADS
+        sleep 2  # Short pause between runs
+    done
+done
+
+# Generate plots from results
+python plot_benchmark_results.py
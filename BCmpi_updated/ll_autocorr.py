@@ -0,0 +1,79 @@
+"""
+Autocorrelation analysis of Monte Carlo time series.
+
+Wall time per sweep says nothing about how well an engine samples: a
+sweep that barely moves the lattice is cheap but its samples are
+strongly correlated.  The figure of merit used by the benchmarks is
+the number of effectively independent samples per CPU-second,
+
+    ESS/cpu = n / (2 tau_int) / cpu_seconds,
+
+where tau_int = 1/2 + sum_{t>=1} rho(t) is the integrated
+autocorrelation time (tau_int = 1/2 for uncorrelated samples).  rho is
+computed with an FFT in O(n log n), and the sum is cut off with Sokal's
+automatic window: the smallest M with M >= c*tau_int(M).
+
+This file is identical in numba/, CythonAllFunctionsBetterGraphs/ and
+BCmpi_updated/ so that each benchmark folder runs on its own.
+"""
+
+import numpy as np
+
+#=======================================================================
+def autocorr(x):
+    """
+    Arguments:
+	  x (float(n)) = time series.
+    Description:
+      Normalised autocorrelation function by FFT, zero-padded to avoid
+      wraparound.  A constant series gives rho = (1, 0, 0, ...).
+	Returns:
+	  rho (float(n)) = rho(t) for t = 0..n-1.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    dx = x - x.mean()
+    nfft = 1 << int(2*n - 1).bit_length()
+    f = np.fft.rfft(dx, nfft)
+    acf = np.fft.irfft(f*np.conj(f), nfft)[:n]
+    if acf[0] <= 0.0:
+        rho = np.zeros(n)
+        rho[0] = 1.0
+        return rho
+    return acf/acf[0]
+#=======================================================================
+def integrated_time(x, c=6.0):
+    """
+    Arguments:
+	  x (float(n)) = time series;
+	  c (float) = Sokal window constant, 4 to 10 is usual.
+    Description:
+      Integrated autocorrelation time with the automatic window.  If
+      no window fits, the series is shorter than about c*tau and the
+      full-length estimate returned is a lower bound.
+	Returns:
+	  tau (float) = integrated autocorrelation time in steps.
+    """
+    rho = autocorr(x)
+    taus = np.cumsum(rho) - 0.5
+    window = np.arange(len(rho)) >= c*taus
+    M = np.argmax(window) if window.any() else len(rho) - 1
+    return max(taus[M], 0.5)
+#=======================================================================
+def effective_samples(x, c=6.0):
+    """Number of effectively independent samples, n/(2 tau_int)."""
+    return len(x)/(2.0*integrated_time(x, c))
+#=======================================================================
+def ess_per_cpu(series, cpu_seconds, c=6.0):
+    """
+    Arguments:
+	  series (list) = time series of the observables, e.g. (energy, order);
+	  cpu_seconds (float) = CPU time spent generating them;
+	  c (float) = Sokal window constant.
+    Description:
+      Sampling efficiency of a run, set by its slowest observable.
+	Returns:
+	  rate (float) = effective independent samples per CPU-second.
+    """
+    return min(effective_samples(x, c) for x in series)/cpu_seconds
+#=======================================================================
@@ -1,5 +1,12 @@
 """
-HPC benchmarking script with adaptive iterations for large lattices
+HPC benchmarking script with adaptive iterations for large lattices.
+
+Besides the time per step, each size reports the effective independent
+samples of energy and order per CPU-second (summed over ranks) over the
+second half of the run.  That needs a run several times longer than the
+autocorrelation time, so pass a larger step count for it:
+
+mpiexec -n <processes> python ll_benchmark_hpc.py [<STEPS>]
 """
 
 from mpi4py import MPI
@@ -8,6 +15,7 @@ import json
 import time
 import sys
 from pathlib import Path
+from ll_autocorr import ess_per_cpu
 
 def get_iterations(size):
     """Determine number of iterations based on lattice size"""
@@ -22,7 +30,16 @@ def get_iterations(size):
     else:
         return 3  # Minimum iterations for very large lattices
 
-def run_benchmark(size):
+def observables(arr):
+    """Total energy and order parameter of a lattice, vectorised"""
+    c2 = np.cos(2.0*arr)
+    s2 = np.sin(2.0*arr)
+    C = np.roll(c2, 1, 0) + np.roll(c2, -1, 0) + np.roll(c2, 1, 1) + np.roll(c2, -1, 1)
+    S = np.roll(s2, 1, 0) + np.roll(s2, -1, 0) + np.roll(s2, 1, 1) + np.roll(s2, -1, 1)
+    energy = np.sum(-1.0 - 0.75*(c2*C + s2*S))
+    return energy, 0.25 + 0.75*np.hypot(c2.mean(), s2.mean())
+
+def run_benchmark(size, iterations=None):
     """Run benchmark with iterations adapted to size"""
     from LebwohlLasher_mpi import initdat, MC_step
     
@@ -30,7 +47,8 @@ def run_benchmark(size):
     rank = comm.Get_rank()
     nprocs = comm.Get_size()
     
-    iterations = get_iterations(size)
+    if iterations is None:
+        iterations = get_iterations(size)
     
     if rank == 0:
         print(f"Testing {size}x{size} with {iterations} iterations on {nprocs} processes")
@@ -38,15 +56,28 @@ def run_benchmark(size):
     # Initialize lattice
     lattice = initdat(size)
     
+    # Observables are measured on rank 0 (which holds the updated
+    # lattice) outside the CPU timer
+    half = iterations//2
+    energy = np.zeros(iterations - half)
+    order = np.zeros(iterations - half)
+    cpu = 0.0
+    
     start_time = MPI.Wtime()
     
-    for _ in range(iterations):
+    for it in range(iterations):
+        cpu_start = time.process_time()
         MC_step(lattice, 0.5, size)
+        if it >= half:
+            cpu += time.process_time() - cpu_start
+            if rank == 0:
+                energy[it - half], order[it - half] = observables(lattice)
     
     end_time = MPI.Wtime()
     runtime = end_time - start_time
     
     all_runtimes = comm.gather(runtime, root=0)
+    total_cpu = comm.reduce(cpu, op=MPI.SUM, root=0)
     
     if rank == 0:
         avg_runtime = np.mean(all_runtimes)
@@ -55,7 +86,8 @@ def run_benchmark(size):
             'processes': nprocs,
             'iterations': iterations,
             'total_time': avg_runtime,
-            'time_per_step': avg_runtime / iterations
+            'time_per_step': avg_runtime / iterations,
+            'ess_per_cpu_s': ess_per_cpu((energy, order), total_cpu)
         }
     return None
 
@@ -67,18 +99,20 @@ def main():
     
     # Test a wide range of sizes
     lattice_sizes = [50, 100, 200, 500, 1000, 2000]
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else None
     
     results_file = f'benchmark_results/results_p{nprocs:02d}.json'
     results = []
     
     for lattice_size in lattice_sizes:
         try:
-            result = run_benchmark(lattice_size)
+            result = run_benchmark(lattice_size, iterations)
             if rank == 0 and result is not None:
                 results.append(result)
                 print(f"\nCompleted {lattice_size}x{lattice_size}:")
                 print(f"Total time: {result['total_time']:.3f} seconds")
                 print(f"Time per step: {result['time_per_step']:.3f} seconds")
+                print(f"Samples per CPU-second: {result['ess_per_cpu_s']:.3f}")
                 
                 # Early warning if times are getting too long
                 if result['time_per_step'] > 60:  # More than 1 minute per step
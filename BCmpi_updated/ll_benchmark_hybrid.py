@@ -0,0 +1,80 @@
+"""
+HPC benchmarking script for the hybrid MPI + threads engine.
+
+Run once per point of the ranks x threads grid (see
+lebwohl_lasher_hybrid.sh); each run writes
+benchmark_results/results_hybrid_p<RANKS>_t<THREADS>.json with the time
+per step, the lattice memory per rank and the messages per step.
+
+mpiexec -n <ranks> python ll_benchmark_hybrid.py <THREADS> [<STEPS>]
+"""
+
+from mpi4py import MPI
+import numpy as np
+import json
+import sys
+from ll_benchmark_hpc import get_iterations
+
+def run_benchmark(size, threads, iterations=None):
+    """Run the hybrid engine on a size x size lattice"""
+    import LebwohlLasher_hybrid as hybrid
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    nprocs = comm.Get_size()
+
+    if iterations is None:
+        iterations = get_iterations(size)
+    if rank == 0:
+        print(f"Testing {size}x{size} with {iterations} iterations on {nprocs} processes x {threads} threads")
+
+    dom, ratio, energy, order, runtime = hybrid.run(iterations, size, 0.5, threads)
+    all_runtimes = comm.gather(runtime, root=0)
+    hidden = comm.gather(hybrid.hidden_fraction(hybrid.exchange_time(dom)), root=0)
+    # Largest domain, ghost rows included
+    domain_bytes = comm.reduce(dom.nbytes, op=MPI.MAX, root=0)
+    if rank == 0:
+        avg_runtime = np.mean(all_runtimes)
+        return {
+            'size': size,
+            'processes': nprocs,
+            'threads': threads,
+            'iterations': iterations,
+            'total_time': avg_runtime,
+            'time_per_step': avg_runtime / iterations,
+            'lattice_mb_per_rank': domain_bytes / 2**20,
+            # 2 halo exchanges of 2 Sendrecv each, plus 2 allreduces
+            'messages_per_step': 4*nprocs + 2,
+            'hidden_comm_fraction': hidden
+        }
+    return None
+
+def main():
+    """Run the hybrid benchmark for one ranks x threads point"""
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    nprocs = comm.Get_size()
+
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    lattice_sizes = [50, 100, 200, 500, 1000, 2000]
+
+    results_file = f'benchmark_results/results_hybrid_p{nprocs:02d}_t{threads:02d}.json'
+    results = []
+
+    # Compile the kernels outside the timed runs
+    run_benchmark(2*max(nprocs, 2), threads, 1)
+
+    for lattice_size in lattice_sizes:
+        result = run_benchmark(lattice_size, threads, iterations)
+        if rank == 0:
+            results.append(result)
+            print(f"Time per step: {result['time_per_step']:.4f} seconds")
+            with open(results_file, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    if rank == 0:
+        print(f"\nBenchmark completed. Results saved to {results_file}")
+
+if __name__ == "__main__":
+    main()
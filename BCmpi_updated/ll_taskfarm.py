@@ -0,0 +1,151 @@
+"""
+MPI task farm for ensembles of independent Lebwohl-Lasher runs.
+
+Production work is mostly many small lattices (size x temperature x
+seed), and decomposing one small lattice over many ranks wastes them
+(see benchmark_results/scaling_analysis.txt).  Here every job runs on a
+single rank instead.  Rank 0 hands out jobs on demand: a worker asks for
+work, runs the job with the serial Numba checkerboard kernels from
+LebwohlLasher_hybrid.py on one thread, sends the result back and asks
+again.  Jobs go out largest first (nsteps*N^2), so the long ones do not
+end up running alone at the end.  Rank 0 writes each result to one
+output file as soon as it arrives.
+
+Run with:
+
+mpiexec -n <processes> python ll_taskfarm.py <ITERATIONS> <SIZES> <TEMPERATURES> <SEEDS>
+
+where SIZES and TEMPERATURES are comma-separated lists (e.g. 20,50,100
+and 0.2,0.6,1.0) and SEEDS is the number of seeds per (size, T) pair.
+"""
+
+from mpi4py import MPI
+import sys
+import time
+import datetime
+import numpy as np
+import numba
+from numba import njit
+from LebwohlLasher_hybrid import sweep_rows, domain_sums
+
+comm = MPI.COMM_WORLD
+rank = comm.Get_rank()
+size = comm.Get_size()
+
+# Message tags
+READY, JOB, RESULT, STOP = range(4)
+
+@njit
+def seed_numba(s):
+    """Seed Numba's random number generator."""
+    np.random.seed(s)
+
+def make_jobs(nsteps, sizes, temps, nseeds):
+    """All (nmax, temp, seed, nsteps) jobs, largest first."""
+    jobs = [(nmax, temp, seed, nsteps) for nmax in sizes for temp in temps for seed in range(nseeds)]
+    return sorted(jobs, key=lambda job: job[3]*job[0]**2, reverse=True)
+
+def run_job(nmax, temp, seed, nsteps):
+    """
+    One serial run from a random start.  Returns a dict with the mean
+    energy per site and order over the second half of the run, the final
+    order and the run time.
+    """
+    if nmax % 2:
+        raise ValueError(f"checkerboard updates need an even lattice size, got {nmax}")
+    rng = np.random.default_rng(seed)
+    seed_numba(seed)
+    dom = np.zeros((nmax+2, nmax))
+    dom[1:-1] = rng.random((nmax, nmax))*2.0*np.pi
+    dom[0], dom[-1] = dom[-2], dom[1]
+    energy = np.zeros(nsteps+1)
+    order = np.zeros(nsteps+1)
+    accept = 0
+
+    initial = time.time()
+    for it in range(nsteps+1):
+        if it > 0:
+            for colour in (0, 1):
+                accept += sweep_rows(dom, 0, colour, temp, 1, nmax+1)
+                # Periodic ghost rows of a single domain
+                dom[0], dom[-1] = dom[-2], dom[1]
+        en, c2, s2 = domain_sums(dom)
+        energy[it] = en/(nmax*nmax)
+        order[it] = 0.25 + 0.75*np.hypot(c2, s2)/(nmax*nmax)
+    runtime = time.time() - initial
+
+    half = nsteps//2 + 1
+    return {'size': nmax, 'temp': temp, 'seed': seed, 'steps': nsteps,
+            'ratio': accept/(nsteps*nmax*nmax) if nsteps else 0.5,
+            'energy': energy[half:].mean(), 'order': order[half:].mean(),
+            'final_order': order[-1], 'time': runtime, 'rank': rank}
+
+def write_result(FileOut, r):
+    """One line of output per job."""
+    print(f"  {r['size']:6d} {r['temp']:6.3f} {r['seed']:6d} {r['steps']:7d} {r['ratio']:6.4f} "
+          f"{r['energy']:10.5f} {r['order']:7.4f} {r['final_order']:7.4f} {r['time']:10.4f} {r['rank']:5d}",
+          file=FileOut, flush=True)
+
+def master(jobs, filename):
+    """Rank 0: hand out jobs on request and stream the results to filename."""
+    with open(filename, "w") as FileOut:
+        print("#=====================================================", file=FileOut)
+        print(f"# Task farm: {len(jobs)} jobs, {size} processes", file=FileOut)
+        print("#=====================================================", file=FileOut)
+        print("#   Size:     T:  Seed:  Steps: Ratio: Energy/site:  Order:  Final:  Time (s): Rank:", file=FileOut)
+        print("#=====================================================", file=FileOut)
+        if size == 1:
+            run_job(2, 1.0, 0, 1)
+            for job in jobs:
+                write_result(FileOut, run_job(*job))
+            return
+        pending = list(jobs)
+        active = size - 1
+        status = MPI.Status()
+        while active:
+            msg = comm.recv(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status)
+            if status.Get_tag() == RESULT:
+                write_result(FileOut, msg)
+            if pending:
+                comm.send(pending.pop(0), dest=status.Get_source(), tag=JOB)
+            else:
+                comm.send(None, dest=status.Get_source(), tag=STOP)
+                active -= 1
+
+def worker():
+    """Ranks > 0: ask for a job, run it, return the result, repeat."""
+    numba.set_num_threads(1)
+    # Compile the kernels before asking for work
+    run_job(2, 1.0, 0, 1)
+    status = MPI.Status()
+    comm.send(None, dest=0, tag=READY)
+    while True:
+        job = comm.recv(source=0, tag=MPI.ANY_TAG, status=status)
+        if status.Get_tag() == STOP:
+            break
+        comm.send(run_job(*job), dest=0, tag=RESULT)
+
+def main(program, nsteps, sizes, temps, nseeds):
+    """Run the ensemble as a task farm."""
+    jobs = make_jobs(nsteps, sizes, temps, nseeds)
+    initial = MPI.Wtime()
+    if rank == 0:
+        current_datetime = datetime.datetime.now().strftime("%a-%d-%b-%Y-at-%I-%M-%S%p")
+        filename = f"LL-Farm-{current_datetime}.txt"
+        master(jobs, filename)
+        print(f"{program}: Jobs: {len(jobs)}, Steps: {nsteps}, Time: {MPI.Wtime()-initial:8.6f} s, "
+              f"Processes: {size}, Output: {filename}")
+    else:
+        worker()
+
+if __name__ == '__main__':
+    if len(sys.argv) == 5:
+        main(sys.argv[0],
+             int(sys.argv[1]),                              # iterations
+             [int(n) for n in sys.argv[2].split(',')],      # sizes
+             [float(t) for t in sys.argv[3].split(',')],    # temperatures
+             int(sys.argv[4]))                              # seeds per (size, T)
+    else:
+        if rank == 0:
+            print(f"Usage: mpiexec -n <processes> python {sys.argv[0]} "
+                  "<ITERATIONS> <SIZES> <TEMPERATURES> <SEEDS>")
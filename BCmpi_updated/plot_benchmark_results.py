@@ -142,16 +142,68 @@ def create_plots(results):
                                f"({efficiency:6.1%} efficiency)\n")
             f.write("\n")
 
+def load_hybrid_results():
+    """Load results_hybrid_p*_t*.json files written by ll_benchmark_hybrid.py"""
+    results = []
+    for result_file in sorted(Path('benchmark_results').glob('results_hybrid_p*_t*.json')):
+        try:
+            with open(result_file, 'r') as f:
+                results.extend(json.load(f))
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Error reading {result_file}: {e}")
+    return results
+
+def create_hybrid_plots(results):
+    """Time per step over the ranks x threads grid for each lattice size"""
+    ranks = sorted(set(r['processes'] for r in results))
+    threads = sorted(set(r['threads'] for r in results))
+    sizes = sorted(set(r['size'] for r in results))
+
+    with open('benchmark_results/hybrid_grid_analysis.txt', 'w') as f:
+        f.write("Lebwohl-Lasher Hybrid Ranks x Threads Analysis\n")
+        f.write("==============================================\n")
+        for size in sizes:
+            f.write(f"\nLattice Size {size}x{size}, time per step (s):\n")
+            f.write(f"{'Ranks':>6} " + " ".join(f"{t:>10d}T" for t in threads) + "\n")
+            for p in ranks:
+                row = []
+                for t in threads:
+                    match = [r for r in results if r['size'] == size and r['processes'] == p and r['threads'] == t]
+                    row.append(f"{match[0]['time_per_step']:11.4f}" if match else f"{'-':>11}")
+                f.write(f"{p:6d} " + " ".join(row) + "\n")
+
+    # Heat map for the largest lattice
+    size = sizes[-1]
+    grid = np.full((len(ranks), len(threads)), np.nan)
+    for r in results:
+        if r['size'] == size:
+            grid[ranks.index(r['processes']), threads.index(r['threads'])] = r['time_per_step']
+    plt.figure(figsize=(6, 5))
+    plt.imshow(grid, origin='lower', cmap='viridis_r')
+    plt.colorbar(label='Time per step (s)')
+    plt.xticks(range(len(threads)), threads)
+    plt.yticks(range(len(ranks)), ranks)
+    plt.xlabel('Threads per rank')
+    plt.ylabel('MPI ranks')
+    plt.title(f'Hybrid engine, {size}x{size} lattice')
+    plt.tight_layout()
+    plt.savefig('benchmark_results/hybrid_grid.png', dpi=300, bbox_inches='tight')
+    plt.close()
+
 def main():
     """Main function to create all plots and analysis"""
     print("Starting benchmark analysis...")
     
     results = load_all_results()
-    if not results:
+    hybrid = load_hybrid_results()
+    if not results and not hybrid:
         print("Error: No valid results found to analyze!")
         sys.exit(1)
     
-    create_plots(results)
+    if results:
+        create_plots(results)
+    if hybrid:
+        create_hybrid_plots(hybrid)
     print("\nAnalysis complete. Check benchmark_results/ directory for outputs.")
 
 if __name__ == "__main__":
@@ -6,110 +6,137 @@
 
 import numpy as np
 cimport numpy as np
-from libc.math cimport cos, sin, exp
+from libc.math cimport cos, sin, exp, log, acos, atan2, sqrt, cosf, sinf, M_PI
 from libc.stdlib cimport rand as c_rand
+from libc.stdlib cimport srand
 from libc.stdlib cimport RAND_MAX
 
 # Define C types for better performance
 ctypedef np.float64_t DTYPE_t
 
+# Every kernel accepts float32 or float64 lattices.  Sums over the
+# lattice are compensated (Kahan) so float32 totals stay accurate.
+ctypedef fused real:
+    float
+    double
+
 cdef double random_uniform() nogil:
-    return c_rand() / RAND_MAX
+    # Cast first: with cdivision, int/int would truncate to 0
+    return <double>c_rand() / RAND_MAX
+
+cdef inline real cos_r(real x) noexcept nogil:
+    if real is float:
+        return cosf(x)
+    else:
+        return cos(x)
+
+cdef inline real sin_r(real x) noexcept nogil:
+    if real is float:
+        return sinf(x)
+    else:
+        return sin(x)
+
+cdef inline void kahan_add(real* total, real* comp, real x) noexcept nogil:
+    cdef real y = x - comp[0]
+    cdef real t = total[0] + y
+    comp[0] = (t - total[0]) - y
+    total[0] = t
 
 def initdat(int nmax):
     """Initialize the lattice with random orientations"""
     return np.random.random_sample((nmax,nmax))*2.0*np.pi
 
-def one_energy(double[:, ::1] arr, int ix, int iy, int nmax):
-    """Optimized energy calculation for a single lattice site"""
+cdef inline real site_energy(real[:, ::1] arr, int ix, int iy, int nmax) noexcept nogil:
     cdef:
-        double en = 0.0
+        real en = 0.0
+        real half = 0.5, one = 1.0, three = 3.0
         int ixp = (ix + 1) % nmax
-        int ixm = (ix - 1) % nmax
+        int ixm = (ix - 1 + nmax) % nmax
         int iyp = (iy + 1) % nmax
-        int iym = (iy - 1) % nmax
-        double ang
-
-    ang = arr[ix, iy] - arr[ixp, iy]
-    en += 0.5 * (1.0 - 3.0 * cos(ang) * cos(ang))
-    
-    ang = arr[ix, iy] - arr[ixm, iy]
-    en += 0.5 * (1.0 - 3.0 * cos(ang) * cos(ang))
-    
-    ang = arr[ix, iy] - arr[ix, iyp]
-    en += 0.5 * (1.0 - 3.0 * cos(ang) * cos(ang))
-    
-    ang = arr[ix, iy] - arr[ix, iym]
-    en += 0.5 * (1.0 - 3.0 * cos(ang) * cos(ang))
-    
+        int iym = (iy - 1 + nmax) % nmax
+        real c
+
+    c = cos_r(arr[ix, iy] - arr[ixp, iy])
+    en += half * (one - three * c * c)
+
+    c = cos_r(arr[ix, iy] - arr[ixm, iy])
+    en += half * (one - three * c * c)
+
+    c = cos_r(arr[ix, iy] - arr[ix, iyp])
+    en += half * (one - three * c * c)
+
+    c = cos_r(arr[ix, iy] - arr[ix, iym])
+    en += half * (one - three * c * c)
+
     return en
 
-def all_energy(double[:, ::1] arr, int nmax):
+def one_energy(real[:, ::1] arr, int ix, int iy, int nmax):
+    """Optimized energy calculation for a single lattice site"""
+    return site_energy(arr, ix, iy, nmax)
+
+def all_energy(real[:, ::1] arr, int nmax):
     """Calculate total energy of the lattice"""
     cdef:
-        double enall = 0.0
+        double enall = 0.0, encomp = 0.0
+        real row, rowcomp
         int i, j
-    
+
     for i in range(nmax):
+        row = 0.0
+        rowcomp = 0.0
         for j in range(nmax):
-            enall += one_energy(arr, i, j, nmax)
+            kahan_add(&row, &rowcomp, site_energy(arr, i, j, nmax))
+        kahan_add(&enall, &encomp, <double>row)
     return enall
 
-def get_order(double[:, ::1] arr, int nmax):
+def get_order(real[:, ::1] arr, int nmax):
     """Calculate order parameter"""
     cdef:
-        int a, b, i, j
-        double[:, ::1] Qab = np.zeros((3,3))
-        double[:, ::1] delta = np.eye(3)
-        
-    # Create unit vectors
-    cdef double[:, :, ::1] lab = np.zeros((3, nmax, nmax))
+        int i, j
+        real c, s
+        real sxx = 0.0, sxy = 0.0, syy = 0.0
+        real cxx = 0.0, cxy = 0.0, cyy = 0.0
+        double n = <double>nmax * nmax
+
+    # Sums of l_a*l_b over the unit vectors (cos, sin, 0)
     for i in range(nmax):
         for j in range(nmax):
-            lab[0,i,j] = cos(arr[i,j])
-            lab[1,i,j] = sin(arr[i,j])
-            
-    # Calculate Q tensor
-    for a in range(3):
-        for b in range(3):
-            for i in range(nmax):
-                for j in range(nmax):
-                    Qab[a,b] += 3.0 * lab[a,i,j] * lab[b,i,j] - delta[a,b]
-    
-    # Normalize
-    cdef double norm_factor = 2.0 * nmax * nmax
-    for a in range(3):
-        for b in range(3):
-            Qab[a,b] = Qab[a,b] / norm_factor
-            
-    # Convert to numpy array for eigenvalue calculation
-    eigenvalues = np.linalg.eigvals(np.asarray(Qab))
-    return np.max(eigenvalues.real)
+            c = cos_r(arr[i,j])
+            s = sin_r(arr[i,j])
+            kahan_add(&sxx, &cxx, c*c)
+            kahan_add(&sxy, &cxy, c*s)
+            kahan_add(&syy, &cyy, s*s)
 
-# ... [previous imports and other functions remain the same until MC_step] ...
+    # Q_ab = sum(3 l_a l_b - delta_ab) / (2 nmax^2)
+    Qab = np.array([[3.0*sxx - n, 3.0*sxy, 0.0],
+                    [3.0*sxy, 3.0*syy - n, 0.0],
+                    [0.0, 0.0, -n]]) / (2.0*n)
+    eigenvalues = np.linalg.eigvals(Qab)
+    return np.max(eigenvalues.real)
 
-def MC_step(double[:, ::1] arr, double Ts, int nmax):
+def MC_step(real[:, ::1] arr, double Ts, int nmax):
     """Perform one Monte Carlo step"""
     cdef:
         int i, j, ix, iy, accept = 0
-        double en0, en1, ang, boltz
+        real en0, en1, ang
+        double boltz
         double scale = 0.1 + Ts
-        
+
     # Pre-compute random numbers - note the conversion to double
     cdef double[:, ::1] xran = np.random.randint(0, high=nmax, size=(nmax, nmax)).astype(np.float64)
     cdef double[:, ::1] yran = np.random.randint(0, high=nmax, size=(nmax, nmax)).astype(np.float64)
     cdef double[:, ::1] aran = np.random.normal(scale=scale, size=(nmax, nmax))
-    
+
     for i in range(nmax):
         for j in range(nmax):
             ix = int(xran[i,j])
             iy = int(yran[i,j])
-            ang = aran[i,j]
-            
-            en0 = one_energy(arr, ix, iy, nmax)
+            ang = <real>aran[i,j]
+
+            en0 = site_energy(arr, ix, iy, nmax)
             arr[ix,iy] += ang
-            en1 = one_energy(arr, ix, iy, nmax)
-            
+            en1 = site_energy(arr, ix, iy, nmax)
+
             if en1 <= en0:
                 accept += 1
             else:
@@ -118,28 +145,102 @@ def MC_step(double[:, ::1] arr, double Ts, int nmax):
                     accept += 1
                 else:
                     arr[ix,iy] -= ang
-                    
-    return accept / (nmax * nmax)
 
-def main(str program, int nsteps, int nmax, double temp, int pflag):
-    """Main simulation function"""
+    return accept / <double>(nmax * nmax)
+
+cdef double vonmises(double mu, double kappa) noexcept nogil:
+    """Von Mises angle about mu, Best-Fisher rejection sampler"""
+    cdef double tau, rho, r, z, f, c, u2
+    if kappa < 1e-8:
+        return M_PI*(2.0*random_uniform() - 1.0)
+    tau = 1.0 + sqrt(1.0 + 4.0*kappa*kappa)
+    rho = (tau - sqrt(2.0*tau))/(2.0*kappa)
+    r = (1.0 + rho*rho)/(2.0*rho)
+    while True:
+        z = cos(M_PI*random_uniform())
+        f = (1.0 + r*z)/(r + z)
+        c = kappa*(r - f)
+        u2 = random_uniform()
+        if c*(2.0 - c) > u2 or log(c/u2) + 1.0 >= c:
+            break
+    if random_uniform() < 0.5:
+        return mu - acos(f)
+    return mu + acos(f)
+
+def heatbath_step(real[:, ::1] arr, double Ts, int nmax):
+    """
+    Heat-bath sweep: 2 theta of every site is drawn from its von Mises
+    local distribution about atan2(S, C) with concentration
+    0.75*sqrt(C^2 + S^2)/Ts, C and S the neighbour sums of cos(2 theta)
+    and sin(2 theta).  Nothing is rejected, the ratio is 1.
+    """
+    cdef:
+        int ix, iy, jx, jy, k
+        double C, S, phi
+        int[4] dx = [1, -1, 0, 0]
+        int[4] dy = [0, 0, 1, -1]
+
+    for ix in range(nmax):
+        for iy in range(nmax):
+            C = 0.0
+            S = 0.0
+            for k in range(4):
+                jx = (ix + dx[k] + nmax) % nmax
+                jy = (iy + dy[k] + nmax) % nmax
+                phi = 2.0*arr[jx, jy]
+                C += cos(phi)
+                S += sin(phi)
+            arr[ix, iy] = <real>(0.5*vonmises(atan2(S, C), 0.75*sqrt(C*C + S*S)/Ts))
+    return 1.0
+
+def main(str program, int nsteps, int nmax, double temp, int pflag, dtype=np.float64, update='metropolis'):
+    """
+    Main simulation function, dtype selects a float64 or float32 lattice
+    and update 'metropolis' or 'heatbath'
+    """
+    steps = {'metropolis': MC_step, 'heatbath': heatbath_step}
+    if update not in steps:
+        raise ValueError("unknown update {!r}, use 'metropolis' or 'heatbath'".format(update))
+    step = steps[update]
     # Initialize arrays
     cdef:
-        double[:, ::1] lattice = initdat(nmax)
         double[:] energy = np.zeros(nsteps+1)
         double[:] ratio = np.zeros(nsteps+1)
         double[:] order = np.zeros(nsteps+1)
         int it
-        
+    lattice = np.ascontiguousarray(initdat(nmax), dtype=dtype)
+
     # Initial values
     energy[0] = all_energy(lattice, nmax)
     ratio[0] = 0.5
     order[0] = get_order(lattice, nmax)
-    
+
     # Main loop
     for it in range(1, nsteps+1):
-        ratio[it] = MC_step(lattice, temp, nmax)
+        ratio[it] = step(lattice, temp, nmax)
         energy[it] = all_energy(lattice, nmax)
         order[it] = get_order(lattice, nmax)
-        
-    return np.asarray(lattice), np.asarray(energy), np.asarray(ratio), np.asarray(order)
\ No newline at end of file
+
+    return np.asarray(lattice), np.asarray(energy), np.asarray(ratio), np.asarray(order)
+
+def validate(int nsteps, int nmax, double temp, unsigned int seed=0):
+    """
+    Run the float64 and float32 engines from the same seed and compare.
+    Step 0 is the same lattice, so its differences are the precision
+    error alone; later steps drift apart as accept decisions diverge,
+    so compare the run averages there.
+    """
+    runs = {}
+    for dtype in (np.float64, np.float32):
+        np.random.seed(seed)
+        srand(seed)
+        runs[dtype] = main("validate", nsteps, nmax, temp, 0, dtype)
+    lat64, en64, ratio64, ord64 = runs[np.float64]
+    lat32, en32, ratio32, ord32 = runs[np.float32]
+    return {
+        'energy0_rel': abs(en32[0] - en64[0]) / abs(en64[0]),
+        'order0_abs': abs(ord32[0] - ord64[0]),
+        'energy_mean_rel': abs(en32.mean() - en64.mean()) / abs(en64.mean()),
+        'order_mean_abs': abs(ord32.mean() - ord64.mean()),
+        'ratio_mean_abs': abs(ratio32.mean() - ratio64.mean()),
+    }
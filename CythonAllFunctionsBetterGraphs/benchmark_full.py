@@ -3,8 +3,11 @@ import numpy as np
 import time
 import matplotlib.pyplot as plt
 from tabulate import tabulate  # You might need to install this: pip install tabulate
+import LebwohlLasher as ll_py
+import LebwohlLasher_full as ll_cy
 from LebwohlLasher import one_energy as one_energy_py, MC_step as MC_step_py, get_order as get_order_py
 from LebwohlLasher_full import one_energy as one_energy_cy, MC_step as MC_step_cy, get_order as get_order_cy
+from ll_autocorr import ess_per_cpu
 
 def benchmark_all_functions(nmax, n_tests=100):
     # Create test array
@@ -58,9 +61,33 @@ def benchmark_all_functions(nmax, n_tests=100):
     cy_order_time = time.time() - start
     
     results['order'] = (py_order_time, cy_order_time)
+
+    # Sampling efficiency of a short run with each engine
+    print("Testing sampling efficiency...")
+    results['ess'] = (sampling_efficiency(ll_py, nmax, n_tests, Ts),
+                      sampling_efficiency(ll_cy, nmax, n_tests, Ts))
     
     return results
 
+def sampling_efficiency(module, nmax, nsteps, Ts):
+    """
+    Effective independent samples of energy and order per CPU-second of
+    MC_step, over the second half of an nsteps run from a random start.
+    """
+    arr = module.initdat(nmax)
+    half = nsteps//2
+    energy = np.zeros(nsteps - half)
+    order = np.zeros(nsteps - half)
+    cpu = 0.0
+    for it in range(nsteps):
+        start = time.process_time()
+        module.MC_step(arr, Ts, nmax)
+        if it >= half:
+            cpu += time.process_time() - start
+            energy[it - half] = module.all_energy(arr, nmax)
+            order[it - half] = module.get_order(arr, nmax)
+    return ess_per_cpu((energy, order), cpu)
+
 def create_results_table(sizes, results):
     table_data = []
     headers = ["Lattice Size", "Function", "Python (s)", "Cython (s)", "Speedup"]
@@ -83,6 +110,20 @@ def create_results_table(sizes, results):
             ])
     
     table = tabulate(table_data, headers=headers, tablefmt="grid")
+
+    # ESS/cpu-s is a rate, so higher is better and the gain is Cython/Python
+    ess_data = []
+    ess_headers = ["Lattice Size", "Python (ESS/cpu-s)", "Cython (ESS/cpu-s)", "Gain"]
+    for size in sizes:
+        py_rate, cy_rate = results[size]['ess']
+        ess_data.append([
+            f"{size}×{size}",
+            f"{py_rate:.3f}",
+            f"{cy_rate:.3f}",
+            f"{cy_rate / py_rate:.1f}×"
+        ])
+    table += "\n\nEffective independent samples per CPU-second of MC_step:\n"
+    table += tabulate(ess_data, headers=ess_headers, tablefmt="grid")
     
     # Save table to file
     with open('performance_results.txt', 'w') as f:
@@ -91,18 +132,22 @@ def create_results_table(sizes, results):
     return table
 
 def plot_results(sizes, results):
-    functions = ['Energy Calculation', 'Monte Carlo Step', 'Order Parameter']
-    fig, axes = plt.subplots(1, 3, figsize=(15, 5))
-    
-    for idx, func in enumerate(['energy', 'mc', 'order']):
-        py_times = [results[size][func][0] for size in sizes]
-        cy_times = [results[size][func][1] for size in sizes]
-        speedup = [py/cy for py, cy in zip(py_times, cy_times)]
+    functions = ['Energy Calculation', 'Monte Carlo Step', 'Order Parameter', 'Sampling Efficiency']
+    fig, axes = plt.subplots(1, 4, figsize=(20, 5))
+    
+    for idx, func in enumerate(['energy', 'mc', 'order', 'ess']):
+        py_values = [results[size][func][0] for size in sizes]
+        cy_values = [results[size][func][1] for size in sizes]
+        if func == 'ess':
+            speedup = [cy/py for py, cy in zip(py_values, cy_values)]
+            axes[idx].set_ylabel('Effective samples per CPU-s')
+        else:
+            speedup = [py/cy for py, cy in zip(py_values, cy_values)]
+            axes[idx].set_ylabel('Time (s)')
         
-        axes[idx].plot(sizes, py_times, 'o-', label='Python')
-        axes[idx].plot(sizes, cy_times, 'o-', label='Cython')
+        axes[idx].plot(sizes, py_values, 'o-', label='Python')
+        axes[idx].plot(sizes, cy_values, 'o-', label='Cython')
         axes[idx].set_xlabel('Lattice Size')
-        axes[idx].set_ylabel('Time (s)')
         axes[idx].set_title(f'{functions[idx]}\nSpeedup: {np.mean(speedup):.1f}x')
         axes[idx].legend()
         axes[idx].set_xscale('log')
@@ -5,7 +5,7 @@ This version in 2D.
 
 Run at the command line by typing:
 
-python LebwohlLasher.py <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG>
+python LebwohlLasher.py <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> [<CLUSTERS>]
 
 where:
   ITERATIONS = number of Monte Carlo steps, where 1MCS is when each cell
@@ -13,6 +13,8 @@ where:
   SIZE = side length of square lattice
   TEMPERATURE = reduced temperature in range 0.0 - 2.0.
   PLOTFLAG = 0 for no plot, 1 for energy plot and 2 for angle plot.
+  CLUSTERS = number of Wolff cluster moves after each MCS (default 0,
+      see ll_cluster.py).
   
 The initial configuration is set at random. The boundaries
 are periodic throughout the simulation.  During the
@@ -28,6 +30,12 @@ import datetime
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib as mpl
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from ll_monitor import LatticePublisher
+from ll_stats import RunStats, Welford, format_summary
+from ll_cluster import cluster_step
+from ll_reweight import EnergyHistogram
 
 #=======================================================================
 def initdat(nmax):
@@ -72,9 +80,7 @@ def plotdat(arr,pflag,nmax):
     cols = np.zeros((nmax,nmax))
     if pflag==1: # colour the arrows according to energy
         mpl.rc('image', cmap='rainbow')
-        for i in range(nmax):
-            for j in range(nmax):
-                cols[i,j] = one_energy(arr,i,j,nmax)
+        cols = energy_map(arr)
         norm = plt.Normalize(cols.min(), cols.max())
     elif pflag==2: # colour the arrows according to angle
         mpl.rc('image', cmap='hsv')
@@ -91,7 +97,161 @@ def plotdat(arr,pflag,nmax):
     ax.set_aspect('equal')
     plt.show()
 #=======================================================================
-def savedat(arr,nsteps,Ts,runtime,ratio,energy,order,nmax):
+def block_average(field,nblock):
+    """
+    Arguments:
+	  field (float(nmax,nmax)) = any per-cell quantity on the lattice;
+	  nblock (int) = side length of the blocks to average over.
+    Description:
+      Function to average a per-cell array over nblock x nblock blocks.
+      When nblock does not divide nmax the last row and column of blocks
+      are smaller and are averaged over the cells they actually hold.
+	Returns:
+	  centres (float(nb)) = block centres in lattice units;
+	  means (float(nb,nb)) = block averages of field.
+    """
+    starts = np.arange(0,field.shape[0],nblock)
+    counts = np.diff(np.append(starts,field.shape[0]))
+    sums = np.add.reduceat(np.add.reduceat(field,starts,axis=0),starts,axis=1)
+    return starts + 0.5*(counts-1), sums/np.outer(counts,counts)
+#=======================================================================
+def coarse_director(arr,nblock):
+    """
+    Arguments:
+	  arr (float(nmax,nmax)) = array that contains lattice data;
+	  nblock (int) = side length of the blocks to average over.
+    Description:
+      Function to coarse-grain the director field for plotting.  The
+      2D Q tensor (cos2theta, sin2theta) is averaged over each block, so
+      theta and theta+pi count as the same orientation.  The block order
+      parameter uses the same normalisation as get_order.
+	Returns:
+	  centres (float(nb)) = block centres in lattice units;
+	  theta (float(nb,nb)) = block director angle in the range [0,pi);
+	  sblock (float(nb,nb)) = block order parameter.
+    """
+    centres, c2 = block_average(np.cos(2.0*arr),nblock)
+    centres, s2 = block_average(np.sin(2.0*arr),nblock)
+    theta = (0.5*np.arctan2(s2,c2))%np.pi
+    sblock = 0.25 + 0.75*np.sqrt(c2*c2 + s2*s2)
+    return centres, theta, sblock
+#=======================================================================
+def quiver_data(arr,pflag,nmax,narrows):
+    """
+    Arguments:
+	  arr (float(nmax,nmax)) = array that contains lattice data;
+	  pflag (int) = parameter to control plotting, as in plotdat;
+      nmax (int) = side length of square lattice;
+	  narrows (int) = target number of arrows along each side.
+    Description:
+      Function to work out everything a coarse-grained quiver plot of
+      the lattice needs.  Lattices bigger than narrows x narrows are
+      coarse-grained with coarse_director and the energy colours are
+      block averages of energy_map.
+	Returns:
+	  centres (float(nb)) = arrow positions along each axis;
+	  u, v (float(nb,nb)) = arrow components;
+	  cols (float(nb,nb)) = arrow colours;
+	  cmap (string) = name of the colour map;
+	  norm (Normalize) = colour normalisation;
+	  nblock (int) = number of sites along each side of a block.
+    """
+    nblock = max(1,-(-nmax//narrows))
+    centres, theta, sblock = coarse_director(arr,nblock)
+    if pflag==1:
+        cmap = 'rainbow'
+        centres, cols = block_average(energy_map(arr),nblock)
+        norm = mpl.colors.Normalize(cols.min(), cols.max())
+    elif pflag==2:
+        cmap = 'hsv'
+        cols = theta
+        norm = mpl.colors.Normalize(vmin=0, vmax=np.pi)
+    else:
+        cmap = 'gist_gray'
+        cols = np.zeros_like(theta)
+        norm = mpl.colors.Normalize(vmin=0, vmax=1)
+    return centres, np.cos(theta), np.sin(theta), cols, cmap, norm, nblock
+#=======================================================================
+def plotdat_agg(arr,pflag,nmax,filename,narrows=64,dpi=100):
+    """
+    Arguments:
+	  arr (float(nmax,nmax)) = array that contains lattice data;
+	  pflag (int) = parameter to control plotting, as in plotdat;
+      nmax (int) = side length of square lattice;
+	  filename (string) = name of the PNG file to write;
+	  narrows (int) = target number of arrows along each side;
+	  dpi (int) = resolution of the output image.
+    Description:
+      Off-screen version of plotdat for batch jobs and large lattices.
+      The figure is drawn on an Agg canvas directly, so it never touches
+      the pyplot backend and never blocks.  See quiver_data for the
+      coarse-graining.
+	Returns:
+	  filename (string) = name of the file written, or None if pflag = 0.
+    """
+    if pflag==0:
+        return None
+    centres, u, v, cols, cmap, norm, nblock = quiver_data(arr,pflag,nmax,narrows)
+    quiveropts = dict(headlength=0,pivot='middle',headwidth=1,scale=1.1*nmax/nblock)
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.quiver(centres, centres, u, v, cols, norm=norm, cmap=cmap, **quiveropts)
+    ax.set_aspect('equal')
+    fig.savefig(filename, dpi=dpi)
+    return filename
+#=======================================================================
+def record_dtype(extra=()):
+    """
+    Arguments:
+	  extra (tuple of strings) = names of any extra per-step observables.
+    Description:
+      Structured dtype for one row of run output: the MC step number
+      followed by float64 ratio, energy, order and the extra fields.
+	Returns:
+	  dtype (np.dtype) = record type.
+    """
+    return np.dtype([('step','i8')] + [(name,'f8') for name in ('ratio','energy','order') + tuple(extra)])
+#=======================================================================
+class RecordBuffer:
+    """
+    Preallocated buffer of per-step records (see record_dtype).  By
+    default it holds nrec records in memory.  Given spill=filename it
+    only holds chunk records and appends each full chunk to filename as
+    raw binary records, so memory use does not grow with nsteps.
+    """
+    def __init__(self, nrec, extra=(), chunk=65536, spill=None):
+        self.dtype = record_dtype(extra)
+        self.spill = spill
+        self.buf = np.zeros(nrec if spill is None else min(nrec,chunk), dtype=self.dtype)
+        self.n = 0
+        if spill is not None:
+            open(spill,"wb").close()
+
+    def append(self, step, ratio, energy, order, *extra):
+        """Store one record, spilling the buffer to disk first if it is full."""
+        if self.n == len(self.buf):
+            self.flush()
+        self.buf[self.n] = (step, ratio, energy, order) + extra
+        self.n += 1
+
+    def flush(self):
+        """Append the buffered records to the spill file."""
+        if self.spill is None:
+            raise IndexError("RecordBuffer is full and has no spill file")
+        with open(self.spill,"ab") as f:
+            self.buf[:self.n].tofile(f)
+        self.n = 0
+
+    def records(self):
+        """All records so far, read back from the spill file if there is one."""
+        if self.spill is None:
+            return self.buf[:self.n]
+        if self.n:
+            self.flush()
+        return np.memmap(self.spill, dtype=self.dtype, mode="r")
+#=======================================================================
+def savedat(arr,nsteps,Ts,runtime,ratio,energy,order,nmax,stats=None,scale=None,dt=None):
     """
     Arguments:
 	  arr (float(nmax,nmax)) = array that contains lattice data;
@@ -100,7 +260,10 @@ def savedat(arr,nsteps,Ts,runtime,ratio,energy,order,nmax):
 	  ratio (float(nsteps)) = array of acceptance ratios per MCS;
 	  energy (float(nsteps)) = array of reduced energies per MCS;
 	  order (float(nsteps)) = array of order parameters per MCS;
-      nmax (int) = side length of square lattice to simulated.
+      nmax (int) = side length of square lattice to simulated;
+	  stats (dict) = optional RunStats.summary() to add to the header;
+	  scale (float) = optional proposal width to add to the header;
+	  dt (float) = optional Langevin time step to add to the header.
     Description:
       Function to save the energy, order and acceptance ratio
       per Monte Carlo step to text file.  Also saves run data in the
@@ -120,12 +283,24 @@ def savedat(arr,nsteps,Ts,runtime,ratio,energy,order,nmax):
     print("# Number of MC steps:  {:d}".format(nsteps),file=FileOut)
     print("# Reduced temperature: {:5.3f}".format(Ts),file=FileOut)
     print("# Run time (s):        {:8.6f}".format(runtime),file=FileOut)
+    if scale is not None:
+        print("# Proposal width:      {:8.6f}".format(scale),file=FileOut)
+    if dt is not None:
+        print("# Time step:           {:8.6f}".format(dt),file=FileOut)
+    if stats is not None:
+        print("#=====================================================",file=FileOut)
+        for line in format_summary(stats):
+            print("# "+line,file=FileOut)
     print("#=====================================================",file=FileOut)
     print("# MC step:  Ratio:     Energy:   Order:",file=FileOut)
     print("#=====================================================",file=FileOut)
-    # Write the columns of data
-    for i in range(nsteps+1):
-        print("   {:05d}    {:6.4f} {:12.4f}  {:6.4f} ".format(i,ratio[i],energy[i],order[i]),file=FileOut)
+    # Write the columns of data, a chunk at a time so that spilled
+    # records are never all read into memory at once
+    chunk = 65536
+    for start in range(0,nsteps+1,chunk):
+        stop = min(start+chunk,nsteps+1)
+        rows = np.column_stack((np.arange(start,stop),ratio[start:stop],energy[start:stop],order[start:stop]))
+        np.savetxt(FileOut,rows,fmt="   %05d    %6.4f %12.4f  %6.4f ")
     FileOut.close()
 #=======================================================================
 def one_energy(arr,ix,iy,nmax):
@@ -162,6 +337,23 @@ def one_energy(arr,ix,iy,nmax):
     en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
     return en
 #=======================================================================
+def energy_map(arr):
+    """
+    Arguments:
+	  arr (float(nmax,nmax)) = array that contains lattice data.
+    Description:
+      Vectorised version of one_energy for every cell of the lattice at
+      once.  The four neighbours come from shifted copies of the array,
+      which gives the periodic wraparound for free.
+	Returns:
+	  en (float(nmax,nmax)) = reduced energy of each cell.
+    """
+    en = np.zeros(arr.shape)
+    for shift, axis in ((-1,0),(1,0),(-1,1),(1,1)):
+        ang = arr - np.roll(arr,shift,axis=axis)
+        en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    return en
+#=======================================================================
 def all_energy(arr,nmax):
     """
     Arguments:
@@ -207,12 +399,13 @@ def get_order(arr,nmax):
     eigenvalues,eigenvectors = np.linalg.eig(Qab)
     return eigenvalues.max()
 #=======================================================================
-def MC_step(arr,Ts,nmax):
+def MC_step(arr,Ts,nmax,scale=None):
     """
     Arguments:
 	  arr (float(nmax,nmax)) = array that contains lattice data;
 	  Ts (float) = reduced temperature (range 0 to 2);
-      nmax (int) = side length of square lattice.
+      nmax (int) = side length of square lattice;
+	  scale (float) = width of the angle changes, default 0.1+Ts.
     Description:
       Function to perform one MC step, which consists of an average
       of 1 attempted change per lattice site.  Working with reduced
@@ -227,8 +420,9 @@ def MC_step(arr,Ts,nmax):
     # Pre-compute some random numbers.  This is faster than
     # using lots of individual calls.  "scale" sets the width
     # of the distribution for the angle changes - increases
-    # with temperature.
-    scale=0.1+Ts
+    # with temperature unless given.
+    if scale is None:
+        scale=0.1+Ts
     accept = 0
     xran = np.random.randint(0,high=nmax, size=(nmax,nmax))
     yran = np.random.randint(0,high=nmax, size=(nmax,nmax))
@@ -254,16 +448,50 @@ def MC_step(arr,Ts,nmax):
                     arr[ix,iy] -= ang
     return accept/(nmax*nmax)
 #=======================================================================
-def main(program, nsteps, nmax, temp, pflag):
+def tune_scale(scale,ratio,target=0.5):
+    """
+    Arguments:
+	  scale (float) = current proposal width;
+	  ratio (float) = acceptance ratio of the last MCS;
+	  target (float) = acceptance ratio to aim for.
+    Description:
+      Multiplicative update of the proposal width: widen it when more
+      moves than the target are accepted, narrow it when fewer are.
+      Only used during equilibration; the width is then frozen so the
+      production steps satisfy detailed balance.
+	Returns:
+	  scale (float) = new proposal width, kept within [1e-3, pi].
+    """
+    return float(np.clip(scale*np.exp(ratio-target),1e-3,np.pi))
+#=======================================================================
+def main(program, nsteps, nmax, temp, pflag, publish=0, frames=0, spill=None, equil=0, ncluster=0, target=None, histogram=False):
     """
     Arguments:
 	  program (string) = the name of the program;
 	  nsteps (int) = number of Monte Carlo steps (MCS) to perform;
       nmax (int) = side length of square lattice to simulate;
 	  temp (float) = reduced temperature (range 0 to 2);
-	  pflag (int) = a flag to control plotting.
+	  pflag (int) = a flag to control plotting;
+	  publish (int) = if > 0, publish the lattice and observables to
+	      shared memory every publish MCS for ll_monitor.py;
+	  frames (int) = if > 0, store the lattice every frames MCS in an
+	      LL-Frames-*.npy file for ll_movie.py;
+	  spill (string) = if given, file to spill the per-step records to
+	      in chunks instead of keeping them all in memory;
+	  equil (int) = number of MCS to discard before accumulating the
+	      run statistics;
+	  ncluster (int) = number of Wolff cluster moves after each MCS;
+	  target (float) = if given, tune the proposal width towards this
+	      acceptance ratio during the first equil MCS, then freeze it;
+	  histogram (bool) = if True, histogram the energy and order of the
+	      MCS after equil into an LL-Hist-*.npz file for ll_reweight.py.
     Description:
       This is the main function running the Lebwohl-Lasher simulation.
+      Averages, fluctuations and blocking error bars are accumulated
+      as the run goes (see ll_stats.py) and written to the header of
+      the output file, with the mean and largest cluster size as a
+      fraction of the lattice when cluster moves are used.  The
+      proposal width used for the production steps goes in the header.
     Returns:
       NULL
     """
@@ -271,41 +499,92 @@ def main(program, nsteps, nmax, temp, pflag):
     lattice = initdat(nmax)
     # Plot initial frame of lattice
     plotdat(lattice,pflag,nmax)
-    # Create arrays to store energy, acceptance ratio and order parameter
-    energy = np.zeros(nsteps+1,dtype=np.dtype)
-    ratio = np.zeros(nsteps+1,dtype=np.dtype)
-    order = np.zeros(nsteps+1,dtype=np.dtype)
-    # Set initial values in arrays
-    energy[0] = all_energy(lattice,nmax)
-    ratio[0] = 0.5 # ideal value
-    order[0] = get_order(lattice,nmax)
+    # Create a typed buffer to store step, acceptance ratio, energy and order parameter
+    records = RecordBuffer(nsteps+1,spill=spill)
+    # Set initial values in the buffer
+    energy = all_energy(lattice,nmax)
+    order = get_order(lattice,nmax)
+    records.append(0,0.5,energy,order) # 0.5 is the ideal ratio
+    # Streaming averages and error bars over the steps after equil
+    stats = RunStats(nmax,temp)
+    clusters = Welford()
+    largest = 0
+    scale = 0.1+temp
+    if histogram:
+        hist = EnergyHistogram(nmax,temp)
+    # Optionally expose the run to a monitor process
+    if publish>0:
+        publisher = LatticePublisher(nmax,nsteps//publish+1)
+        publisher.publish(lattice,0,energy,order)
+        print("Publishing to shared memory: python ll_monitor.py {}".format(publisher.name))
+    if frames>0:
+        current_datetime = datetime.datetime.now().strftime("%a-%d-%b-%Y-at-%I-%M-%S%p")
+        movie = np.lib.format.open_memmap("LL-Frames-{:s}.npy".format(current_datetime),
+                                          mode="w+",shape=(nsteps//frames+1,nmax,nmax))
+        movie[0] = lattice
 
     # Begin doing and timing some MC steps.
     initial = time.time()
-    for it in range(1,nsteps+1):
-        ratio[it] = MC_step(lattice,temp,nmax)
-        energy[it] = all_energy(lattice,nmax)
-        order[it] = get_order(lattice,nmax)
+    # Always mark the run finished, so an attached monitor never waits
+    # on a run that died
+    try:
+        for it in range(1,nsteps+1):
+            ratio = MC_step(lattice,temp,nmax,scale)
+            if target is not None and it<=equil:
+                scale = tune_scale(scale,ratio,target)
+            for _ in range(ncluster):
+                flipped = cluster_step(lattice,temp,nmax)
+                if it>equil:
+                    clusters.push(flipped/(nmax*nmax))
+                    largest = max(largest,flipped)
+            energy = all_energy(lattice,nmax)
+            order = get_order(lattice,nmax)
+            records.append(it,ratio,energy,order)
+            if it>equil:
+                stats.push(energy,order)
+                if histogram:
+                    hist.push(energy,order)
+            if publish>0 and it%publish==0:
+                publisher.publish(lattice,it,energy,order)
+            if frames>0 and it%frames==0:
+                movie[it//frames] = lattice
+    finally:
+        if publish>0:
+            publisher.close()
     final = time.time()
     runtime = final-initial
+    if frames>0:
+        movie.flush()
+        del movie
+    if histogram:
+        current_datetime = datetime.datetime.now().strftime("%a-%d-%b-%Y-at-%I-%M-%S%p")
+        hist.save("LL-Hist-{:s}.npz".format(current_datetime))
     
     # Final outputs
-    print("{}: Size: {:d}, Steps: {:d}, T*: {:5.3f}: Order: {:5.3f}, Time: {:8.6f} s".format(program, nmax,nsteps,temp,order[nsteps-1],runtime))
+    data = records.records()
+    print("{}: Size: {:d}, Steps: {:d}, T*: {:5.3f}: Order: {:5.3f}, Time: {:8.6f} s".format(program, nmax,nsteps,temp,data['order'][nsteps-1],runtime))
+    summary = stats.summary()
+    if ncluster>0:
+        summary['cluster_size'] = (clusters.mean,clusters.sem())
+        summary['cluster_max'] = (largest/(nmax*nmax),0.0)
+    for line in format_summary(summary):
+        print("  "+line)
     # Plot final frame of lattice and generate output file
-    savedat(lattice,nsteps,temp,runtime,ratio,energy,order,nmax)
+    savedat(lattice,nsteps,temp,runtime,data['ratio'],data['energy'],data['order'],nmax,summary,scale)
     plotdat(lattice,pflag,nmax)
 #=======================================================================
 # Main part of program, getting command line arguments and calling
 # main simulation function.
 #
 if __name__ == '__main__':
-    if int(len(sys.argv)) == 5:
+    if int(len(sys.argv)) in (5, 6):
         PROGNAME = sys.argv[0]
         ITERATIONS = int(sys.argv[1])
         SIZE = int(sys.argv[2])
         TEMPERATURE = float(sys.argv[3])
         PLOTFLAG = int(sys.argv[4])
-        main(PROGNAME, ITERATIONS, SIZE, TEMPERATURE, PLOTFLAG)
+        CLUSTERS = int(sys.argv[5]) if len(sys.argv) == 6 else 0
+        main(PROGNAME, ITERATIONS, SIZE, TEMPERATURE, PLOTFLAG, ncluster=CLUSTERS)
     else:
-        print("Usage: python {} <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG>".format(sys.argv[0]))
+        print("Usage: python {} <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> [<CLUSTERS>]".format(sys.argv[0]))
 #=======================================================================
@@ -0,0 +1,288 @@
+"""
+NumPy checkerboard version of the Lebwohl-Lasher code.  Based on the
+original by SH 16-Oct-23.
+
+Sites are coloured like a chess board.  A site only interacts with its
+four neighbours, which all have the other colour, so every site of one
+colour can be updated at once with array operations.  One MC step
+updates colour 0 and then colour 1, i.e. exactly one attempt per site.
+The lattice side must be even so that the colouring is consistent
+across the periodic boundaries.
+
+The kernels work with the molecular field of a site.  Writing the pair
+energy as 0.5*(1 - 3cos^2(a-b)) = -0.25 - 0.75*cos(2a - 2b), the energy
+of site i is
+
+    e_i = -1 - 0.75*(cos(2 theta_i)*C_i + sin(2 theta_i)*S_i)
+
+where C_i and S_i are the sums of cos(2 theta) and sin(2 theta) over the
+four neighbours.  The field does not change while one colour is being
+updated.
+
+MC_step can follow each Metropolis sweep with nover overrelaxation
+sweeps.  An overrelaxation move reflects 2 theta_i about the direction
+of its field, theta_i -> atan2(S_i, C_i) - theta_i, which leaves e_i,
+and so the total energy, unchanged.  It needs no random numbers, is
+always accepted and moves the director much further than a Metropolis
+step at low temperature.  On its own it samples at fixed energy, so it
+must be mixed with Metropolis or heat-bath sweeps.
+
+With update='heatbath' the Metropolis sweep is replaced by a heat-bath
+sweep.  The local distribution of a site is exp(-e_i/Ts), so 2 theta_i
+is von Mises distributed about atan2(S_i, C_i) with concentration
+0.75*sqrt(C_i^2 + S_i^2)/Ts.  Each angle is drawn from it directly:
+nothing is rejected and there is no proposal width to tune.
+
+With nhit > 1 each Metropolis sweep of a colour makes nhit proposals
+per site in a row.  The field of the other colour is computed once and
+reused for all of them, so the neighbour sums are amortised over nhit
+moves.  The returned ratio is per proposal.
+
+Run at the command line by typing:
+
+python LebwohlLasherCheckerboard.py <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> [<OVERRELAX> [<UPDATE>]]
+
+where OVERRELAX is the number of overrelaxation sweeps per MC step
+(default 0) and UPDATE is metropolis (default) or heatbath.
+"""
+
+import sys
+import time
+import numpy as np
+from LebwohlLasher import initdat, plotdat, savedat, energy_map
+
+#=======================================================================
+def colour_mask(shape, parity):
+    """
+    Arguments:
+	  shape (tuple) = shape of the block of sites;
+	  parity (int) = (row + column) of the first site of the block, so
+	      that blocks cut from a bigger lattice keep its colouring.
+    Description:
+      Boolean mask of the colour-0 sites, (i+j+parity) even.
+	Returns:
+	  mask (bool(shape)) = True on colour-0 sites.
+    """
+    i, j = np.indices(shape)
+    return (i + j + parity)%2 == 0
+#=======================================================================
+def field_periodic(arr):
+    """
+    Arguments:
+	  arr (float(nmax,nmax)) = array that contains lattice data.
+    Description:
+      Molecular field of every site with periodic boundaries.
+	Returns:
+	  C, S (float(nmax,nmax)) = neighbour sums of cos(2theta), sin(2theta).
+    """
+    c2 = np.cos(2.0*arr)
+    s2 = np.sin(2.0*arr)
+    C = np.roll(c2,1,0) + np.roll(c2,-1,0) + np.roll(c2,1,1) + np.roll(c2,-1,1)
+    S = np.roll(s2,1,0) + np.roll(s2,-1,0) + np.roll(s2,1,1) + np.roll(s2,-1,1)
+    return C, S
+#=======================================================================
+def field_padded(block):
+    """
+    Arguments:
+	  block (float(h+2,w+2)) = h x w sites plus a one-site halo.
+    Description:
+      Molecular field of the interior sites of a block with a halo.
+	Returns:
+	  C, S (float(h,w)) = neighbour sums of cos(2theta), sin(2theta).
+    """
+    c2 = np.cos(2.0*block)
+    s2 = np.sin(2.0*block)
+    C = c2[:-2,1:-1] + c2[2:,1:-1] + c2[1:-1,:-2] + c2[1:-1,2:]
+    S = s2[:-2,1:-1] + s2[2:,1:-1] + s2[1:-1,:-2] + s2[1:-1,2:]
+    return C, S
+#=======================================================================
+def metropolis(theta, C, S, Ts, scale, rng):
+    """
+    Arguments:
+	  theta (float(n)) = angles of the sites to update;
+	  C, S (float(n)) = molecular field of those sites;
+	  Ts (float) = reduced temperature;
+	  scale (float) = width of the Gaussian proposal;
+	  rng = np.random or a np.random.Generator.
+    Description:
+      One Metropolis attempt on each of a set of independent sites.
+	Returns:
+	  new (float(n)) = updated angles;
+	  accepted (int) = number of accepted moves.
+    """
+    trial = theta + rng.normal(scale=scale, size=theta.shape)
+    dE = -0.75*((np.cos(2.0*trial) - np.cos(2.0*theta))*C + (np.sin(2.0*trial) - np.sin(2.0*theta))*S)
+    accept = (dE <= 0.0) | (np.exp(-np.maximum(dE,0.0)/Ts) >= rng.random(theta.shape))
+    return np.where(accept, trial, theta), int(accept.sum())
+#=======================================================================
+def heatbath(C, S, Ts, rng):
+    """
+    Arguments:
+	  C, S (float(n)) = molecular field of the sites to update;
+	  Ts (float) = reduced temperature;
+	  rng = np.random or a np.random.Generator.
+    Description:
+      Heat-bath update of a set of independent sites: draw 2 theta of
+      each site from its von Mises local distribution.
+	Returns:
+	  new (float(n)) = new angles.
+    """
+    return 0.5*rng.vonmises(np.arctan2(S, C), 0.75*np.hypot(C, S)/Ts)
+#=======================================================================
+def overrelax(theta, C, S):
+    """
+    Arguments:
+	  theta (float(n)) = angles of the sites to update;
+	  C, S (float(n)) = molecular field of those sites.
+    Description:
+      Overrelaxation move on a set of independent sites: reflect each
+      director about its molecular field.  The energy is unchanged.
+	Returns:
+	  new (float(n)) = reflected angles.
+    """
+    return np.arctan2(S, C) - theta
+#=======================================================================
+def overrelax_sweep(arr):
+    """
+    Arguments:
+	  arr (float(nmax,nmax)) = array that contains lattice data (even nmax).
+    Description:
+      One overrelaxation move on every colour-0 site and then on every
+      colour-1 site.  The total energy is unchanged.
+	Returns:
+	  NULL
+    """
+    for colour in (0, 1):
+        mask = colour_mask(arr.shape, colour)
+        C, S = field_periodic(arr)
+        arr[mask] = overrelax(arr[mask], C[mask], S[mask])
+#=======================================================================
+def sweep_padded(block, Ts, colour, parity, rng=np.random, scale=None):
+    """
+    Arguments:
+	  block (float(h+2,w+2)) = h x w sites plus a one-site halo;
+	  Ts (float) = reduced temperature;
+	  colour (int) = which sublattice to update (0 or 1);
+	  parity (int) = (row + column) of the first interior site;
+	  rng = np.random or a np.random.Generator;
+	  scale (float) = proposal width, default 0.1+Ts as in MC_step.
+    Description:
+      Update every interior site of one colour in place.  The halo is
+      read but never written, so a lattice can be swept block by block.
+	Returns:
+	  accept (int) = number of accepted moves.
+    """
+    if scale is None:
+        scale = 0.1 + Ts
+    inner = block[1:-1,1:-1]
+    mask = colour_mask(inner.shape, parity + colour)
+    C, S = field_padded(block)
+    new, accept = metropolis(inner[mask], C[mask], S[mask], Ts, scale, rng)
+    inner[mask] = new
+    return accept
+#=======================================================================
+def MC_step(arr, Ts, nmax, rng=np.random, scale=None, nover=0, update='metropolis', nhit=1):
+    """
+    Arguments:
+	  arr (float(nmax,nmax)) = array that contains lattice data;
+	  Ts (float) = reduced temperature (range 0 to 2);
+      nmax (int) = side length of square lattice (even);
+	  rng = np.random or a np.random.Generator;
+	  scale (float) = proposal width, default 0.1+Ts;
+	  nover (int) = overrelaxation sweeps after the Metropolis sweep;
+	  update (string) = 'metropolis' or 'heatbath';
+	  nhit (int) = Metropolis proposals per site on the same field.
+    Description:
+      One MC step: a Metropolis (or heat-bath) update of every colour-0
+      site and then of every colour-1 site, followed by nover
+      overrelaxation sweeps.
+	Returns:
+	  accept/(nhit*nmax**2) (float) = acceptance ratio for current MCS, 1 for heat-bath.
+    """
+    if nmax%2:
+        raise ValueError("checkerboard updates need an even lattice size, got {}".format(nmax))
+    if update not in ('metropolis', 'heatbath'):
+        raise ValueError("unknown update {!r}, use 'metropolis' or 'heatbath'".format(update))
+    if scale is None:
+        scale = 0.1 + Ts
+    accept = 0
+    for colour in (0, 1):
+        mask = colour_mask(arr.shape, colour)
+        C, S = field_periodic(arr)
+        if update == 'heatbath':
+            new, acc = heatbath(C[mask], S[mask], Ts, rng), int(mask.sum())
+        else:
+            C, S = C[mask], S[mask]
+            new, acc = arr[mask], 0
+            for _ in range(nhit):
+                new, hit = metropolis(new, C, S, Ts, scale, rng)
+                acc += hit
+        arr[mask] = new
+        accept += acc
+    for _ in range(nover):
+        overrelax_sweep(arr)
+    if update == 'heatbath':
+        return accept/(nmax*nmax)
+    return accept/(nmax*nmax*nhit)
+#=======================================================================
+def all_energy(arr, nmax):
+    """Total reduced energy of the lattice, vectorised."""
+    return energy_map(arr).sum()
+#=======================================================================
+def get_order(arr, nmax):
+    """
+    Order parameter of the lattice.  For unit vectors in the plane the
+    largest eigenvalue of Q_ab in get_order is 1/4 + 3/4*|<exp(2i theta)>|.
+    """
+    return 0.25 + 0.75*np.hypot(np.cos(2.0*arr).mean(), np.sin(2.0*arr).mean())
+#=======================================================================
+def main(program, nsteps, nmax, temp, pflag, nover=0, update='metropolis'):
+    """
+    Arguments:
+	  program (string) = the name of the program;
+	  nsteps (int) = number of Monte Carlo steps (MCS) to perform;
+      nmax (int) = side length of square lattice to simulate (even);
+	  temp (float) = reduced temperature (range 0 to 2);
+	  pflag (int) = a flag to control plotting;
+	  nover (int) = overrelaxation sweeps per MC step;
+	  update (string) = 'metropolis' or 'heatbath'.
+    Description:
+      Same run and output as LebwohlLasher.main with the checkerboard
+      MC step and vectorised observables.
+    Returns:
+      NULL
+    """
+    lattice = initdat(nmax)
+    plotdat(lattice,pflag,nmax)
+    energy = np.zeros(nsteps+1)
+    ratio = np.zeros(nsteps+1)
+    order = np.zeros(nsteps+1)
+    energy[0] = all_energy(lattice,nmax)
+    ratio[0] = 0.5 # ideal value
+    order[0] = get_order(lattice,nmax)
+
+    initial = time.time()
+    for it in range(1,nsteps+1):
+        ratio[it] = MC_step(lattice,temp,nmax,nover=nover,update=update)
+        energy[it] = all_energy(lattice,nmax)
+        order[it] = get_order(lattice,nmax)
+    final = time.time()
+    runtime = final-initial
+
+    print("{}: Size: {:d}, Steps: {:d}, T*: {:5.3f}: Order: {:5.3f}, Time: {:8.6f} s".format(program, nmax,nsteps,temp,order[nsteps-1],runtime))
+    savedat(lattice,nsteps,temp,runtime,ratio,energy,order,nmax)
+    plotdat(lattice,pflag,nmax)
+#=======================================================================
+if __name__ == '__main__':
+    if int(len(sys.argv)) in (5, 6, 7):
+        PROGNAME = sys.argv[0]
+        ITERATIONS = int(sys.argv[1])
+        SIZE = int(sys.argv[2])
+        TEMPERATURE = float(sys.argv[3])
+        PLOTFLAG = int(sys.argv[4])
+        OVERRELAX = int(sys.argv[5]) if len(sys.argv) >= 6 else 0
+        UPDATE = sys.argv[6] if len(sys.argv) == 7 else 'metropolis'
+        main(PROGNAME, ITERATIONS, SIZE, TEMPERATURE, PLOTFLAG, OVERRELAX, UPDATE)
+    else:
+        print("Usage: python {} <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> [<OVERRELAX> [<metropolis|heatbath>]]".format(sys.argv[0]))
+#=======================================================================
@@ -0,0 +1,212 @@
+"""
+Single-node multiprocessing version of the Lebwohl-Lasher code, for
+machines without MPI.
+
+The lattice lives in one multiprocessing.shared_memory block.  Each
+worker process maps it with np.ndarray(buffer=...), so there are no
+copies, and owns a band of rows.  An MC step is the checkerboard step of
+LebwohlLasherCheckerboard.py: every worker updates the colour-0 sites of
+its band, all workers meet at a barrier, then they do the same for
+colour 1.  A band reads one row above and below it, owned by its
+neighbours, but those rows are the other colour during a phase and are
+not being written.  Each worker writes back only the sites it updated.
+
+After every step each worker puts its accepted moves, band energy and
+sums of cos(2 theta), sin(2 theta) in its row of a small reduction
+array in the same block, and the parent adds the rows up.  The
+reduction array has two slots, used alternately on even and odd steps,
+so the workers can go on with the next step while the parent reads.
+
+Run at the command line by typing:
+
+python LebwohlLasherShared.py <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> <WORKERS>
+"""
+
+import sys
+import time
+import threading
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+from LebwohlLasher import initdat, plotdat, savedat
+from LebwohlLasherCheckerboard import colour_mask, field_padded, sweep_padded
+
+# Columns of the reduction array: accepted moves, energy, sum cos(2theta), sum sin(2theta).
+NRED = 4
+
+#=======================================================================
+def band_edges(nmax, nworkers):
+    """(r0, r1) row bands of near-equal size, one per worker."""
+    edges = np.linspace(0, nmax, nworkers+1).astype(int)
+    return list(zip(edges[:-1], edges[1:]))
+#=======================================================================
+def attach(buf, nmax, nworkers):
+    """Numpy views of the lattice and the (2,nworkers,NRED) reduction array."""
+    lattice = np.ndarray((nmax,nmax), dtype=np.float64, buffer=buf)
+    red = np.ndarray((2,nworkers,NRED), dtype=np.float64, buffer=buf, offset=8*nmax*nmax)
+    return lattice, red
+#=======================================================================
+def read_band(lattice, r0, r1):
+    """Copy rows r0..r1 with a periodic one-site halo on all four sides."""
+    nmax = lattice.shape[0]
+    rows = lattice[np.arange(r0-1, r1+1)%nmax]
+    return np.pad(rows, ((0,0),(1,1)), mode='wrap')
+#=======================================================================
+def sweep_band(lattice, r0, r1, Ts, colour, rng, scale=None):
+    """
+    Arguments:
+	  lattice (float(nmax,nmax)) = shared lattice;
+	  r0, r1 (int) = rows owned by this worker;
+	  Ts (float) = reduced temperature;
+	  colour (int) = which sublattice to update (0 or 1);
+	  rng = np.random.Generator of this worker;
+	  scale (float) = proposal width, default 0.1+Ts.
+    Description:
+      Update the sites of one colour in a band and write back only
+      those sites, so the rows of other workers are never touched.
+	Returns:
+	  accept (int) = number of accepted moves.
+    """
+    block = read_band(lattice, r0, r1)
+    accept = sweep_padded(block, Ts, colour, r0, rng, scale)
+    mask = colour_mask((r1-r0, lattice.shape[1]), r0 + colour)
+    band = lattice[r0:r1]
+    band[mask] = block[1:-1,1:-1][mask]
+    return accept
+#=======================================================================
+def band_sums(lattice, r0, r1):
+    """Energy of the sites in a band and their sums of cos(2theta), sin(2theta)."""
+    block = read_band(lattice, r0, r1)
+    C, S = field_padded(block)
+    c2 = np.cos(2.0*block[1:-1,1:-1])
+    s2 = np.sin(2.0*block[1:-1,1:-1])
+    return np.sum(-1.0 - 0.75*(c2*C + s2*S)), c2.sum(), s2.sum()
+#=======================================================================
+def _worker(wid, name, nmax, nworkers, nsteps, Ts, seed, phase, step):
+    """Body of one worker process: sweep its band, nsteps times."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        lattice, red = attach(shm.buf, nmax, nworkers)
+        r0, r1 = band_edges(nmax, nworkers)[wid]
+        rng = np.random.default_rng(seed)
+        red[0,wid] = (0.0,) + band_sums(lattice, r0, r1)
+        step.wait()
+        for it in range(1, nsteps+1):
+            accept = 0
+            for colour in (0, 1):
+                accept += sweep_band(lattice, r0, r1, Ts, colour, rng)
+                phase.wait()
+            red[it%2,wid] = (accept,) + band_sums(lattice, r0, r1)
+            step.wait()
+        del lattice, red
+    except BaseException:
+        phase.abort()
+        step.abort()
+        raise
+    finally:
+        shm.close()
+#=======================================================================
+def _watch(workers, barriers):
+    """Abort the barriers as soon as a worker exits with an error, e.g. at import."""
+    pending = {w.sentinel: w for w in workers}
+    while pending:
+        for sentinel in wait(list(pending)):
+            if pending.pop(sentinel).exitcode != 0:
+                for b in barriers:
+                    b.abort()
+                return
+#=======================================================================
+def run(nsteps, nmax, temp, nworkers, seed=None, lattice=None):
+    """
+    Arguments:
+	  nsteps (int) = number of Monte Carlo steps (MCS) to perform;
+      nmax (int) = side length of square lattice (even);
+	  temp (float) = reduced temperature;
+	  nworkers (int) = number of worker processes;
+	  seed (int) = seed for the workers' random streams;
+	  lattice (float(nmax,nmax)) = starting lattice, random if None.
+    Description:
+      Run the simulation on nworkers processes sharing one lattice.
+	Returns:
+	  final (float(nmax,nmax)) = copy of the final lattice;
+	  ratio, energy, order (float(nsteps+1)) = per-step observables;
+	  runtime (float) = time of the MC steps, excluding start-up.
+    """
+    if nmax%2:
+        raise ValueError("checkerboard updates need an even lattice size, got {}".format(nmax))
+    nworkers = max(1, min(nworkers, nmax))
+    if lattice is None:
+        lattice = initdat(nmax)
+    ctx = multiprocessing.get_context('spawn')
+    shm = shared_memory.SharedMemory(create=True, size=8*(nmax*nmax + 2*nworkers*NRED))
+    try:
+        shared, red = attach(shm.buf, nmax, nworkers)
+        shared[:] = lattice
+        phase = ctx.Barrier(nworkers)
+        step = ctx.Barrier(nworkers+1)
+        seeds = np.random.SeedSequence(seed).spawn(nworkers)
+        workers = [ctx.Process(target=_worker, args=(wid, shm.name, nmax, nworkers, nsteps, temp, seeds[wid], phase, step))
+                   for wid in range(nworkers)]
+        for w in workers:
+            w.start()
+        threading.Thread(target=_watch, args=(workers, (phase, step)), daemon=True).start()
+
+        ratio = np.zeros(nsteps+1)
+        energy = np.zeros(nsteps+1)
+        order = np.zeros(nsteps+1)
+        try:
+            for it in range(nsteps+1):
+                step.wait()
+                if it == 0:
+                    initial = time.time()
+                accept, energy[it], c2, s2 = red[it%2].sum(axis=0)
+                ratio[it] = accept/(nmax*nmax) if it else 0.5 # ideal value
+                order[it] = 0.25 + 0.75*np.hypot(c2, s2)/(nmax*nmax)
+            final = time.time()
+        except threading.BrokenBarrierError:
+            raise RuntimeError("a worker process failed") from None
+        finally:
+            for w in workers:
+                w.join()
+        result = shared.copy()
+        del shared, red
+    finally:
+        shm.close()
+        shm.unlink()
+    return result, ratio, energy, order, final-initial
+#=======================================================================
+def main(program, nsteps, nmax, temp, pflag, nworkers):
+    """
+    Arguments:
+	  program (string) = the name of the program;
+	  nsteps (int) = number of Monte Carlo steps (MCS) to perform;
+      nmax (int) = side length of square lattice to simulate (even);
+	  temp (float) = reduced temperature (range 0 to 2);
+	  pflag (int) = a flag to control plotting;
+	  nworkers (int) = number of worker processes.
+    Description:
+      Same run and output as LebwohlLasher.main with the lattice shared
+      between nworkers processes.
+    Returns:
+      NULL
+    """
+    lattice = initdat(nmax)
+    plotdat(lattice,pflag,nmax)
+    lattice, ratio, energy, order, runtime = run(nsteps,nmax,temp,nworkers,lattice=lattice)
+    print("{}: Size: {:d}, Steps: {:d}, T*: {:5.3f}: Order: {:5.3f}, Time: {:8.6f} s, Workers: {:d}".format(program, nmax,nsteps,temp,order[nsteps-1],runtime,nworkers))
+    savedat(lattice,nsteps,temp,runtime,ratio,energy,order,nmax)
+    plotdat(lattice,pflag,nmax)
+#=======================================================================
+if __name__ == '__main__':
+    if int(len(sys.argv)) == 6:
+        PROGNAME = sys.argv[0]
+        ITERATIONS = int(sys.argv[1])
+        SIZE = int(sys.argv[2])
+        TEMPERATURE = float(sys.argv[3])
+        PLOTFLAG = int(sys.argv[4])
+        WORKERS = int(sys.argv[5])
+        main(PROGNAME, ITERATIONS, SIZE, TEMPERATURE, PLOTFLAG, WORKERS)
+    else:
+        print("Usage: python {} <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> <WORKERS>".format(sys.argv[0]))
+#=======================================================================
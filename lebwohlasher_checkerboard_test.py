@@ -0,0 +1,93 @@
+import pytest
+import numpy as np
+import LebwohlLasher as ll
+import LebwohlLasherCheckerboard as cb
+import ll_outofcore as oc
+
+def test_observables_match_serial():
+    nmax = 8
+    lattice = ll.initdat(nmax)
+    assert cb.all_energy(lattice, nmax) == pytest.approx(ll.all_energy(lattice, nmax))
+    assert cb.get_order(lattice, nmax) == pytest.approx(ll.get_order(lattice, nmax))
+
+def test_MC_step_checkerboard():
+    nmax = 8
+    lattice = ll.initdat(nmax)
+    ratio = cb.MC_step(lattice, 0.5, nmax)
+    assert 0.0 <= ratio <= 1.0
+    with pytest.raises(ValueError):
+        cb.MC_step(ll.initdat(5), 0.5, 5)
+
+def test_outofcore_observables(tmp_path):
+    nmax, tile = 12, 5
+    lat = oc.create_lattice(str(tmp_path / "lattice.npy"), nmax, tile)
+    energy, order = oc.observables(lat, tile)
+    assert energy == pytest.approx(cb.all_energy(np.array(lat), nmax))
+    assert order == pytest.approx(cb.get_order(np.array(lat), nmax))
+
+def test_outofcore_single_tile_matches_in_core(tmp_path):
+    # With one tile the random numbers are drawn in the same order
+    nmax = 10
+    lat = oc.create_lattice(str(tmp_path / "lattice.npy"), nmax, nmax)
+    arr = np.array(lat)
+    oc.MC_step(lat, 0.7, nmax, np.random.default_rng(3))
+    cb.MC_step(arr, 0.7, nmax, np.random.default_rng(3))
+    assert np.allclose(lat, arr)
+
+def test_shared_memory_workers():
+    import LebwohlLasherShared as sh
+    nmax = 8
+    start = ll.initdat(nmax)
+    final, ratio, energy, order, runtime = sh.run(3, nmax, 0.5, 2, seed=0, lattice=start)
+    assert energy[0] == pytest.approx(cb.all_energy(start, nmax))
+    assert energy[-1] == pytest.approx(cb.all_energy(final, nmax))
+    assert order[-1] == pytest.approx(cb.get_order(final, nmax))
+    assert np.all((ratio >= 0.0) & (ratio <= 1.0))
+    again = sh.run(3, nmax, 0.5, 2, seed=0, lattice=start)[0]
+    assert np.array_equal(final, again)  # bands are independent of scheduling
+
+def test_overrelaxation_keeps_energy():
+    nmax = 8
+    lattice = np.random.random_sample((nmax, nmax))*2.0*np.pi
+    start = lattice.copy()
+    cb.overrelax_sweep(lattice)
+    assert not np.allclose(lattice, start)
+    assert cb.all_energy(lattice, nmax) == pytest.approx(cb.all_energy(start, nmax))
+    assert 0.0 <= cb.MC_step(lattice, 0.5, nmax, nover=2) <= 1.0
+
+def test_heatbath_local_distribution():
+    rng = np.random.default_rng(1)
+    C = np.full(200000, 1.5)
+    S = np.full(200000, -2.0)
+    Ts = 1.2
+    theta = cb.heatbath(C, S, Ts, rng)
+    # <cos(2 theta - phi)> under exp(0.75*|h| cos(2 theta - phi)/Ts)
+    phi = np.arctan2(S[0], C[0])
+    u = np.linspace(-np.pi, np.pi, 20001)
+    w = np.exp(0.75*np.hypot(C[0], S[0])*np.cos(u)/Ts)
+    assert np.cos(2.0*theta - phi).mean() == pytest.approx((np.cos(u)*w).sum()/w.sum(), abs=5e-3)
+    lattice = ll.initdat(8)
+    assert cb.MC_step(lattice, 0.5, 8, update='heatbath') == 1.0
+    with pytest.raises(ValueError):
+        cb.MC_step(lattice, 0.5, 8, update='glauber')
+
+def test_multihit_checkerboard():
+    nmax = 8
+    start = ll.initdat(nmax)
+    # nhit=1 is the single-proposal sweep, draw for draw
+    old = start.copy()
+    rng = np.random.default_rng(6)
+    accept = 0
+    for colour in (0, 1):
+        mask = cb.colour_mask(old.shape, colour)
+        C, S = cb.field_periodic(old)
+        old[mask], acc = cb.metropolis(old[mask], C[mask], S[mask], 0.5, 0.6, rng)
+        accept += acc
+    new = start.copy()
+    assert cb.MC_step(new, 0.5, nmax, np.random.default_rng(6), nhit=1) == accept/(nmax*nmax)
+    assert np.array_equal(new, old)
+    # Several proposals per site: ratio is per proposal
+    ratio = cb.MC_step(start.copy(), 0.5, nmax, np.random.default_rng(6), nhit=4)
+    assert 0.0 <= ratio <= 1.0
+    # Tiny proposals on an aligned lattice are all accepted: ratio 1, not nhit
+    assert cb.MC_step(np.zeros((nmax, nmax)), 1e-4, nmax, np.random.default_rng(6), scale=1e-6, nhit=3) == pytest.approx(1.0)
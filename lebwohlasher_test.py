@@ -1,6 +1,6 @@
 import pytest
 import numpy as np
-from LebwohlLasher import initdat, plotdat
+from LebwohlLasher import initdat, plotdat, plotdat_agg, energy_map, one_energy, coarse_director
 
 def test_initdat():
     nmax = 5
@@ -24,3 +24,233 @@ def test_plotdat(pflag, expected_shape):
         assert True
     else:
         assert plotdat(lattice, pflag, nmax) is None  # No plot expected for pflag = 0
+
+def test_energy_map():
+    nmax = 6
+    lattice = initdat(nmax)
+    en = energy_map(lattice)
+    # Check each cell against the loop version
+    for i in range(nmax):
+        for j in range(nmax):
+            assert en[i, j] == pytest.approx(one_energy(lattice, i, j, nmax))
+
+def test_coarse_director():
+    nmax = 10
+    lattice = np.full((nmax, nmax), 0.3)
+    lattice[::2] += np.pi  # theta and theta+pi are the same director
+    centres, theta, sblock = coarse_director(lattice, 4)
+    assert theta.shape == (3, 3)
+    assert np.allclose(theta, 0.3) and np.allclose(sblock, 1.0)
+
+@pytest.mark.parametrize("pflag", [0, 1, 2, 3])
+def test_plotdat_agg(pflag, tmp_path):
+    nmax = 50
+    lattice = initdat(nmax)
+    filename = plotdat_agg(lattice, pflag, nmax, str(tmp_path / "lattice.png"), narrows=8)
+    if pflag == 0:
+        assert filename is None
+    else:
+        assert (tmp_path / "lattice.png").stat().st_size > 0
+
+def test_publisher_monitor():
+    import subprocess, sys
+    from ll_monitor import LatticePublisher
+    publisher = LatticePublisher(4, 2)
+    lattice = np.arange(16.0).reshape(4, 4)
+    for step in range(3):
+        publisher.publish(lattice, step, -float(step), 0.5)
+    # Attach from a separate process, as the monitor would
+    reader = ("from ll_monitor import LatticeMonitor\n"
+              "m = LatticeMonitor('{}')\n"
+              "print(m.nmax, m.lattice.sum(), m.curves()[:, 0].tolist(), m.stable(m.sequence()))\n"
+              "m.close()").format(publisher.name)
+    out = subprocess.run([sys.executable, "-c", reader], capture_output=True, text=True, check=True)
+    publisher.close()
+    assert out.stdout.split() == ["4", "120.0", "[1.0,", "2.0]", "True"]
+
+def test_render_frames(tmp_path):
+    from ll_movie import render_frames, encode_gif
+    path = str(tmp_path / "frames.npy")
+    np.save(path, np.random.random((3, 20, 20)) * np.pi)
+    pngs = render_frames(path, str(tmp_path), 2, processes=2, narrows=10)
+    assert [p.split("_")[-1] for p in pngs] == ["00000.png", "00001.png", "00002.png"]
+    encode_gif(pngs, str(tmp_path / "movie.gif"))
+    from PIL import Image
+    with Image.open(str(tmp_path / "movie.gif")) as gif:
+        assert gif.n_frames == 3
+
+def test_record_buffer_spill(tmp_path):
+    from LebwohlLasher import RecordBuffer
+    records = RecordBuffer(10, extra=("chi",), chunk=3, spill=str(tmp_path / "records.bin"))
+    for step in range(10):
+        records.append(step, 0.5, -float(step), 0.25, 2.0)
+    assert len(records.buf) == 3  # memory does not grow with the number of steps
+    data = records.records()
+    assert data.dtype.names == ("step", "ratio", "energy", "order", "chi")
+    assert np.array_equal(data["step"], np.arange(10))
+    assert np.array_equal(data["energy"], -np.arange(10.0))
+
+def test_main_writes_output(tmp_path, monkeypatch):
+    from LebwohlLasher import main
+    monkeypatch.chdir(tmp_path)
+    main("LebwohlLasher.py", 3, 4, 0.5, 0)
+    output = list(tmp_path.glob("LL-Output-*.txt"))
+    assert len(output) == 1
+    rows = np.loadtxt(output[0])
+    assert rows.shape == (4, 4)
+    assert np.array_equal(rows[:, 0], np.arange(4))
+
+def test_streaming_stats():
+    from ll_stats import Welford, LogBlocking
+    rng = np.random.default_rng(0)
+    # AR(1) series with integrated autocorrelation time (1+phi)/(2(1-phi)) = 4.5
+    phi = 0.8
+    x = np.zeros(2**15)
+    for i in range(1, len(x)):
+        x[i] = phi*x[i-1] + rng.normal()
+    w, b = Welford(), LogBlocking()
+    for v in x:
+        w.push(v)
+        b.push(v)
+    assert np.isclose(w.mean, x.mean()) and np.isclose(w.var(), x.var())
+    assert np.isclose(w.binder(), 1 - np.mean(x**4)/(3*np.mean(x**2)**2))
+    assert len(b.levels) == 16  # O(log n) memory
+    assert 3.0 < b.tau() < 6.5
+    assert b.error() > 2.5*w.sem()  # correlated data: naive error too small
+
+def test_heat_capacity_is_energy_slope():
+    from ll_stats import RunStats
+    # Exact canonical averages of a periodic 2x2 lattice by quadrature
+    theta = np.linspace(0.0, np.pi, 16, endpoint=False)
+    a, b, c, d = np.meshgrid(theta, theta, theta, theta, indexing='ij')
+    pair = lambda x, y: 0.5*(1.0 - 3.0*np.cos(x - y)**2)
+    # all_energy: each of the 4 sites has every neighbour twice
+    E = 4.0*(pair(a, b) + pair(a, c) + pair(b, d) + pair(c, d)).ravel()
+    def mean_energy(T):
+        w = np.exp(-0.5*(E - E.min())/T)
+        return (w*E).sum()/w.sum()
+    T, dT = 0.8, 1e-4
+    slope = (mean_energy(T+dT) - mean_energy(T-dT))/(2*dT)
+    # Samples drawn from the same distribution
+    rng = np.random.default_rng(5)
+    w = np.exp(-0.5*(E - E.min())/T)
+    stats = RunStats(2, T)
+    for e in rng.choice(E, size=20000, p=w/w.sum()):
+        stats.push(e, 0.5)
+    cv = stats.summary()['heat_capacity'][0]
+    # Cv per site is d<H/N>/dT with H = E/2
+    assert cv == pytest.approx(0.5*slope/4, rel=0.05)
+
+def test_main_writes_stats(tmp_path, monkeypatch):
+    from LebwohlLasher import main
+    monkeypatch.chdir(tmp_path)
+    main("LebwohlLasher.py", 4, 4, 0.5, 0, equil=1)
+    header = next(tmp_path.glob("LL-Output-*.txt")).read_text()
+    assert "# samples:         3" in header
+    assert "# heat_capacity:" in header
+
+def test_cluster_labels_and_moves():
+    import ll_cluster as lc
+    from LebwohlLasher import all_energy
+    # Two chains 0-1-2 and 4-5, site 3 alone
+    labels = lc.label_clusters(6, np.array([2, 1, 5]), np.array([1, 0, 4]))
+    assert labels[0] == labels[1] == labels[2]
+    assert labels[4] == labels[5] != labels[0]
+    assert labels[3] not in (labels[0], labels[4])
+    # An aligned lattice at low T is one cluster; reflecting it keeps the energy
+    nmax = 8
+    rng = np.random.default_rng(3)
+    lattice = np.full((nmax, nmax), 0.4)
+    before = all_energy(lattice, nmax)
+    assert lc.cluster_step(lattice, 1e-3, nmax, rng) == nmax*nmax
+    assert all_energy(lattice, nmax) == pytest.approx(before)
+    sizes = lc.cluster_sizes(initdat(nmax), 1.0, rng)
+    assert sizes.sum() == nmax*nmax and np.all(np.diff(sizes) <= 0)
+
+def test_tuned_scale_in_header(tmp_path, monkeypatch):
+    from LebwohlLasher import main, tune_scale
+    assert tune_scale(0.5, 0.8) > 0.5 > tune_scale(0.5, 0.2)
+    assert tune_scale(3.0, 1.0) == pytest.approx(np.pi)
+    monkeypatch.chdir(tmp_path)
+    np.random.seed(0)
+    main("LebwohlLasher.py", 6, 4, 0.5, 0, equil=3, target=0.5)
+    header = next(tmp_path.glob("LL-Output-*.txt")).read_text()
+    width = float(header.split("# Proposal width:")[1].split()[0])
+    assert width != pytest.approx(0.6)
+
+def test_langevin_torque_and_step(tmp_path, monkeypatch):
+    import ll_langevin as lg
+    from LebwohlLasher import all_energy
+    nmax = 6
+    lattice = initdat(nmax)
+    # Torque is the derivative of the bond energy, half of all_energy
+    h = 1e-6
+    moved = lattice.copy()
+    moved[2, 3] += h
+    dH = 0.5*(all_energy(moved, nmax) - all_energy(lattice, nmax))/h
+    assert lg.torque(lattice)[2, 3] == pytest.approx(dH, rel=1e-4)
+    # Without noise a small step goes downhill
+    before = all_energy(lattice, nmax)
+    assert lg.langevin_step(lattice, 0.0, 0.01) == 1.0
+    assert all_energy(lattice, nmax) < before
+    monkeypatch.chdir(tmp_path)
+    lg.main("ll_langevin.py", 4, 4, 0.5, 0, dt=0.02)
+    header = next(tmp_path.glob("LL-Output-*.txt")).read_text()
+    assert "# Time step:           0.020000" in header
+
+def test_histogram_reweighting(tmp_path, monkeypatch):
+    import ll_reweight as rw
+    from LebwohlLasher import main
+    monkeypatch.chdir(tmp_path)
+    np.random.seed(1)
+    main("LebwohlLasher.py", 20, 4, 0.8, 0, equil=5, histogram=True)
+    hist = rw.EnergyHistogram.load(str(next(tmp_path.glob("LL-Hist-*.npz"))))
+    assert hist.count.sum() == 15 and hist.Ts == 0.8
+    # At the run temperature reweighting gives back the run averages
+    data = np.loadtxt(next(tmp_path.glob("LL-Output-*.txt")))[6:]
+    at_run = rw.reweight(hist, [0.8])
+    assert at_run['energy'][0] == pytest.approx(data[:, 2].mean())
+    assert at_run['heat_capacity'][0] == pytest.approx(data[:, 2].var()/(4*16*0.64), abs=1e-3)
+    assert at_run['order'][0] == pytest.approx(data[:, 3].mean(), abs=1e-3)
+    # WHAM over copies of one run is the single-histogram result
+    both = rw.wham([hist, hist], [0.7, 0.9])
+    assert np.allclose(both['energy'], rw.reweight(hist, [0.7, 0.9])['energy'])
+    assert np.allclose(both['free_energy'], 0.0)
+    # Lower temperature, lower energy
+    assert both['energy'][0] < both['energy'][1]
+    # Cv is the slope of the reweighted <H/N> = <E/N>/2
+    dT = 1e-4
+    curve = rw.reweight(hist, [0.8-dT, 0.8, 0.8+dT])
+    slope = 0.5*(curve['energy'][2] - curve['energy'][0])/(2*dT)/16
+    assert curve['heat_capacity'][1] == pytest.approx(slope, rel=1e-4)
+
+def test_cluster_stats_skip_equilibration(tmp_path, monkeypatch):
+    import LebwohlLasher as ll
+    calls = []
+    def fake_cluster_step(arr, Ts, nmax):
+        calls.append(1)
+        # Whole lattice during the 3 equilibration steps, one site after
+        return nmax*nmax if len(calls) <= 3 else 1
+    monkeypatch.setattr(ll, "cluster_step", fake_cluster_step)
+    monkeypatch.chdir(tmp_path)
+    ll.main("LebwohlLasher.py", 6, 4, 0.5, 0, equil=3, ncluster=1)
+    header = next(tmp_path.glob("LL-Output-*.txt")).read_text()
+    assert float(header.split("cluster_max:")[1].split()[0]) == pytest.approx(1/16)
+    assert float(header.split("cluster_size:")[1].split()[0]) == pytest.approx(1/16)
+
+def test_publisher_closed_on_error(tmp_path, monkeypatch):
+    import LebwohlLasher as ll
+    from ll_monitor import LatticePublisher
+    closed = []
+    class Recording(LatticePublisher):
+        def close(self):
+            closed.append(self.name)
+            super().close()
+    def failing_step(arr, Ts, nmax, scale=None):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(ll, "LatticePublisher", Recording)
+    monkeypatch.setattr(ll, "MC_step", failing_step)
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(KeyboardInterrupt):
+        ll.main("LebwohlLasher.py", 4, 4, 0.5, 0, publish=1)
+    assert len(closed) == 1
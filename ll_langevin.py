@@ -0,0 +1,124 @@
+"""
+Overdamped Langevin dynamics for the Lebwohl-Lasher model.
+
+Instead of Monte Carlo moves every angle is advanced at once by an
+Euler-Maruyama step of
+
+    d theta_i = -dH/dtheta_i dt + sqrt(2 T dt) xi_i
+
+with xi_i independent unit Gaussians and H the sum of the pair energies
+0.5*(1 - 3cos^2(theta_i - theta_j)) over bonds.  The torque on site i is
+
+    dH/dtheta_i = 1.5*sum_j sin(2(theta_i - theta_j))
+                = 1.5*(sin(2 theta_i)*C_i - cos(2 theta_i)*S_i)
+
+with C_i, S_i the molecular field of LebwohlLasherCheckerboard.py.  The
+stationary distribution is exp(-H/T), the same ensemble as MC_step, but
+the trajectory is a physical relaxational dynamics, which is what
+coarsening studies need.  There is no accept/reject branch, so a step
+is a handful of whole-array operations.  The discretisation error is
+O(dt); the torque changes on an angle scale of 1/12, so dt should stay
+well below 0.1.
+
+Run at the command line by typing:
+
+python ll_langevin.py <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> [<DT>]
+
+where ITERATIONS is the number of time steps of length DT (default
+0.01).  The output file has the same layout as LebwohlLasher.py with a
+ratio of 1 for every step.
+"""
+
+import sys
+import time
+import numpy as np
+from LebwohlLasher import initdat, plotdat, savedat, RecordBuffer
+from LebwohlLasherCheckerboard import field_periodic, all_energy, get_order
+from ll_stats import RunStats, format_summary
+
+#=======================================================================
+def torque(arr):
+    """
+    Arguments:
+	  arr (float(nmax,nmax)) = array that contains lattice data.
+    Description:
+      Derivative of the total energy with respect to every angle,
+      periodic boundaries.
+	Returns:
+	  dH (float(nmax,nmax)) = dH/dtheta of each cell.
+    """
+    C, S = field_periodic(arr)
+    return 1.5*(np.sin(2.0*arr)*C - np.cos(2.0*arr)*S)
+#=======================================================================
+def langevin_step(arr, Ts, dt, rng=np.random):
+    """
+    Arguments:
+	  arr (float(nmax,nmax)) = array that contains lattice data;
+	  Ts (float) = reduced temperature;
+	  dt (float) = time step;
+	  rng = np.random or a np.random.Generator.
+    Description:
+      One Euler-Maruyama step of overdamped Langevin dynamics for every
+      cell at once, in place.
+	Returns:
+	  1.0 (float) = nothing is rejected, kept for the ratio column.
+    """
+    noise = rng.normal(scale=np.sqrt(2.0*Ts*dt), size=arr.shape)
+    arr += noise - dt*torque(arr)
+    return 1.0
+#=======================================================================
+def main(program, nsteps, nmax, temp, pflag, dt=0.01, equil=0):
+    """
+    Arguments:
+	  program (string) = the name of the program;
+	  nsteps (int) = number of time steps to perform;
+      nmax (int) = side length of square lattice to simulate;
+	  temp (float) = reduced temperature (range 0 to 2);
+	  pflag (int) = a flag to control plotting;
+	  dt (float) = time step;
+	  equil (int) = number of steps to discard before accumulating the
+	      run statistics.
+    Description:
+      Same run, statistics and output as LebwohlLasher.main with
+      Langevin steps in place of MC steps.
+    Returns:
+      NULL
+    """
+    lattice = initdat(nmax)
+    plotdat(lattice,pflag,nmax)
+    records = RecordBuffer(nsteps+1)
+    records.append(0,1.0,all_energy(lattice,nmax),get_order(lattice,nmax))
+    stats = RunStats(nmax,temp)
+
+    initial = time.time()
+    for it in range(1,nsteps+1):
+        ratio = langevin_step(lattice,temp,dt)
+        energy = all_energy(lattice,nmax)
+        order = get_order(lattice,nmax)
+        records.append(it,ratio,energy,order)
+        if it>equil:
+            stats.push(energy,order)
+    final = time.time()
+    runtime = final-initial
+
+    data = records.records()
+    print("{}: Size: {:d}, Steps: {:d}, T*: {:5.3f}, dt: {:g}: Order: {:5.3f}, Time: {:8.6f} s".format(
+        program,nmax,nsteps,temp,dt,data['order'][nsteps-1],runtime))
+    summary = stats.summary()
+    for line in format_summary(summary):
+        print("  "+line)
+    savedat(lattice,nsteps,temp,runtime,data['ratio'],data['energy'],data['order'],nmax,summary,dt=dt)
+    plotdat(lattice,pflag,nmax)
+#=======================================================================
+if __name__ == '__main__':
+    if int(len(sys.argv)) in (5, 6):
+        PROGNAME = sys.argv[0]
+        ITERATIONS = int(sys.argv[1])
+        SIZE = int(sys.argv[2])
+        TEMPERATURE = float(sys.argv[3])
+        PLOTFLAG = int(sys.argv[4])
+        DT = float(sys.argv[5]) if len(sys.argv) == 6 else 0.01
+        main(PROGNAME, ITERATIONS, SIZE, TEMPERATURE, PLOTFLAG, DT)
+    else:
+        print("Usage: python {} <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> [<DT>]".format(sys.argv[0]))
+#=======================================================================
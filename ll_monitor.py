@@ -0,0 +1,187 @@
+"""
+Live monitoring of a running Lebwohl-Lasher simulation through shared
+memory.
+
+The simulation creates a LatticePublisher and calls publish() every k
+sweeps.  That copies the lattice and the latest energy and order into a
+multiprocessing.shared_memory block and never waits for anybody.  A
+monitor in another process attaches to the block by name, draws the
+director field and the energy/order curves straight from the shared
+arrays, and detaches again without disturbing the run.
+
+Consistency uses a sequence counter (a seqlock): the writer makes the
+counter odd before it writes and even afterwards, and a reader throws
+away any frame where the counter was odd or changed under it.
+
+Run the monitor at the command line by typing:
+
+python ll_monitor.py <NAME> [<NARROWS>]
+
+where NAME is the block name printed by main(..., publish=k).
+"""
+
+import sys
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+# Header slots (int64): sequence counter, last step, nmax, history
+# capacity, number of history rows written and a finished flag.
+SEQ, STEP, NMAX, CAPACITY, COUNT, DONE = range(6)
+HEADER_LEN = 8
+
+#=======================================================================
+def _block_size(nmax, capacity):
+    """Number of bytes needed for the header, lattice and history."""
+    return 8*(HEADER_LEN + nmax*nmax + 3*capacity)
+
+#=======================================================================
+def _views(buf, nmax, capacity):
+    """Numpy views of the header, lattice and history in a shared block."""
+    header = np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=buf)
+    lattice = np.ndarray((nmax,nmax), dtype=np.float64, buffer=buf,
+                         offset=8*HEADER_LEN)
+    history = np.ndarray((capacity,3), dtype=np.float64, buffer=buf,
+                         offset=8*(HEADER_LEN + nmax*nmax))
+    return header, lattice, history
+
+#=======================================================================
+class LatticePublisher:
+    """
+    Producer side of the shared block.  The history holds one row of
+    (step, energy, order) per publish() call, so capacity should be at
+    least nsteps//k + 1; older rows are overwritten once it is full.
+    """
+
+    def __init__(self, nmax, capacity, name=None):
+        self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                              size=_block_size(nmax, capacity))
+        self.name = self.shm.name
+        self.header, self.lattice, self.history = _views(self.shm.buf, nmax, capacity)
+        self.header[:] = 0
+        self.header[NMAX] = nmax
+        self.header[CAPACITY] = capacity
+
+    def publish(self, arr, step, energy, order):
+        """Copy the lattice and append one history row."""
+        header = self.header
+        row = header[COUNT] % header[CAPACITY]
+        header[SEQ] += 1
+        np.copyto(self.lattice, arr)
+        self.history[row] = (step, energy, order)
+        header[STEP] = step
+        header[COUNT] += 1
+        header[SEQ] += 1
+
+    def close(self):
+        """Mark the run finished and remove the block name."""
+        self.header[DONE] = 1
+        del self.header, self.lattice, self.history
+        self.shm.close()
+        self.shm.unlink()
+
+#=======================================================================
+class LatticeMonitor:
+    """
+    Consumer side of the shared block.  lattice and history are views
+    into shared memory, not copies; use stable() around any work that
+    needs a consistent frame.
+    """
+
+    def __init__(self, name):
+        # Only the producer owns the block.  Stop the resource tracker of
+        # this process from unlinking it when the monitor exits.
+        if sys.version_info >= (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        header = np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=self.shm.buf)
+        self.nmax = int(header[NMAX])
+        self.header, self.lattice, self.history = _views(self.shm.buf, self.nmax,
+                                                         int(header[CAPACITY]))
+
+    def sequence(self):
+        """Current sequence number; odd while the producer is writing."""
+        return int(self.header[SEQ])
+
+    def stable(self, seq):
+        """True if no write happened since sequence() returned seq."""
+        return seq%2 == 0 and self.sequence() == seq
+
+    def curves(self):
+        """History rows in step order (a copy, since it is reordered)."""
+        count = int(self.header[COUNT])
+        capacity = self.history.shape[0]
+        if count <= capacity:
+            return self.history[:count].copy()
+        return np.roll(self.history, -(count%capacity), axis=0)
+
+    def finished(self):
+        return bool(self.header[DONE])
+
+    def close(self):
+        del self.header, self.lattice, self.history
+        self.shm.close()
+
+#=======================================================================
+def monitor(name, narrows=32, interval=0.5):
+    """
+    Arguments:
+	  name (string) = name of the shared block printed by main;
+	  narrows (int) = target number of arrows along each side;
+	  interval (float) = seconds between redraws.
+    Description:
+      Attach to a running simulation and plot the coarse-grained
+      director field next to the energy and order curves until the run
+      finishes or the window is closed.
+	Returns:
+	  NULL
+    """
+    import matplotlib.pyplot as plt
+    from LebwohlLasher import coarse_director
+
+    mon = LatticeMonitor(name)
+    nmax = mon.nmax
+    nblock = max(1,-(-nmax//narrows))
+    fig, (ax0, ax1) = plt.subplots(1, 2, figsize=(10, 5))
+    centres, theta, sblock = coarse_director(mon.lattice, nblock)
+    quiv = ax0.quiver(centres, centres, np.cos(theta), np.sin(theta), theta,
+                      cmap='hsv', clim=(0, np.pi), headlength=0, pivot='middle',
+                      headwidth=1, scale=1.1*nmax/nblock)
+    ax0.set_aspect('equal')
+    line_en, = ax1.plot([], [], label='Energy / site')
+    ax2 = ax1.twinx()
+    line_or, = ax2.plot([], [], 'r', label='Order')
+    ax1.set_xlabel('MC step')
+    ax1.set_ylabel('Energy / site')
+    ax2.set_ylabel('Order')
+    last = -1
+    try:
+        while plt.fignum_exists(fig.number):
+            done = mon.finished()
+            seq = mon.sequence()
+            if seq != last and seq%2 == 0:
+                centres, theta, sblock = coarse_director(mon.lattice, nblock)
+                curves = mon.curves()
+                if mon.stable(seq):
+                    quiv.set_UVC(np.cos(theta), np.sin(theta), theta)
+                    line_en.set_data(curves[:,0], curves[:,1]/(nmax*nmax))
+                    line_or.set_data(curves[:,0], curves[:,2])
+                    for ax in (ax1, ax2):
+                        ax.relim()
+                        ax.autoscale_view()
+                    ax0.set_title('Step {:d}'.format(int(mon.header[STEP])))
+                    last = seq
+            if done:
+                break
+            plt.pause(interval)
+    finally:
+        mon.close()
+    plt.show()
+
+#=======================================================================
+if __name__ == '__main__':
+    if len(sys.argv) in (2, 3):
+        monitor(sys.argv[1], *[int(a) for a in sys.argv[2:]])
+    else:
+        print("Usage: python {} <NAME> [<NARROWS>]".format(sys.argv[0]))
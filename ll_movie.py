@@ -0,0 +1,121 @@
+"""
+Render stored lattice frames to an image sequence or GIF in parallel.
+
+Frames are a (nframes, nmax, nmax) array saved with np.save, for example
+by main(..., frames=k) in LebwohlLasher.py.  Each worker of a process pool
+opens the file as a memory map, builds one Agg figure and one quiver
+artist when it starts, and then only updates the arrow data (set_UVC)
+for every frame it is given.  Frame rendering therefore scales with the
+number of cores, and the GIF is assembled from the PNGs at the end.
+
+Run at the command line by typing:
+
+python ll_movie.py <FRAMES> <OUTDIR> <PLOTFLAG> [<PROCESSES>]
+
+where:
+  FRAMES = .npy file holding the lattice frames;
+  OUTDIR = directory for frame_NNNNN.png and movie.gif;
+  PLOTFLAG = 1 for energy colours, 2 for angle colours, 3 for black;
+  PROCESSES = size of the rendering pool (default: all cores).
+"""
+
+import os
+import sys
+import numpy as np
+import multiprocessing
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+from LebwohlLasher import quiver_data
+
+# Per-worker state, set up once by _init_worker.
+_worker = {}
+
+#=======================================================================
+def _init_worker(path, outdir, pflag, narrows, dpi):
+    """Open the frames and build the figure and quiver for this worker."""
+    frames = np.load(path, mmap_mode='r')
+    nmax = frames.shape[1]
+    centres, u, v, cols, cmap, norm, nblock = quiver_data(frames[0], pflag, nmax, narrows)
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    quiv = ax.quiver(centres, centres, u, v, cols, norm=norm, cmap=cmap,
+                     headlength=0, pivot='middle', headwidth=1, scale=1.1*nmax/nblock)
+    ax.set_aspect('equal')
+    _worker.update(frames=frames, fig=fig, ax=ax, quiv=quiv, outdir=outdir,
+                   pflag=pflag, narrows=narrows, dpi=dpi)
+
+#=======================================================================
+def _render_frame(index):
+    """Update the worker's quiver with one frame and save it as a PNG."""
+    w = _worker
+    frame = np.asarray(w['frames'][index])
+    centres, u, v, cols, cmap, norm, nblock = quiver_data(frame, w['pflag'], frame.shape[0], w['narrows'])
+    w['quiv'].set_UVC(u, v, cols)
+    w['quiv'].set_clim(norm.vmin, norm.vmax)
+    w['ax'].set_title('Frame {:d}'.format(index))
+    filename = os.path.join(w['outdir'], 'frame_{:05d}.png'.format(index))
+    w['fig'].savefig(filename, dpi=w['dpi'])
+    return filename
+
+#=======================================================================
+def render_frames(path, outdir, pflag, processes=None, narrows=64, dpi=100):
+    """
+    Arguments:
+	  path (string) = .npy file holding the (nframes,nmax,nmax) frames;
+	  outdir (string) = directory to write the PNG frames to;
+	  pflag (int) = colouring of the arrows, as in plotdat;
+	  processes (int) = size of the rendering pool, None for all cores;
+	  narrows (int) = target number of arrows along each side;
+	  dpi (int) = resolution of the frames.
+    Description:
+      Render every frame to outdir/frame_NNNNN.png across a process pool.
+	Returns:
+	  filenames (list) = PNG files in frame order.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    nframes = np.load(path, mmap_mode='r').shape[0]
+    # Spawn rather than fork: forking a process that already runs an
+    # OpenMP thread pool (e.g. after a Numba parallel kernel) can hang.
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes, initializer=_init_worker,
+                  initargs=(path, outdir, pflag, narrows, dpi)) as pool:
+        return pool.map(_render_frame, range(nframes))
+
+#=======================================================================
+def _open_frames(filenames):
+    """Open the frames one at a time, closing each before the next."""
+    for filename in filenames:
+        with Image.open(filename) as image:
+            yield image
+
+#=======================================================================
+def encode_gif(filenames, output, fps=10):
+    """
+    Arguments:
+	  filenames (list) = PNG frames in order;
+	  output (string) = name of the GIF to write;
+	  fps (int) = frames per second.
+    Description:
+      Assemble rendered frames into a looping GIF.  The frames are
+      read one at a time, so only one PNG is open at once.
+	Returns:
+	  output (string) = name of the GIF written.
+    """
+    with Image.open(filenames[0]) as first:
+        first.save(output, save_all=True, append_images=_open_frames(filenames[1:]),
+                   duration=int(1000/fps), loop=0)
+    return output
+
+#=======================================================================
+if __name__ == '__main__':
+    if len(sys.argv) in (4, 5):
+        PATH = sys.argv[1]
+        OUTDIR = sys.argv[2]
+        PLOTFLAG = int(sys.argv[3])
+        PROCESSES = int(sys.argv[4]) if len(sys.argv) == 5 else None
+        pngs = render_frames(PATH, OUTDIR, PLOTFLAG, PROCESSES)
+        print("Rendered {:d} frames, wrote {}".format(len(pngs), encode_gif(pngs, os.path.join(OUTDIR, 'movie.gif'))))
+    else:
+        print("Usage: python {} <FRAMES> <OUTDIR> <PLOTFLAG> [<PROCESSES>]".format(sys.argv[0]))
@@ -0,0 +1,161 @@
+"""
+Out-of-core Lebwohl-Lasher runs on a memory-mapped lattice.
+
+The lattice lives in a .npy file opened with np.memmap, so its size is
+limited by disk rather than RAM.  A sweep visits the lattice one tile at
+a time: it reads the tile plus a one-site halo (with periodic
+wraparound), updates the sites of one colour with the checkerboard
+kernel and writes the tile interior back.  All tiles are done for
+colour 0 before any tile is done for colour 1, so the halo a tile reads
+is never stale.  Energy and order are accumulated tile by tile in the
+same way.  Peak resident memory is a few tile-sized arrays, whatever
+the lattice size.
+
+Run at the command line by typing:
+
+python ll_outofcore.py <ITERATIONS> <SIZE> <TEMPERATURE> <TILE> <PATH>
+
+where PATH is the .npy file holding the lattice; it is created with a
+random lattice if it does not exist, otherwise the run continues from it.
+"""
+
+import os
+import sys
+import time
+import numpy as np
+from LebwohlLasher import savedat
+from LebwohlLasherCheckerboard import field_padded, sweep_padded
+
+#=======================================================================
+def tiles(nmax, tile):
+    """Yield (r0, r1, c0, c1) for the tiles covering the lattice."""
+    for r0 in range(0, nmax, tile):
+        for c0 in range(0, nmax, tile):
+            yield r0, min(r0+tile, nmax), c0, min(c0+tile, nmax)
+#=======================================================================
+def read_tile(lat, r0, r1, c0, c1):
+    """Copy a tile and its periodic one-site halo into memory."""
+    nmax = lat.shape[0]
+    rows = np.arange(r0-1, r1+1)%nmax
+    cols = np.arange(c0-1, c1+1)%nmax
+    return np.asarray(lat[np.ix_(rows, cols)], dtype=np.float64)
+#=======================================================================
+def create_lattice(path, nmax, tile, dtype=np.float64):
+    """
+    Arguments:
+	  path (string) = .npy file to create;
+	  nmax (int) = side length of square lattice (even);
+	  tile (int) = side length of the tiles used to fill it;
+	  dtype = storage type of the lattice.
+    Description:
+      Create a memory-mapped lattice with random orientations in
+      [0,2pi), filled one tile at a time.
+	Returns:
+	  lat (memmap(nmax,nmax)) = the lattice.
+    """
+    lat = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(nmax,nmax))
+    for r0, r1, c0, c1 in tiles(nmax, tile):
+        lat[r0:r1,c0:c1] = np.random.random_sample((r1-r0,c1-c0))*2.0*np.pi
+    lat.flush()
+    return lat
+#=======================================================================
+def MC_step(lat, Ts, tile, rng=np.random, scale=None):
+    """
+    Arguments:
+	  lat (memmap(nmax,nmax)) = memory-mapped lattice;
+	  Ts (float) = reduced temperature;
+	  tile (int) = side length of the tiles;
+	  rng = np.random or a np.random.Generator;
+	  scale (float) = proposal width, default 0.1+Ts.
+    Description:
+      One checkerboard MC step done tile by tile.
+	Returns:
+	  ratio (float) = acceptance ratio for this MCS.
+    """
+    nmax = lat.shape[0]
+    if nmax%2:
+        raise ValueError("checkerboard updates need an even lattice size, got {}".format(nmax))
+    accept = 0
+    for colour in (0, 1):
+        for r0, r1, c0, c1 in tiles(nmax, tile):
+            block = read_tile(lat, r0, r1, c0, c1)
+            accept += sweep_padded(block, Ts, colour, r0+c0, rng, scale)
+            lat[r0:r1,c0:c1] = block[1:-1,1:-1]
+    lat.flush()
+    return accept/(nmax*nmax)
+#=======================================================================
+def observables(lat, tile):
+    """
+    Arguments:
+	  lat (memmap(nmax,nmax)) = memory-mapped lattice;
+	  tile (int) = side length of the tiles.
+    Description:
+      Total energy and order parameter accumulated tile by tile.  The
+      energy uses the molecular field, e_i = -1 - 0.75*(c_i C_i + s_i S_i),
+      and the order 1/4 + 3/4*|<exp(2i theta)>| as in the checkerboard code.
+	Returns:
+	  energy (float) = reduced energy of the lattice;
+	  order (float) = order parameter of the lattice.
+    """
+    nmax = lat.shape[0]
+    energy = 0.0
+    c2sum = 0.0
+    s2sum = 0.0
+    for r0, r1, c0, c1 in tiles(nmax, tile):
+        block = read_tile(lat, r0, r1, c0, c1)
+        C, S = field_padded(block)
+        c2 = np.cos(2.0*block[1:-1,1:-1])
+        s2 = np.sin(2.0*block[1:-1,1:-1])
+        energy += np.sum(-1.0 - 0.75*(c2*C + s2*S))
+        c2sum += c2.sum()
+        s2sum += s2.sum()
+    return energy, 0.25 + 0.75*np.hypot(c2sum, s2sum)/(nmax*nmax)
+#=======================================================================
+def main(program, nsteps, nmax, temp, tile, path):
+    """
+    Arguments:
+	  program (string) = the name of the program;
+	  nsteps (int) = number of Monte Carlo steps (MCS) to perform;
+      nmax (int) = side length of square lattice to simulate (even);
+	  temp (float) = reduced temperature (range 0 to 2);
+	  tile (int) = side length of the tiles held in memory;
+	  path (string) = .npy file holding the lattice.
+    Description:
+      Out-of-core version of LebwohlLasher.main.  Writes the same
+      output file; there is no plot, since the lattice never fits.
+    Returns:
+      NULL
+    """
+    if os.path.exists(path):
+        lattice = np.load(path, mmap_mode='r+')
+        if lattice.shape != (nmax,nmax):
+            raise ValueError("{} holds a {}x{} lattice, not {}x{}".format(path, *lattice.shape, nmax, nmax))
+    else:
+        lattice = create_lattice(path, nmax, tile)
+    energy = np.zeros(nsteps+1)
+    ratio = np.zeros(nsteps+1)
+    order = np.zeros(nsteps+1)
+    energy[0], order[0] = observables(lattice, tile)
+    ratio[0] = 0.5 # ideal value
+
+    initial = time.time()
+    for it in range(1,nsteps+1):
+        ratio[it] = MC_step(lattice,temp,tile)
+        energy[it], order[it] = observables(lattice,tile)
+    final = time.time()
+    runtime = final-initial
+
+    print("{}: Size: {:d}, Steps: {:d}, T*: {:5.3f}: Order: {:5.3f}, Time: {:8.6f} s".format(program, nmax,nsteps,temp,order[nsteps-1],runtime))
+    savedat(lattice,nsteps,temp,runtime,ratio,energy,order,nmax)
+#=======================================================================
+if __name__ == '__main__':
+    if int(len(sys.argv)) == 6:
+        PROGNAME = sys.argv[0]
+        ITERATIONS = int(sys.argv[1])
+        SIZE = int(sys.argv[2])
+        TEMPERATURE = float(sys.argv[3])
+        TILE = int(sys.argv[4])
+        PATH = sys.argv[5]
+        main(PROGNAME, ITERATIONS, SIZE, TEMPERATURE, TILE, PATH)
+    else:
+        print("Usage: python {} <ITERATIONS> <SIZE> <TEMPERATURE> <TILE> <PATH>".format(sys.argv[0]))
@@ -0,0 +1,215 @@
+"""
+Histogram reweighting for Lebwohl-Lasher runs.
+
+A run at one temperature T0 samples configurations with weight
+g(E) exp(-H/T0), so its energy histogram also determines averages at
+nearby temperatures (Ferrenberg-Swendsen).  EnergyHistogram collects
+the samples of a run in bins of the total energy E = all_energy, and in
+each bin keeps the sums of E, E^2, S and S^2.  Since the Boltzmann
+factor depends on the energy alone, these per-bin sums are all that
+reweighting needs; the binning only enters through the bin mean energy
+in the weight, and memory stays fixed however long the run is.
+
+all_energy counts every bond twice, so the Hamiltonian sampled by
+MC_step is H = E/2 and the weights are exp(-H/T).  The heat capacity
+is computed for H too, as in ll_stats.RunStats, so it is the slope
+d<H/N>/dT of the reweighted energy curve:
+
+  Cv  = (<H^2> - <H>^2)/(N T^2)
+  chi = N(<S^2> - <S>^2)/T
+
+reweight() extrapolates one histogram.  It is reliable only where the
+histogram at T0 still covers the energies that dominate at T, i.e.
+within a few standard deviations of the energy.  wham() combines runs
+at several temperatures by the multiple-histogram (WHAM) equations for
+the density of states,
+
+  ln g(E) = ln sum_k N_k(E) - ln sum_k n_k exp(f_k - H/T_k)
+  f_k     = -ln sum_E g(E) exp(-H/T_k)
+
+iterated to self-consistency, which covers the whole range spanned by
+the runs.
+
+Run at the command line by typing:
+
+python ll_reweight.py <TMIN> <TMAX> <NT> <HISTOGRAM> [<HISTOGRAM> ...]
+
+with the LL-Hist-*.npz files written by LebwohlLasher.py when its main
+is called with histogram=True.  One file is reweighted on its own,
+several are combined with WHAM.
+"""
+
+import sys
+import numpy as np
+
+# all_energy counts every bond twice: H = BOND*E.
+BOND = 0.5
+# Range of all_energy per site, four bonds each between -1 and 1/2.
+EMIN = -4.0
+EMAX = 2.0
+
+#=======================================================================
+class EnergyHistogram:
+    """
+    Histogram of the total energy of a run at reduced temperature Ts on
+    an nmax x nmax lattice, in bins of de per site.  Each bin holds the
+    number of samples and the sums of E, E^2, S and S^2 over them.
+    """
+    def __init__(self, nmax, Ts, de=0.01):
+        self.nmax = nmax
+        self.Ts = Ts
+        self.de = de
+        nbins = int(np.ceil((EMAX - EMIN)/de))
+        self.count = np.zeros(nbins)
+        self.esum = np.zeros(nbins)
+        self.e2sum = np.zeros(nbins)
+        self.s1 = np.zeros(nbins)
+        self.s2 = np.zeros(nbins)
+
+    def push(self, energy, order):
+        """Add one sample of the total energy and the order parameter."""
+        b = int((energy/(self.nmax*self.nmax) - EMIN)/self.de)
+        b = min(max(b, 0), len(self.count)-1)
+        self.count[b] += 1
+        self.esum[b] += energy
+        self.e2sum[b] += energy*energy
+        self.s1[b] += order
+        self.s2[b] += order*order
+
+    def save(self, filename):
+        """Write the histogram to an .npz file."""
+        np.savez(filename, nmax=self.nmax, Ts=self.Ts, de=self.de, count=self.count,
+                 esum=self.esum, e2sum=self.e2sum, s1=self.s1, s2=self.s2)
+
+    @classmethod
+    def load(cls, filename):
+        """Read a histogram written by save()."""
+        with np.load(filename) as data:
+            hist = cls(int(data['nmax']), float(data['Ts']), float(data['de']))
+            for name in ('count', 'esum', 'e2sum', 's1', 's2'):
+                setattr(hist, name, data[name])
+        return hist
+#=======================================================================
+def canonical(lng, count, esum, e2sum, s1, s2, nmax, temps):
+    """
+    Arguments:
+	  lng (float(m)) = ln g of the occupied bins, any additive constant;
+	  count, esum, e2sum, s1, s2 (float(m)) = pooled bin sums;
+      nmax (int) = side length of square lattice;
+	  temps (float(k)) = reduced temperatures to evaluate at.
+    Description:
+      Canonical averages from the density of states and the
+      microcanonical averages of each bin.
+	Returns:
+	  results (dict) = 'temperature', 'energy', 'heat_capacity', 'order'
+	      and 'susceptibility' -> float(k) arrays.
+    """
+    N = nmax*nmax
+    temps = np.asarray(temps, dtype=float)
+    ebar = esum/count
+    lw = lng[None,:] - BOND*ebar[None,:]/temps[:,None]
+    w = np.exp(lw - lw.max(axis=1, keepdims=True))
+    w /= w.sum(axis=1, keepdims=True)
+    e = w @ ebar
+    e2 = w @ (e2sum/count)
+    s = w @ (s1/count)
+    ss = w @ (s2/count)
+    return {'temperature': temps,
+            'energy': e,
+            'heat_capacity': BOND*BOND*(e2 - e*e)/(N*temps*temps),
+            'order': s,
+            'susceptibility': N*(ss - s*s)/temps}
+#=======================================================================
+def reweight(hist, temps):
+    """
+    Arguments:
+	  hist (EnergyHistogram) = histogram of one run;
+	  temps (float(k)) = reduced temperatures to evaluate at.
+    Description:
+      Single-histogram (Ferrenberg-Swendsen) reweighting.  At hist.Ts
+      it gives back the plain averages of the run.
+	Returns:
+	  results (dict) = as canonical().
+    """
+    full = hist.count > 0
+    ebar = hist.esum[full]/hist.count[full]
+    lng = np.log(hist.count[full]) + BOND*ebar/hist.Ts
+    return canonical(lng, hist.count[full], hist.esum[full], hist.e2sum[full],
+                     hist.s1[full], hist.s2[full], hist.nmax, temps)
+#=======================================================================
+def wham(hists, temps, tol=1e-10, maxiter=100000):
+    """
+    Arguments:
+	  hists (list of EnergyHistogram) = runs on the same lattice and
+	      bins at different temperatures;
+	  temps (float(k)) = reduced temperatures to evaluate at;
+	  tol (float) = convergence threshold on the free energies f_k;
+	  maxiter (int) = most WHAM iterations.
+    Description:
+      Multiple-histogram reweighting: solve the WHAM equations for
+      ln g(E) from all runs at once, then evaluate the averages.
+	Returns:
+	  results (dict) = as canonical(), plus 'free_energy' -> f_k of the
+	      runs and 'iterations'.
+    """
+    first = hists[0]
+    for hist in hists[1:]:
+        if hist.nmax != first.nmax or hist.de != first.de:
+            raise ValueError("histograms need the same lattice size and bin width")
+    count = sum(hist.count for hist in hists)
+    full = count > 0
+    count = count[full]
+    esum = sum(hist.esum for hist in hists)[full]
+    e2sum = sum(hist.e2sum for hist in hists)[full]
+    s1 = sum(hist.s1 for hist in hists)[full]
+    s2 = sum(hist.s2 for hist in hists)[full]
+    H = BOND*esum/count
+    beta = np.array([1.0/hist.Ts for hist in hists])
+    lnn = np.log([hist.count.sum() for hist in hists])
+    f = np.zeros(len(hists))
+    for it in range(1, maxiter+1):
+        den = lnn[:,None] + f[:,None] - beta[:,None]*H[None,:]
+        top = den.max(axis=0)
+        lng = np.log(count) - top - np.log(np.exp(den - top).sum(axis=0))
+        lz = lng[None,:] - beta[:,None]*H[None,:]
+        top = lz.max(axis=1)
+        new = -(top + np.log(np.exp(lz - top[:,None]).sum(axis=1)))
+        new -= new[0]
+        change = np.abs(new - f).max()
+        f = new
+        if change < tol:
+            break
+    results = canonical(lng, count, esum, e2sum, s1, s2, first.nmax, temps)
+    results['free_energy'] = f
+    results['iterations'] = it
+    return results
+#=======================================================================
+def main(tmin, tmax, nt, filenames):
+    """
+    Arguments:
+	  tmin, tmax (float) = range of reduced temperatures;
+	  nt (int) = number of temperatures;
+	  filenames (list of string) = LL-Hist-*.npz files.
+    Description:
+      Reweight one histogram or combine several with WHAM and print
+      the energy and heat capacity per site, order and susceptibility
+      on the temperature grid.
+    Returns:
+      NULL
+    """
+    hists = [EnergyHistogram.load(name) for name in filenames]
+    temps = np.linspace(tmin, tmax, nt)
+    results = reweight(hists[0], temps) if len(hists) == 1 else wham(hists, temps)
+    N = hists[0].nmax**2
+    print("#   T*       E/N        Cv        S        chi")
+    for i, T in enumerate(temps):
+        print("{:8.4f} {:9.5f} {:9.5f} {:8.5f} {:9.4f}".format(
+            T, results['energy'][i]/N, results['heat_capacity'][i],
+            results['order'][i], results['susceptibility'][i]))
+#=======================================================================
+if __name__ == '__main__':
+    if int(len(sys.argv)) >= 5:
+        main(float(sys.argv[1]), float(sys.argv[2]), int(sys.argv[3]), sys.argv[4:])
+    else:
+        print("Usage: python {} <TMIN> <TMAX> <NT> <HISTOGRAM> [<HISTOGRAM> ...]".format(sys.argv[0]))
+#=======================================================================
@@ -0,0 +1,201 @@
+"""
+Streaming statistics for Lebwohl-Lasher runs.
+
+The accumulators here are fed one sample at a time while the run is in
+progress, so means, fluctuations and error bars come out at the end
+without storing the time series or making a second pass over it:
+
+  Welford     - running mean and variance (and <x^2>, <x^4> for the
+                Binder cumulant), O(1) memory;
+  LogBlocking - Flyvbjerg-Petersen blocking done on the fly.  Level k
+                holds the statistics of averages over blocks of 2^k
+                consecutive samples, plus at most one half-finished
+                block, so memory is O(log n).  For correlated data the
+                naive error bar of level 0 is too small; it grows with k
+                and levels off once blocks are longer than the
+                correlation time, and that plateau is the error bar.
+  RunStats    - the two above for the energy and order of a run,
+                giving <E>, <S>, the specific heat, susceptibility and
+                Binder cumulant with their blocking errors.
+
+Fluctuation formulae, with N = nmax^2 sites, E the total reduced energy
+(all_energy) and S the order parameter.  all_energy counts every bond
+twice, so the Hamiltonian sampled by MC_step is H = E/2 and
+
+  Cv  = (<H^2> - <H>^2)/(N T^2)        (per site, = d<H/N>/dT)
+      = (<E^2> - <E>^2)/(4 N T^2)
+  chi = N(<S^2> - <S>^2)/T
+  U   = 1 - <S^4>/(3<S^2>^2)
+"""
+
+import numpy as np
+
+#=======================================================================
+class Welford:
+    """
+    Running mean and variance by Welford's update, which stays accurate
+    when the variance is small compared to the mean.  The raw moments
+    <x^2> and <x^4> are kept as running means too, for the Binder
+    cumulant.
+    """
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.mean2 = 0.0
+        self.mean4 = 0.0
+
+    def push(self, x):
+        """Add one sample."""
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta/self.n
+        self.m2 += delta*(x - self.mean)
+        x2 = x*x
+        self.mean2 += (x2 - self.mean2)/self.n
+        self.mean4 += (x2*x2 - self.mean4)/self.n
+
+    def var(self):
+        """Population variance <x^2> - <x>^2 of the samples so far."""
+        return self.m2/self.n if self.n else 0.0
+
+    def sem(self):
+        """Standard error of the mean, assuming uncorrelated samples."""
+        return np.sqrt(self.m2/(self.n*(self.n-1))) if self.n > 1 else 0.0
+
+    def binder(self):
+        """Binder cumulant 1 - <x^4>/(3<x^2>^2)."""
+        return 1.0 - self.mean4/(3.0*self.mean2**2) if self.n else 0.0
+#=======================================================================
+class LogBlocking:
+    """
+    Blocking analysis of a correlated series, one sample at a time.
+    levels[k] is a Welford accumulator over the means of blocks of 2^k
+    samples; pending[k] is the first half of the next level-(k+1) block,
+    or None.
+    """
+    def __init__(self):
+        self.levels = []
+        self.pending = []
+
+    def push(self, x):
+        """Add one sample, completing blocks up the tree as they fill."""
+        k = 0
+        while True:
+            if k == len(self.levels):
+                self.levels.append(Welford())
+                self.pending.append(None)
+            self.levels[k].push(x)
+            if self.pending[k] is None:
+                self.pending[k] = x
+                return
+            x = 0.5*(self.pending[k] + x)
+            self.pending[k] = None
+            k += 1
+
+    def errors(self, minblocks=16):
+        """
+        Arguments:
+	      minblocks (int) = ignore levels with fewer complete blocks.
+        Description:
+          Error bar of the mean from each blocking level, with the
+          uncertainty of that error bar, err/sqrt(2(n-1)).
+	    Returns:
+	      err, derr (float(nlevels)) = error bars and their uncertainties.
+        """
+        err = []
+        derr = []
+        for level in self.levels:
+            if level.n < max(minblocks,2):
+                break
+            e = level.sem()
+            err.append(e)
+            derr.append(e/np.sqrt(2.0*(level.n-1)))
+        return np.array(err), np.array(derr)
+
+    def error(self, minblocks=16):
+        """
+        Error bar of the mean: the first level whose error agrees with the
+        next level's to within its own uncertainty.  If the errors are
+        still growing at the last usable level the run is too short for
+        a plateau, and the largest error is returned.
+        """
+        err, derr = self.errors(minblocks)
+        if len(err) == 0:
+            return 0.0
+        for k in range(len(err)-1):
+            if err[k+1] - err[k] < derr[k]:
+                return err[k]
+        return err.max()
+
+    def tau(self, minblocks=16):
+        """Integrated autocorrelation time, tau = (err/err_0)^2 / 2."""
+        err, derr = self.errors(minblocks)
+        if len(err) == 0 or err[0] == 0.0:
+            return 0.5
+        return 0.5*(self.error(minblocks)/err[0])**2
+#=======================================================================
+class RunStats:
+    """
+    Accumulators for the energy and order parameter of a run at reduced
+    temperature Ts on an nmax x nmax lattice.  Call push(energy, order)
+    once per sample and summary() at the end.
+    """
+    def __init__(self, nmax, Ts):
+        self.nsites = nmax*nmax
+        self.Ts = Ts
+        self.energy = Welford()
+        self.order = Welford()
+        self.energy_blocks = LogBlocking()
+        self.order_blocks = LogBlocking()
+        self.e2_blocks = LogBlocking()
+        self.s2_blocks = LogBlocking()
+
+    def push(self, energy, order):
+        """Add one sample of the total energy and the order parameter."""
+        self.energy.push(energy)
+        self.order.push(order)
+        self.energy_blocks.push(energy)
+        self.order_blocks.push(order)
+        self.e2_blocks.push(energy*energy)
+        self.s2_blocks.push(order*order)
+
+    def summary(self):
+        """
+        Arguments:
+	      NULL
+        Description:
+          Final estimates with blocking error bars.  The errors of Cv and
+          chi are propagated from the blocking errors of <E>, <E^2> (and
+          <S>, <S^2>), which is adequate well away from a transition.
+	    Returns:
+	      stats (dict) = name -> (value, error); 'samples' -> (n, 0).
+        """
+        n = self.energy.n
+        N = self.nsites
+        T = self.Ts
+        e, s = self.energy.mean, self.order.mean
+        de, ds = self.energy_blocks.error(), self.order_blocks.error()
+        dcv = np.hypot(self.e2_blocks.error(), 2.0*e*de)/(4.0*N*T*T)
+        dchi = N*np.hypot(self.s2_blocks.error(), 2.0*s*ds)/T
+        return {'samples': (n, 0),
+                'energy': (e, de),
+                'order': (s, ds),
+                'heat_capacity': (self.energy.var()/(4.0*N*T*T), dcv),
+                'susceptibility': (N*self.order.var()/T, dchi),
+                'binder': (self.order.binder(), 0.0),
+                'tau_energy': (self.energy_blocks.tau(), 0.0),
+                'tau_order': (self.order_blocks.tau(), 0.0)}
+#=======================================================================
+def format_summary(stats):
+    """Lines of 'name: value +/- error' for a summary() dict."""
+    lines = []
+    for name, (value, err) in stats.items():
+        if name == 'samples':
+            lines.append("{:16s} {:d}".format(name+":", int(value)))
+        elif err:
+            lines.append("{:16s} {:.6g} +/- {:.2g}".format(name+":", value, err))
+        else:
+            lines.append("{:16s} {:.6g}".format(name+":", value))
+    return lines
+#=======================================================================
@@ -55,6 +55,46 @@ def compute_energy_vectorized(arr, ix_range, nmax):
     
     return energy.sum()
 
+def my_rows(nmax):
+    """Rows owned by this rank, as in MC_step_vectorized."""
+    base_chunk = nmax // size
+    extra = nmax % size
+    my_start = rank * base_chunk + min(rank, extra)
+    my_size = base_chunk + (1 if rank < extra else 0)
+    return np.arange(my_start, my_start + my_size)
+
+def observables(arr, ix_range, nmax):
+    """
+    Total energy and order parameter, 1/4 + 3/4|<exp(2i theta)>|.  Each rank
+    sums its own rows (bonds to the neighbouring rows included) and one
+    Allreduce combines the energy and the sums of cos(2 theta), sin(2 theta).
+    """
+    mine = arr[ix_range, :]
+    local = np.array([compute_energy_vectorized(arr, ix_range, nmax),
+                      np.cos(2.0*mine).sum(), np.sin(2.0*mine).sum()])
+    total = np.empty(3)
+    comm.Allreduce(local, total, op=MPI.SUM)
+    return total[0], 0.25 + 0.75*np.hypot(total[1], total[2])/(nmax*nmax)
+
+def savedat(nsteps, Ts, runtime, ratio, energy, order, nmax):
+    """Write the per-step ratio, energy and order in the serial LebwohlLasher.py format."""
+    current_datetime = datetime.datetime.now().strftime("%a-%d-%b-%Y-at-%I-%M-%S%p")
+    filename = f"LL-Output-{current_datetime}.txt"
+    with open(filename, "w") as FileOut:
+        print("#=====================================================", file=FileOut)
+        print(f"# File created:        {current_datetime}", file=FileOut)
+        print(f"# Size of lattice:     {nmax}x{nmax}", file=FileOut)
+        print(f"# Number of MC steps:  {nsteps}", file=FileOut)
+        print(f"# Reduced temperature: {Ts:5.3f}", file=FileOut)
+        print(f"# Run time (s):        {runtime:8.6f}", file=FileOut)
+        print(f"# MPI processes:       {size}", file=FileOut)
+        print("#=====================================================", file=FileOut)
+        print("# MC step:  Ratio:     Energy:   Order:", file=FileOut)
+        print("#=====================================================", file=FileOut)
+        rows = np.column_stack((np.arange(nsteps+1), ratio, energy, order))
+        np.savetxt(FileOut, rows, fmt="   %05d    %6.4f %12.4f  %6.4f ")
+    return filename
+
 def MC_step_vectorized(arr, Ts, nmax):
     """Perform one Monte Carlo step with vectorized operations."""
     debug_print(f"Starting vectorized MC_step with T={Ts}")
@@ -121,7 +161,8 @@ def MC_step_vectorized(arr, Ts, nmax):
     else:
         ratio = None
     
-    arr = comm.bcast(arr, root=0)
+    # In place, so every rank's lattice is current for the observables
+    comm.Bcast(arr, root=0)
     ratio = comm.bcast(ratio, root=0)
     
     return ratio
@@ -132,12 +173,18 @@ def main(program, nsteps, nmax, temp, pflag):
     
     # Initialize lattice
     lattice = initdat(nmax)
+    rows = my_rows(nmax)
     
     if rank == 0:
         ratio = np.zeros(nsteps+1)
+        energy = np.zeros(nsteps+1)
+        order = np.zeros(nsteps+1)
         ratio[0] = 0.5
     else:
-        ratio = None
+        ratio = energy = order = None
+    step_energy, step_order = observables(lattice, rows, nmax)
+    if rank == 0:
+        energy[0], order[0] = step_energy, step_order
 
     # Time the Monte Carlo steps
     initial = MPI.Wtime()
@@ -145,9 +192,11 @@ def main(program, nsteps, nmax, temp, pflag):
     for it in range(1, nsteps+1):
         debug_print(f"Starting step {it}")
         ratio_step = MC_step_vectorized(lattice, temp, nmax)
+        step_energy, step_order = observables(lattice, rows, nmax)
         
         if rank == 0:
             ratio[it] = ratio_step
+            energy[it], order[it] = step_energy, step_order
             if it % 5 == 0:
                 print(f"Completed {it}/{nsteps} steps")
     
@@ -155,8 +204,9 @@ def main(program, nsteps, nmax, temp, pflag):
     runtime = final - initial
     
     if rank == 0:
-        print(f"{program}: Size: {nmax}, Steps: {nsteps}, T*: {temp:5.3f}, "
+        print(f"{program}: Size: {nmax}, Steps: {nsteps}, T*: {temp:5.3f}: Order: {order[nsteps-1]:5.3f}, "
               f"Time: {runtime:8.6f} s, Processes: {size}")
+        savedat(nsteps, temp, runtime, ratio, energy, order, nmax)
 
 if __name__ == '__main__':
     if len(sys.argv) == 5:
@@ -91,6 +91,56 @@ def plotdat(arr,pflag,nmax):
     ax.set_aspect('equal')
     plt.show()
 #=======================================================================
+def record_dtype(extra=()):
+    """
+    Arguments:
+	  extra (tuple of strings) = names of any extra per-step observables.
+    Description:
+      Structured dtype for one row of run output: the MC step number
+      followed by float64 ratio, energy, order and the extra fields.
+	Returns:
+	  dtype (np.dtype) = record type.
+    """
+    return np.dtype([('step','i8')] + [(name,'f8') for name in ('ratio','energy','order') + tuple(extra)])
+#=======================================================================
+class RecordBuffer:
+    """
+    Preallocated buffer of per-step records (see record_dtype).  By
+    default it holds nrec records in memory.  Given spill=filename it
+    only holds chunk records and appends each full chunk to filename as
+    raw binary records, so memory use does not grow with nsteps.
+    """
+    def __init__(self, nrec, extra=(), chunk=65536, spill=None):
+        self.dtype = record_dtype(extra)
+        self.spill = spill
+        self.buf = np.zeros(nrec if spill is None else min(nrec,chunk), dtype=self.dtype)
+        self.n = 0
+        if spill is not None:
+            open(spill,"wb").close()
+
+    def append(self, step, ratio, energy, order, *extra):
+        """Store one record, spilling the buffer to disk first if it is full."""
+        if self.n == len(self.buf):
+            self.flush()
+        self.buf[self.n] = (step, ratio, energy, order) + extra
+        self.n += 1
+
+    def flush(self):
+        """Append the buffered records to the spill file."""
+        if self.spill is None:
+            raise IndexError("RecordBuffer is full and has no spill file")
+        with open(self.spill,"ab") as f:
+            self.buf[:self.n].tofile(f)
+        self.n = 0
+
+    def records(self):
+        """All records so far, read back from the spill file if there is one."""
+        if self.spill is None:
+            return self.buf[:self.n]
+        if self.n:
+            self.flush()
+        return np.memmap(self.spill, dtype=self.dtype, mode="r")
+#=======================================================================
 def savedat(arr,nsteps,Ts,runtime,ratio,energy,order,nmax):
     """
     Arguments:
@@ -123,9 +173,13 @@ def savedat(arr,nsteps,Ts,runtime,ratio,energy,order,nmax):
     print("#=====================================================",file=FileOut)
     print("# MC step:  Ratio:     Energy:   Order:",file=FileOut)
     print("#=====================================================",file=FileOut)
-    # Write the columns of data
-    for i in range(nsteps+1):
-        print("   {:05d}    {:6.4f} {:12.4f}  {:6.4f} ".format(i,ratio[i],energy[i],order[i]),file=FileOut)
+    # Write the columns of data, a chunk at a time so that spilled
+    # records are never all read into memory at once
+    chunk = 65536
+    for start in range(0,nsteps+1,chunk):
+        stop = min(start+chunk,nsteps+1)
+        rows = np.column_stack((np.arange(start,stop),ratio[start:stop],energy[start:stop],order[start:stop]))
+        np.savetxt(FileOut,rows,fmt="   %05d    %6.4f %12.4f  %6.4f ")
     FileOut.close()
 #=======================================================================
 def one_energy(arr,ix,iy,nmax):
@@ -254,14 +308,16 @@ def MC_step(arr,Ts,nmax):
                     arr[ix,iy] -= ang
     return accept/(nmax*nmax)
 #=======================================================================
-def main(program, nsteps, nmax, temp, pflag):
+def main(program, nsteps, nmax, temp, pflag, spill=None):
     """
     Arguments:
 	  program (string) = the name of the program;
 	  nsteps (int) = number of Monte Carlo steps (MCS) to perform;
       nmax (int) = side length of square lattice to simulate;
 	  temp (float) = reduced temperature (range 0 to 2);
-	  pflag (int) = a flag to control plotting.
+	  pflag (int) = a flag to control plotting;
+	  spill (string) = if given, file to spill the per-step records to
+	      in chunks instead of keeping them all in memory.
     Description:
       This is the main function running the Lebwohl-Lasher simulation.
     Returns:
@@ -271,28 +327,26 @@ def main(program, nsteps, nmax, temp, pflag):
     lattice = initdat(nmax)
     # Plot initial frame of lattice
     plotdat(lattice,pflag,nmax)
-    # Create arrays to store energy, acceptance ratio and order parameter
-    energy = np.zeros(nsteps+1,dtype=np.dtype)
-    ratio = np.zeros(nsteps+1,dtype=np.dtype)
-    order = np.zeros(nsteps+1,dtype=np.dtype)
-    # Set initial values in arrays
-    energy[0] = all_energy(lattice,nmax)
-    ratio[0] = 0.5 # ideal value
-    order[0] = get_order(lattice,nmax)
+    # Create a typed buffer to store step, acceptance ratio, energy and order parameter
+    records = RecordBuffer(nsteps+1,spill=spill)
+    # Set initial values in the buffer
+    records.append(0,0.5,all_energy(lattice,nmax),get_order(lattice,nmax)) # 0.5 is the ideal ratio
 
     # Begin doing and timing some MC steps.
     initial = time.time()
     for it in range(1,nsteps+1):
-        ratio[it] = MC_step(lattice,temp,nmax)
-        energy[it] = all_energy(lattice,nmax)
-        order[it] = get_order(lattice,nmax)
+        ratio = MC_step(lattice,temp,nmax)
+        energy = all_energy(lattice,nmax)
+        order = get_order(lattice,nmax)
+        records.append(it,ratio,energy,order)
     final = time.time()
     runtime = final-initial
     
     # Final outputs
-    print("{}: Size: {:d}, Steps: {:d}, T*: {:5.3f}: Order: {:5.3f}, Time: {:8.6f} s".format(program, nmax,nsteps,temp,order[nsteps-1],runtime))
+    data = records.records()
+    print("{}: Size: {:d}, Steps: {:d}, T*: {:5.3f}: Order: {:5.3f}, Time: {:8.6f} s".format(program, nmax,nsteps,temp,data['order'][nsteps-1],runtime))
     # Plot final frame of lattice and generate output file
-    savedat(lattice,nsteps,temp,runtime,ratio,energy,order,nmax)
+    savedat(lattice,nsteps,temp,runtime,data['ratio'],data['energy'],data['order'],nmax)
     plotdat(lattice,pflag,nmax)
 #=======================================================================
 # Main part of program, getting command line arguments and calling
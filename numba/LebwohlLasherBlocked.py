@@ -0,0 +1,175 @@
+"""
+Cache-blocked version of the Numba Lebwohl-Lasher code.
+
+The lattice is stored as nb x nb tiles of b x b sites, each tile
+contiguous in memory (shape (nb, nb, b, b), nmax = nb*b).  An MC step
+picks a tile at random and makes b*b attempts on random sites inside
+it before moving on.  The five reads of an attempt then mostly hit one
+tile that is already in cache, instead of five random places in a
+lattice much bigger than L2.
+
+Every attempt is a Metropolis move at a uniformly chosen site of the
+chosen tile, and tiles are chosen uniformly, so each attempt satisfies
+detailed balance on its own and the step keeps the Boltzmann
+distribution stationary.  A step is still nmax*nmax attempts.
+
+to_blocked/from_blocked convert to and from the plain (nmax, nmax)
+array used by plotdat and savedat.
+
+Run at the command line by typing:
+
+python LebwohlLasherBlocked.py <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> <BLOCK>
+"""
+
+import sys
+import time
+import numpy as np
+from numba import jit
+from LebwohlLasherNumba import initdat, plotdat, savedat, kahan_add
+
+#=======================================================================
+def to_blocked(arr, b):
+    """Convert an (nmax, nmax) lattice to contiguous (nb, nb, b, b) tiles"""
+    nmax = arr.shape[0]
+    if nmax % b:
+        raise ValueError("block size {} does not divide lattice size {}".format(b, nmax))
+    nb = nmax//b
+    return np.ascontiguousarray(arr.reshape(nb, b, nb, b).transpose(0, 2, 1, 3))
+
+#=======================================================================
+def from_blocked(blk):
+    """Convert (nb, nb, b, b) tiles back to an (nmax, nmax) lattice"""
+    nb, b = blk.shape[0], blk.shape[2]
+    return np.ascontiguousarray(blk.transpose(0, 2, 1, 3).reshape(nb*b, nb*b))
+
+#=======================================================================
+@jit(nopython=True)
+def one_energy(blk, I, J, a, c):
+    """Energy of site (a, c) of tile (I, J) with periodic boundaries"""
+    nb = blk.shape[0]
+    b = blk.shape[2]
+    th = blk[I,J,a,c]
+    en = 0.0
+
+    # Neighbours inside the tile when possible, else in the next tile
+    if a+1 < b:
+        ang = th - blk[I,J,a+1,c]
+    else:
+        ang = th - blk[(I+1)%nb,J,0,c]
+    en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    if a > 0:
+        ang = th - blk[I,J,a-1,c]
+    else:
+        ang = th - blk[(I-1+nb)%nb,J,b-1,c]
+    en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    if c+1 < b:
+        ang = th - blk[I,J,a,c+1]
+    else:
+        ang = th - blk[I,(J+1)%nb,a,0]
+    en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    if c > 0:
+        ang = th - blk[I,J,a,c-1]
+    else:
+        ang = th - blk[I,(J-1+nb)%nb,a,b-1]
+    en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    return en
+
+#=======================================================================
+@jit(nopython=True)
+def all_energy(blk):
+    """Total lattice energy, walking the tiles in memory order"""
+    nb = blk.shape[0]
+    b = blk.shape[2]
+    enall = 0.0
+    comp = 0.0
+    for I in range(nb):
+        for J in range(nb):
+            for a in range(b):
+                for c in range(b):
+                    enall, comp = kahan_add(enall, comp, one_energy(blk, I, J, a, c))
+    return enall
+
+#=======================================================================
+@jit(nopython=True)
+def get_order(blk):
+    """Order parameter, 1/4 + 3/4|<exp(2i theta)>| as for get_order_tensor"""
+    c2 = 0.0
+    s2 = 0.0
+    for th in blk.ravel():
+        c2 += np.cos(2.0*th)
+        s2 += np.sin(2.0*th)
+    n = blk.size
+    return 0.25 + 0.75*np.sqrt(c2*c2 + s2*s2)/n
+
+#=======================================================================
+@jit(nopython=True)
+def MC_step(blk, Ts):
+    """Monte Carlo step visiting random tiles, b*b attempts per tile"""
+    nb = blk.shape[0]
+    b = blk.shape[2]
+    scale = 0.1 + Ts
+    accept = 0
+
+    for t in range(nb*nb):
+        I = np.random.randint(0, nb)
+        J = np.random.randint(0, nb)
+        for k in range(b*b):
+            a = np.random.randint(0, b)
+            c = np.random.randint(0, b)
+            ang = np.random.normal(0, scale)
+
+            en0 = one_energy(blk, I, J, a, c)
+            blk[I,J,a,c] += ang
+            en1 = one_energy(blk, I, J, a, c)
+
+            if en1 <= en0:
+                accept += 1
+            else:
+                boltz = np.exp(-(en1 - en0) / Ts)
+                if boltz >= np.random.random():
+                    accept += 1
+                else:
+                    blk[I,J,a,c] -= ang
+
+    return accept/(nb*nb*b*b)
+
+#=======================================================================
+def main(program, nsteps, nmax, temp, pflag, b):
+    """Main simulation function"""
+    lattice = to_blocked(initdat(nmax), b)
+    plotdat(from_blocked(lattice),pflag,nmax)
+
+    energy = np.zeros(nsteps+1)
+    ratio = np.zeros(nsteps+1)
+    order = np.zeros(nsteps+1)
+
+    energy[0] = all_energy(lattice)
+    ratio[0] = 0.5
+    order[0] = get_order(lattice)
+
+    initial = time.time()
+    for it in range(1,nsteps+1):
+        ratio[it] = MC_step(lattice,temp)
+        energy[it] = all_energy(lattice)
+        order[it] = get_order(lattice)
+    final = time.time()
+    runtime = final-initial
+
+    print("{}: Size: {:d}, Steps: {:d}, T*: {:5.3f}: Order: {:5.3f}, Time: {:8.6f} s, Block: {:d}".format(
+        program, nmax, nsteps, temp, order[nsteps-1], runtime, b))
+
+    savedat(from_blocked(lattice),nsteps,temp,runtime,ratio,energy,order,nmax)
+    plotdat(from_blocked(lattice),pflag,nmax)
+
+#=======================================================================
+if __name__ == '__main__':
+    if int(len(sys.argv)) == 6:
+        PROGNAME = sys.argv[0]
+        ITERATIONS = int(sys.argv[1])
+        SIZE = int(sys.argv[2])
+        TEMPERATURE = float(sys.argv[3])
+        PLOTFLAG = int(sys.argv[4])
+        BLOCK = int(sys.argv[5])
+        main(PROGNAME, ITERATIONS, SIZE, TEMPERATURE, PLOTFLAG, BLOCK)
+    else:
+        print("Usage: python {} <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> <BLOCK>".format(sys.argv[0]))
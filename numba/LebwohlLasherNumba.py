@@ -2,6 +2,26 @@
 Numba-optimized version of the Lebwohl-Lasher code.
 Based on the original by SH 16-Oct-23
 Optimized using Numba JIT compilation
+
+The kernels are compiled eagerly for float64 and float32 lattices.  The
+arithmetic runs in the precision of the lattice; lattice sums use Kahan
+compensation and are returned in float64, so float32 totals stay
+accurate on large lattices.  Use <PRECISION> = validate to compare the
+two precisions from the same seed.
+
+<OVERRELAX> overrelaxation sweeps follow each MC step.  They reflect
+every director about its molecular field, theta -> atan2(S, C) - theta
+with C, S the neighbour sums of cos(2 theta), sin(2 theta), which keeps
+the energy fixed and speeds up decorrelation at low temperature.
+
+<UPDATE> = heatbath replaces the Metropolis step by a heat-bath sweep:
+2 theta of each site is drawn from its von Mises local distribution
+about atan2(S, C) with concentration 0.75*sqrt(C^2 + S^2)/T.
+
+<NHIT> > 1 gives every visited site nhit Metropolis proposals in a row
+(MC_step_multihit).  Its four neighbour angles are loaded once and the
+site energy is carried between proposals, so each load buys several
+moves; the ratio is per proposal.
 """
 
 import sys
@@ -17,11 +37,51 @@ def initdat(nmax):
     """Initialize lattice with random orientations"""
     return np.random.random_sample((nmax,nmax))*2.0*np.pi
 
+# Eager signatures: (lattice, ...) for float64 and float32 lattices,
+# C-contiguous first and then any layout (transposes, sliced views).
+SIG_SITE = ["float64(float64[:, ::1], int64, int64, int64)",
+            "float32(float32[:, ::1], int64, int64, int64)",
+            "float64(float64[:, :], int64, int64, int64)",
+            "float32(float32[:, :], int64, int64, int64)"]
+SIG_LATTICE = ["float64(float64[:, ::1], int64)",
+               "float64(float32[:, ::1], int64)",
+               "float64(float64[:, :], int64)",
+               "float64(float32[:, :], int64)"]
+SIG_STEP = ["float64(float64[:, ::1], float64, int64)",
+            "float64(float32[:, ::1], float64, int64)",
+            "float64(float64[:, :], float64, int64)",
+            "float64(float32[:, :], float64, int64)"]
+SIG_SWEEP = ["void(float64[:, ::1], int64)",
+             "void(float32[:, ::1], int64)",
+             "void(float64[:, :], int64)",
+             "void(float32[:, :], int64)"]
+SIG_HIT = ["float64(float64[:, ::1], float64, int64, int64)",
+           "float64(float32[:, ::1], float64, int64, int64)",
+           "float64(float64[:, :], float64, int64, int64)",
+           "float64(float32[:, :], float64, int64, int64)"]
+
 #=======================================================================
 @jit(nopython=True)
+def kahan_add(total, comp, x):
+    """One step of compensated summation, returns the new (total, comp)"""
+    y = x - comp
+    t = total + y
+    return t, (t - total) - y
+
+#=======================================================================
+@jit(nopython=True)
+def seed(s):
+    """Seed Numba's random number generator"""
+    np.random.seed(s)
+
+#=======================================================================
+@jit(SIG_SITE, nopython=True)
 def one_energy(arr, ix, iy, nmax):
     """Compute energy of a single cell with periodic boundaries"""
-    en = 0.0
+    half = arr.dtype.type(0.5)
+    one = arr.dtype.type(1.0)
+    three = arr.dtype.type(3.0)
+    en = arr.dtype.type(0.0)
     ixp = (ix+1)%nmax
     ixm = (ix-1)%nmax
     iyp = (iy+1)%nmax
@@ -29,41 +89,52 @@ def one_energy(arr, ix, iy, nmax):
 
     # Calculate neighbor contributions
     ang = arr[ix,iy]-arr[ixp,iy]
-    en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    en += half*(one - three*np.cos(ang)**2)
     ang = arr[ix,iy]-arr[ixm,iy]
-    en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    en += half*(one - three*np.cos(ang)**2)
     ang = arr[ix,iy]-arr[ix,iyp]
-    en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    en += half*(one - three*np.cos(ang)**2)
     ang = arr[ix,iy]-arr[ix,iym]
-    en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    en += half*(one - three*np.cos(ang)**2)
     return en
 
 #=======================================================================
-@jit(nopython=True, parallel=True)
+@jit(SIG_LATTICE, nopython=True, parallel=True)
 def all_energy(arr, nmax):
     """Compute total lattice energy in parallel"""
-    enall = 0.0
+    rows = np.empty(nmax)
     for i in prange(nmax):
+        row = arr.dtype.type(0.0)
+        comp = arr.dtype.type(0.0)
         for j in range(nmax):
-            enall += one_energy(arr,i,j,nmax)
+            row, comp = kahan_add(row, comp, one_energy(arr,i,j,nmax))
+        rows[i] = row
+    enall = 0.0
+    comp = 0.0
+    for i in range(nmax):
+        enall, comp = kahan_add(enall, comp, rows[i])
     return enall
 
 #=======================================================================
-@jit(nopython=True)
+@jit(SIG_LATTICE, nopython=True)
 def get_order_tensor(arr, nmax):
     """Calculate Q tensor components"""
-    Qxx = 0.0
-    Qxy = 0.0
-    Qyy = 0.0
-    
+    zero = arr.dtype.type(0.0)
+    Sxx, Sxy, Syy = zero, zero, zero
+    Cxx, Cxy, Cyy = zero, zero, zero
+
     for i in range(nmax):
         for j in range(nmax):
             cos_theta = np.cos(arr[i,j])
             sin_theta = np.sin(arr[i,j])
-            Qxx += 3*cos_theta*cos_theta - 1
-            Qxy += 3*cos_theta*sin_theta
-            Qyy += 3*sin_theta*sin_theta - 1
-            
+            Sxx, Cxx = kahan_add(Sxx, Cxx, cos_theta*cos_theta)
+            Sxy, Cxy = kahan_add(Sxy, Cxy, cos_theta*sin_theta)
+            Syy, Cyy = kahan_add(Syy, Cyy, sin_theta*sin_theta)
+
+    # Q_ab = sum(3 l_a l_b - delta_ab), accumulated above as sums of l_a l_b
+    Qxx = 3.0*np.float64(Sxx) - nmax*nmax
+    Qxy = 3.0*np.float64(Sxy)
+    Qyy = 3.0*np.float64(Syy) - nmax*nmax
     norm = 2.0*nmax*nmax
     Qxx /= norm
     Qxy /= norm
@@ -80,7 +151,7 @@ def get_order_tensor(arr, nmax):
     return max(lambda1, lambda2)
 
 #=======================================================================
-@jit(nopython=True)
+@jit(SIG_STEP, nopython=True)
 def MC_step(arr, Ts, nmax):
     """Optimized Monte Carlo step"""
     scale = 0.1 + Ts
@@ -91,7 +162,7 @@ def MC_step(arr, Ts, nmax):
         for j in range(nmax):
             ix = np.random.randint(0, nmax)
             iy = np.random.randint(0, nmax)
-            ang = np.random.normal(0, scale)
+            ang = arr.dtype.type(np.random.normal(0, scale))
             
             en0 = one_energy(arr, ix, iy, nmax)
             arr[ix,iy] += ang
@@ -108,6 +179,73 @@ def MC_step(arr, Ts, nmax):
                     
     return accept/(nmax*nmax)
 
+#=======================================================================
+@jit(nopython=True)
+def cached_energy(th, n0, n1, n2, n3):
+    """Energy of a cell at angle th with neighbour angles n0..n3"""
+    en = 0.0
+    for other in (n0, n1, n2, n3):
+        c = np.cos(th - other)
+        en += 0.5*(1.0 - 3.0*c*c)
+    return en
+
+#=======================================================================
+@jit(SIG_HIT, nopython=True)
+def MC_step_multihit(arr, Ts, nmax, nhit):
+    """Monte Carlo step with nhit proposals per visited cell on cached neighbours"""
+    scale = 0.1 + Ts
+    accept = 0
+    for i in range(nmax):
+        for j in range(nmax):
+            ix = np.random.randint(0, nmax)
+            iy = np.random.randint(0, nmax)
+            n0 = arr[(ix+1)%nmax,iy]
+            n1 = arr[(ix-1)%nmax,iy]
+            n2 = arr[ix,(iy+1)%nmax]
+            n3 = arr[ix,(iy-1)%nmax]
+            th = arr[ix,iy]
+            en0 = cached_energy(th, n0, n1, n2, n3)
+            for hit in range(nhit):
+                trial = th + arr.dtype.type(np.random.normal(0, scale))
+                en1 = cached_energy(trial, n0, n1, n2, n3)
+                if en1 <= en0 or np.exp(-(en1 - en0) / Ts) >= np.random.random():
+                    accept += 1
+                    th = trial
+                    en0 = en1
+            arr[ix,iy] = th
+    return accept/(nmax*nmax*nhit)
+
+#=======================================================================
+@jit(nopython=True)
+def local_field(arr, ix, iy, nmax):
+    """Neighbour sums of cos(2 theta) and sin(2 theta) of one cell"""
+    C = 0.0
+    S = 0.0
+    for jx, jy in ((ix+1)%nmax, iy), ((ix-1)%nmax, iy), (ix, (iy+1)%nmax), (ix, (iy-1)%nmax):
+        C += np.cos(2.0*arr[jx,jy])
+        S += np.sin(2.0*arr[jx,jy])
+    return C, S
+
+#=======================================================================
+@jit(SIG_SWEEP, nopython=True)
+def overrelax_step(arr, nmax):
+    """Overrelaxation sweep: reflect every director about its molecular field"""
+    for ix in range(nmax):
+        for iy in range(nmax):
+            C, S = local_field(arr, ix, iy, nmax)
+            arr[ix,iy] = arr.dtype.type(np.arctan2(S, C)) - arr[ix,iy]
+
+#=======================================================================
+@jit(SIG_STEP, nopython=True)
+def heatbath_step(arr, Ts, nmax):
+    """Heat-bath sweep: draw every angle from its local distribution, nothing is rejected"""
+    for ix in range(nmax):
+        for iy in range(nmax):
+            C, S = local_field(arr, ix, iy, nmax)
+            kappa = 0.75*np.sqrt(C*C + S*S)/Ts
+            arr[ix,iy] = arr.dtype.type(0.5*np.random.vonmises(np.arctan2(S, C), kappa))
+    return 1.0
+
 #=======================================================================
 def plotdat(arr,pflag,nmax):
     """Plot lattice configuration"""
@@ -159,10 +297,20 @@ def savedat(arr,nsteps,Ts,runtime,ratio,energy,order,nmax):
             print("   {:05d}    {:6.4f} {:12.4f}  {:6.4f} ".format(i,ratio[i],energy[i],order[i]),file=FileOut)
 
 #=======================================================================
-def main(program, nsteps, nmax, temp, pflag):
-    """Main simulation function"""
+def main(program, nsteps, nmax, temp, pflag, dtype=np.float64, nover=0, update='metropolis', nhit=1):
+    """
+    Main simulation function, dtype selects a float64 or float32 lattice,
+    nover overrelaxation sweeps per step, update 'metropolis' or 'heatbath'
+    and nhit Metropolis proposals per visited cell
+    """
+    steps = {'metropolis': MC_step, 'heatbath': heatbath_step}
+    if update not in steps:
+        raise ValueError("unknown update {!r}, use 'metropolis' or 'heatbath'".format(update))
+    step = steps[update]
+    if update == 'metropolis' and nhit > 1:
+        step = lambda lattice, temp, nmax: MC_step_multihit(lattice, temp, nmax, nhit)
     # Create and initialise lattice
-    lattice = initdat(nmax)
+    lattice = initdat(nmax).astype(dtype)
     plotdat(lattice,pflag,nmax)
     
     # Initialize arrays for measurements
@@ -178,7 +326,9 @@ def main(program, nsteps, nmax, temp, pflag):
     # Perform MC steps with timing
     initial = time.time()
     for it in range(1,nsteps+1):
-        ratio[it] = MC_step(lattice,temp,nmax)
+        ratio[it] = step(lattice,temp,nmax)
+        for _ in range(nover):
+            overrelax_step(lattice,nmax)
         energy[it] = all_energy(lattice,nmax)
         order[it] = get_order_tensor(lattice,nmax)
     final = time.time()
@@ -190,14 +340,56 @@ def main(program, nsteps, nmax, temp, pflag):
     savedat(lattice,nsteps,temp,runtime,ratio,energy,order,nmax)
     plotdat(lattice,pflag,nmax)
 
+#=======================================================================
+def validate(nsteps, nmax, temp, s=0):
+    """
+    Run float64 and float32 lattices from the same start and seed and
+    compare.  Step 0 differs by precision alone; later steps drift apart
+    as accept decisions diverge, so compare run averages there.
+    """
+    np.random.seed(s)
+    start = initdat(nmax)
+    runs = {}
+    for dtype in (np.float64, np.float32):
+        lattice = start.astype(dtype)
+        energy = np.zeros(nsteps+1)
+        ratio = np.zeros(nsteps+1)
+        order = np.zeros(nsteps+1)
+        energy[0] = all_energy(lattice,nmax)
+        ratio[0] = 0.5
+        order[0] = get_order_tensor(lattice,nmax)
+        seed(s)
+        for it in range(1,nsteps+1):
+            ratio[it] = MC_step(lattice,temp,nmax)
+            energy[it] = all_energy(lattice,nmax)
+            order[it] = get_order_tensor(lattice,nmax)
+        runs[dtype] = (energy, ratio, order)
+    en64, ratio64, ord64 = runs[np.float64]
+    en32, ratio32, ord32 = runs[np.float32]
+    return {
+        'energy0_rel': abs(en32[0] - en64[0])/abs(en64[0]),
+        'order0_abs': abs(ord32[0] - ord64[0]),
+        'energy_mean_rel': abs(en32.mean() - en64.mean())/abs(en64.mean()),
+        'order_mean_abs': abs(ord32.mean() - ord64.mean()),
+        'ratio_mean_abs': abs(ratio32.mean() - ratio64.mean()),
+    }
+
 #=======================================================================
 if __name__ == '__main__':
-    if int(len(sys.argv)) == 5:
+    if int(len(sys.argv)) in (5, 6, 7, 8, 9):
         PROGNAME = sys.argv[0]
         ITERATIONS = int(sys.argv[1])
         SIZE = int(sys.argv[2])
         TEMPERATURE = float(sys.argv[3])
         PLOTFLAG = int(sys.argv[4])
-        main(PROGNAME, ITERATIONS, SIZE, TEMPERATURE, PLOTFLAG)
+        PRECISION = sys.argv[5] if len(sys.argv) >= 6 else 'float64'
+        OVERRELAX = int(sys.argv[6]) if len(sys.argv) >= 7 else 0
+        UPDATE = sys.argv[7] if len(sys.argv) >= 8 else 'metropolis'
+        NHIT = int(sys.argv[8]) if len(sys.argv) == 9 else 1
+        if PRECISION == 'validate':
+            for key, value in validate(ITERATIONS, SIZE, TEMPERATURE).items():
+                print("{:16s} {:.3e}".format(key, value))
+        else:
+            main(PROGNAME, ITERATIONS, SIZE, TEMPERATURE, PLOTFLAG, np.dtype(PRECISION).type, OVERRELAX, UPDATE, NHIT)
     else:
-        print("Usage: python {} <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG>".format(sys.argv[0]))
\ No newline at end of file
+        print("Usage: python {} <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> [<float64|float32|validate> [<OVERRELAX> [<metropolis|heatbath> [<NHIT>]]]]".format(sys.argv[0]))
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+Low-memory version of the Numba Lebwohl-Lasher code.
+
+The pair energy 0.5*(1 - 3cos^2(theta_i - theta_j)) only depends on the
+angles modulo pi, so the lattice can be stored wrapped into [0,pi) at
+reduced precision:
+
+  mode = 'float32': angles as float32, half the memory of float64;
+  mode = 'uint16':  fixed-point codes q with theta = q*pi/65536, a
+                    quarter of the memory.
+
+The kernels decode each angle to double precision as it is loaded, and
+a Monte Carlo move stores the wrapped and rounded new angle.  For
+uint16 the code grid is uniform and the wrap theta -> theta+pi is exact
+(q mod 65536), so rounding the symmetric Gaussian proposal keeps it
+symmetric and the chain satisfies detailed balance on the stored states.
+float32 has no such grid: its spacing doubles at 0.5, 1 and 2, and pi
+itself is not representable, so the wrap and the proposal are only
+symmetric to within the rounding of one stored angle, d below.  In both
+modes the energies are computed in double precision from the stored
+angles and are exact for the stored states.
+
+Error bound for encoding a float64 lattice: storage moves each angle by
+at most d = pi/2^17 (uint16) or d = pi*2^-24 (float32, half an ulp
+below pi).  |de/dtheta| of a bond is 1.5|sin(2 theta)| <= 1.5, so each
+bond changes by at most 3d and one_energy (4 bonds) and the energy per
+site from all_energy by at most 12d: 2.9e-4 for uint16 and 2.3e-6 for
+float32.
+
+Run at the command line by typing:
+
+python LebwohlLasherQuantized.py <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> <MODE>
+"""
+
+import sys
+import time
+import numpy as np
+from numba import jit
+from LebwohlLasherNumba import plotdat, savedat
+
+# Storage dtype and decode factor for each mode.
+MODES = {'float32': (np.float32, 1.0),
+         'uint16': (np.uint16, np.pi/65536)}
+
+#=======================================================================
+def encode(arr, mode):
+    """Wrap float64 angles into [0,pi) and store them in the given mode."""
+    dtype, step = MODES[mode]
+    wrapped = np.mod(arr, np.pi)
+    if mode == 'uint16':
+        return (np.rint(wrapped/step).astype(np.int64) % 65536).astype(dtype)
+    return wrapped.astype(dtype)
+
+#=======================================================================
+def decode(q, mode):
+    """Convert stored angles back to float64."""
+    return q.astype(np.float64)*MODES[mode][1]
+
+#=======================================================================
+def initdat(nmax, mode):
+    """Initialize lattice with random orientations in the given mode"""
+    return encode(np.random.random_sample((nmax,nmax))*np.pi, mode)
+
+#=======================================================================
+@jit(nopython=True)
+def one_energy(q, ix, iy, nmax, step):
+    """Energy of a single cell, decoding the stored angles on the fly"""
+    en = 0.0
+    ixp = (ix+1)%nmax
+    ixm = (ix-1)%nmax
+    iyp = (iy+1)%nmax
+    iym = (iy-1)%nmax
+
+    th = q[ix,iy]*step
+    ang = th - q[ixp,iy]*step
+    en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    ang = th - q[ixm,iy]*step
+    en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    ang = th - q[ix,iyp]*step
+    en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    ang = th - q[ix,iym]*step
+    en += 0.5*(1.0 - 3.0*np.cos(ang)**2)
+    return en
+
+#=======================================================================
+@jit(nopython=True)
+def all_energy(q, nmax, step):
+    """Compute total lattice energy"""
+    enall = 0.0
+    for i in range(nmax):
+        for j in range(nmax):
+            enall += one_energy(q,i,j,nmax,step)
+    return enall
+
+#=======================================================================
+@jit(nopython=True)
+def get_order(q, nmax, step):
+    """Order parameter from the 2D Q tensor, S = 1/4 + 3/4|<exp(2i theta)>|"""
+    c2 = 0.0
+    s2 = 0.0
+    for i in range(nmax):
+        for j in range(nmax):
+            th = 2.0*q[i,j]*step
+            c2 += np.cos(th)
+            s2 += np.sin(th)
+    c2 /= nmax*nmax
+    s2 /= nmax*nmax
+    return 0.25 + 0.75*np.sqrt(c2*c2 + s2*s2)
+
+#=======================================================================
+@jit(nopython=True)
+def MC_step(q, Ts, nmax, step, fixed):
+    """
+    Monte Carlo step on a stored lattice.  fixed selects the uint16 path,
+    where the proposal is rounded to a whole number of codes.
+    """
+    scale = 0.1 + Ts
+    accept = 0
+
+    for i in range(nmax):
+        for j in range(nmax):
+            ix = np.random.randint(0, nmax)
+            iy = np.random.randint(0, nmax)
+            ang = np.random.normal(0, scale)
+
+            old = q[ix,iy]
+            en0 = one_energy(q, ix, iy, nmax, step)
+            if fixed:
+                q[ix,iy] = (np.int64(old) + np.int64(np.rint(ang/step))) % 65536
+            else:
+                q[ix,iy] = (old + ang) % np.pi
+            en1 = one_energy(q, ix, iy, nmax, step)
+
+            if en1 <= en0:
+                accept += 1
+            else:
+                boltz = np.exp(-(en1 - en0) / Ts)
+                if boltz >= np.random.random():
+                    accept += 1
+                else:
+                    q[ix,iy] = old
+
+    return accept/(nmax*nmax)
+
+#=======================================================================
+def main(program, nsteps, nmax, temp, pflag, mode):
+    """Main simulation function"""
+    step = MODES[mode][1]
+    fixed = mode == 'uint16'
+    lattice = initdat(nmax, mode)
+    plotdat(decode(lattice, mode),pflag,nmax)
+
+    energy = np.zeros(nsteps+1)
+    ratio = np.zeros(nsteps+1)
+    order = np.zeros(nsteps+1)
+
+    energy[0] = all_energy(lattice,nmax,step)
+    ratio[0] = 0.5
+    order[0] = get_order(lattice,nmax,step)
+
+    initial = time.time()
+    for it in range(1,nsteps+1):
+        ratio[it] = MC_step(lattice,temp,nmax,step,fixed)
+        energy[it] = all_energy(lattice,nmax,step)
+        order[it] = get_order(lattice,nmax,step)
+    final = time.time()
+    runtime = final-initial
+
+    print("{}: Size: {:d}, Steps: {:d}, T*: {:5.3f}: Order: {:5.3f}, Time: {:8.6f} s, Storage: {}".format(
+        program, nmax, nsteps, temp, order[nsteps-1], runtime, mode))
+
+    savedat(decode(lattice, mode),nsteps,temp,runtime,ratio,energy,order,nmax)
+    plotdat(decode(lattice, mode),pflag,nmax)
+
+#=======================================================================
+if __name__ == '__main__':
+    if int(len(sys.argv)) == 6:
+        PROGNAME = sys.argv[0]
+        ITERATIONS = int(sys.argv[1])
+        SIZE = int(sys.argv[2])
+        TEMPERATURE = float(sys.argv[3])
+        PLOTFLAG = int(sys.argv[4])
+        MODE = sys.argv[5]
+        main(PROGNAME, ITERATIONS, SIZE, TEMPERATURE, PLOTFLAG, MODE)
+    else:
+        print("Usage: python {} <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> <float32|uint16>".format(sys.argv[0]))
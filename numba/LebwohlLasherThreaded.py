@@ -0,0 +1,141 @@
+"""
+Thread-pool version of the Numba Lebwohl-Lasher code.
+
+The lattice is cut into horizontal strips of rows.  Sites are coloured
+like a chess board, (i+j)%2, and a site only interacts with sites of
+the other colour, so every site of one colour can be updated at the
+same time, including sites on either side of a strip boundary.  One MC
+step submits a colour-0 sweep of every strip to a
+concurrent.futures.ThreadPoolExecutor, waits for all of them, then does
+the same for colour 1: one attempt per site per step.
+
+The strip kernels are compiled with nogil=True, so the pool threads run
+them truly in parallel.  They call one_energy from LebwohlLasherNumba
+and use Numba's per-thread random state.  The strip count and pool size
+are chosen at run time, and no Numba parallel runtime (prange) or C
+compiler is involved.  The lattice side must be even so that the
+colouring is consistent across the periodic boundaries.
+
+Run at the command line by typing:
+
+python LebwohlLasherThreaded.py <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> <STRIPS> <THREADS>
+"""
+
+import sys
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from numba import jit
+from LebwohlLasherNumba import initdat, plotdat, savedat, one_energy, kahan_add
+
+# Eager signatures for float64 and float32 lattices.
+SIG_SWEEP = ["int64(float64[:, ::1], int64, int64, int64, float64, int64)",
+             "int64(float32[:, ::1], int64, int64, int64, float64, int64)"]
+SIG_SUMS = ["UniTuple(float64, 3)(float64[:, ::1], int64, int64, int64)",
+            "UniTuple(float64, 3)(float32[:, ::1], int64, int64, int64)"]
+
+#=======================================================================
+def make_strips(nmax, nstrips):
+    """Split rows 0..nmax into nstrips (r0, r1) strips of near-equal size"""
+    nstrips = max(1, min(nstrips, nmax))
+    edges = np.linspace(0, nmax, nstrips+1).astype(np.int64)
+    return [(int(edges[k]), int(edges[k+1])) for k in range(nstrips)]
+
+#=======================================================================
+@jit(SIG_SWEEP, nopython=True, nogil=True)
+def sweep_strip(arr, r0, r1, colour, Ts, nmax):
+    """Metropolis attempt on every site of one colour in rows r0..r1"""
+    scale = 0.1 + Ts
+    accept = 0
+    for ix in range(r0, r1):
+        for iy in range((ix + colour)%2, nmax, 2):
+            ang = arr.dtype.type(np.random.normal(0, scale))
+
+            en0 = one_energy(arr, ix, iy, nmax)
+            arr[ix,iy] += ang
+            en1 = one_energy(arr, ix, iy, nmax)
+
+            if en1 <= en0:
+                accept += 1
+            else:
+                boltz = np.exp(-(en1 - en0) / Ts)
+                if boltz >= np.random.random():
+                    accept += 1
+                else:
+                    arr[ix,iy] -= ang
+    return accept
+
+#=======================================================================
+@jit(SIG_SUMS, nopython=True, nogil=True)
+def strip_sums(arr, r0, r1, nmax):
+    """Energy and sums of cos(2 theta), sin(2 theta) over rows r0..r1"""
+    en, enc = 0.0, 0.0
+    c2, c2c = 0.0, 0.0
+    s2, s2c = 0.0, 0.0
+    for ix in range(r0, r1):
+        for iy in range(nmax):
+            en, enc = kahan_add(en, enc, np.float64(one_energy(arr, ix, iy, nmax)))
+            th = 2.0*np.float64(arr[ix,iy])
+            c2, c2c = kahan_add(c2, c2c, np.cos(th))
+            s2, s2c = kahan_add(s2, s2c, np.sin(th))
+    return en, c2, s2
+
+#=======================================================================
+def MC_step(arr, Ts, nmax, pool, strips):
+    """One checkerboard MC step, each colour swept strip by strip in the pool"""
+    if nmax%2:
+        raise ValueError("checkerboard updates need an even lattice size, got {}".format(nmax))
+    accept = 0
+    for colour in (0, 1):
+        futures = [pool.submit(sweep_strip, arr, r0, r1, colour, Ts, nmax) for r0, r1 in strips]
+        accept += sum(f.result() for f in futures)
+    return accept/(nmax*nmax)
+
+#=======================================================================
+def observables(arr, nmax, pool, strips):
+    """Total energy and order parameter, 1/4 + 3/4|<exp(2i theta)>|"""
+    futures = [pool.submit(strip_sums, arr, r0, r1, nmax) for r0, r1 in strips]
+    energy, c2, s2 = np.sum([f.result() for f in futures], axis=0)
+    return energy, 0.25 + 0.75*np.hypot(c2, s2)/(nmax*nmax)
+
+#=======================================================================
+def main(program, nsteps, nmax, temp, pflag, nstrips, nthreads, dtype=np.float64):
+    """Main simulation function, nstrips strips swept by nthreads threads"""
+    lattice = initdat(nmax).astype(dtype)
+    plotdat(lattice,pflag,nmax)
+    strips = make_strips(nmax, nstrips)
+
+    energy = np.zeros(nsteps+1)
+    ratio = np.zeros(nsteps+1)
+    order = np.zeros(nsteps+1)
+
+    with ThreadPoolExecutor(max_workers=nthreads) as pool:
+        energy[0], order[0] = observables(lattice,nmax,pool,strips)
+        ratio[0] = 0.5
+
+        initial = time.time()
+        for it in range(1,nsteps+1):
+            ratio[it] = MC_step(lattice,temp,nmax,pool,strips)
+            energy[it], order[it] = observables(lattice,nmax,pool,strips)
+        final = time.time()
+    runtime = final-initial
+
+    print("{}: Size: {:d}, Steps: {:d}, T*: {:5.3f}: Order: {:5.3f}, Time: {:8.6f} s, Strips: {:d}, Threads: {:d}".format(
+        program, nmax, nsteps, temp, order[nsteps-1], runtime, len(strips), nthreads))
+
+    savedat(lattice,nsteps,temp,runtime,ratio,energy,order,nmax)
+    plotdat(lattice,pflag,nmax)
+
+#=======================================================================
+if __name__ == '__main__':
+    if int(len(sys.argv)) == 7:
+        PROGNAME = sys.argv[0]
+        ITERATIONS = int(sys.argv[1])
+        SIZE = int(sys.argv[2])
+        TEMPERATURE = float(sys.argv[3])
+        PLOTFLAG = int(sys.argv[4])
+        STRIPS = int(sys.argv[5])
+        THREADS = int(sys.argv[6])
+        main(PROGNAME, ITERATIONS, SIZE, TEMPERATURE, PLOTFLAG, STRIPS, THREADS)
+    else:
+        print("Usage: python {} <ITERATIONS> <SIZE> <TEMPERATURE> <PLOTFLAG> <STRIPS> <THREADS>".format(sys.argv[0]))
@@ -3,14 +3,24 @@ Performance evaluation script for comparing original and Numba-optimized
 Lebwohl-Lasher implementations
 """
 
+import sys
 import time
 import numpy as np
 import matplotlib.pyplot as plt
 import LebwohlLasher as ll_original
 import LebwohlLasherNumba as ll_numba  # Save the Numba version as this filename
+import LebwohlLasherBlocked as ll_blocked
+import LebwohlLasherThreaded as ll_threaded
+from concurrent.futures import ThreadPoolExecutor
+from ll_autocorr import ess_per_cpu
 
 def run_benchmark(implementation, nsteps, size, temp):
-    """Run a single benchmark"""
+    """
+    Run a single benchmark.  Besides wall time, returns the effective
+    independent samples of energy and order per CPU-second of MC_step,
+    measured over the second half of the run (the first half is
+    equilibration).
+    """
     lattice = implementation.initdat(size)
     energy = np.zeros(nsteps+1)
     ratio = np.zeros(nsteps+1)
@@ -24,14 +34,20 @@ def run_benchmark(implementation, nsteps, size, temp):
     
     # Time the main loop
     start = time.time()
+    cpu = 0.0
     for it in range(1, nsteps+1):
+        cpu_start = time.process_time()
         ratio[it] = implementation.MC_step(lattice, temp, size)
+        if it > nsteps//2:
+            cpu += time.process_time() - cpu_start
         energy[it] = implementation.all_energy(lattice, size)
         order[it] = (implementation.get_order(lattice, size) if implementation == ll_original 
                     else implementation.get_order_tensor(lattice, size))
     end = time.time()
-    
-    return end - start, energy[-1], order[-1]
+
+    half = nsteps//2 + 1
+    rate = ess_per_cpu((energy[half:], order[half:]), cpu)
+    return end - start, energy[-1], order[-1], rate
 
 def compare_performance():
     """Compare performance between original and Numba versions"""
@@ -44,6 +60,8 @@ def compare_performance():
     # Storage for results
     original_times = {size: [] for size in sizes}
     numba_times = {size: [] for size in sizes}
+    original_rates = {size: [] for size in sizes}
+    numba_rates = {size: [] for size in sizes}
     
     # Run benchmarks
     for size in sizes:
@@ -54,12 +72,14 @@ def compare_performance():
                 print(f"  Repeat {r+1}/{repeats}")
                 
                 # Run original version
-                time_orig, energy_orig, order_orig = run_benchmark(ll_original, nsteps, size, temp)
+                time_orig, energy_orig, order_orig, rate_orig = run_benchmark(ll_original, nsteps, size, temp)
                 original_times[size].append(time_orig)
+                original_rates[size].append(rate_orig)
                 
                 # Run Numba version
-                time_numba, energy_numba, order_numba = run_benchmark(ll_numba, nsteps, size, temp)
+                time_numba, energy_numba, order_numba, rate_numba = run_benchmark(ll_numba, nsteps, size, temp)
                 numba_times[size].append(time_numba)
+                numba_rates[size].append(rate_numba)
                 
                 # Check results are similar (within tolerance)
                 if abs(energy_orig - energy_numba)/abs(energy_orig) > 0.1:
@@ -71,6 +91,8 @@ def compare_performance():
     avg_original = [np.mean(original_times[size]) for size in sizes]
     avg_numba = [np.mean(numba_times[size]) for size in sizes]
     speedups = [orig/numba for orig, numba in zip(avg_original, avg_numba)]
+    rate_original = [np.mean(original_rates[size]) for size in sizes]
+    rate_numba = [np.mean(numba_rates[size]) for size in sizes]
     
     # Plot results
     plt.figure(figsize=(10, 5))
@@ -100,10 +122,177 @@ def compare_performance():
     # Print summary
     print("\nPerformance Summary:")
     print("==================")
-    print("Lattice Size | Original (s) | Numba (s) | Speedup")
-    print("------------+--------------+-----------+--------")
-    for size, orig, numba, speedup in zip(sizes, avg_original, avg_numba, speedups):
-        print(f"{size:^11d} | {orig:^12.3f} | {numba:^9.3f} | {speedup:^7.2f}")
+    print("Lattice Size | Original (s) | Numba (s) | Speedup | Original ESS/cpu-s | Numba ESS/cpu-s")
+    print("------------+--------------+-----------+---------+--------------------+----------------")
+    for size, orig, numba, speedup, r_orig, r_numba in zip(sizes, avg_original, avg_numba, speedups,
+                                                         rate_original, rate_numba):
+        print(f"{size:^11d} | {orig:^12.3f} | {numba:^9.3f} | {speedup:^7.2f} | {r_orig:^18.2f} | {r_numba:^15.2f}")
+
+def compare_blocked(sizes=(256, 512, 1024, 2048, 4096), block=32, nsteps=5):
+    """Compare plain and cache-blocked Numba MC steps as the lattice outgrows cache"""
+    plain_times = []
+    blocked_times = []
+    for size in sizes:
+        print(f"\nTesting lattice size {size}x{size}, block {block}")
+        lattice = ll_numba.initdat(size)
+        tiles = ll_blocked.to_blocked(lattice, block)
+        # Compile outside the timed region
+        ll_numba.MC_step(lattice.copy(), 0.5, size)
+        ll_blocked.MC_step(tiles.copy(), 0.5)
+
+        start = time.perf_counter()
+        for _ in range(nsteps):
+            ll_numba.MC_step(lattice, 0.5, size)
+        plain_times.append((time.perf_counter() - start)/nsteps)
+
+        start = time.perf_counter()
+        for _ in range(nsteps):
+            ll_blocked.MC_step(tiles, 0.5)
+        blocked_times.append((time.perf_counter() - start)/nsteps)
+    speedups = [p/b for p, b in zip(plain_times, blocked_times)]
+
+    plt.figure(figsize=(6, 4))
+    plt.plot(sizes, speedups, 'D-')
+    plt.xscale('log', base=2)
+    plt.xlabel('Lattice Size')
+    plt.ylabel('Speedup Factor')
+    plt.title(f'Blocked ({block}x{block}) vs Plain Numba MC step')
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig('blocked_speedup.png')
+
+    print("\nBlocked Layout Summary:")
+    print("==================")
+    print("Lattice Size | Plain (s/step) | Blocked (s/step) | Speedup")
+    print("------------+----------------+------------------+--------")
+    for size, plain, blocked, speedup in zip(sizes, plain_times, blocked_times, speedups):
+        print(f"{size:^11d} | {plain:^14.4f} | {blocked:^16.4f} | {speedup:^7.2f}")
+
+def compare_threaded(size=1024, strips=(1, 2, 4, 8, 16, 32), threads=(1, 2, 4, 8), nsteps=5):
+    """Time the thread-pool strip engine over a grid of strip counts and pool sizes"""
+    lattice = ll_numba.initdat(size)
+    times = np.zeros((len(strips), len(threads)))
+    for a, nstrips in enumerate(strips):
+        for b, nthreads in enumerate(threads):
+            parts = ll_threaded.make_strips(size, nstrips)
+            with ThreadPoolExecutor(max_workers=nthreads) as pool:
+                ll_threaded.MC_step(lattice, 0.5, size, pool, parts)
+                start = time.perf_counter()
+                for _ in range(nsteps):
+                    ll_threaded.MC_step(lattice, 0.5, size, pool, parts)
+                times[a, b] = (time.perf_counter() - start)/nsteps
+
+    print(f"\nThread-pool strips, {size}x{size} (s/step):")
+    print("Strips \\ Threads | " + " | ".join(f"{t:^8d}" for t in threads))
+    for nstrips, row in zip(strips, times):
+        print(f"{nstrips:^16d} | " + " | ".join(f"{t:^8.4f}" for t in row))
+    a, b = np.unravel_index(np.argmin(times), times.shape)
+    print(f"Fastest: {strips[a]} strips on {threads[b]} threads")
+    return times
+
+def compare_overrelax(size=64, temp=0.3, mixes=(0, 1, 2, 4), nsteps=400):
+    """Effective samples per CPU-second for 1 Metropolis : k overrelaxation sweeps"""
+    rates = []
+    for nover in mixes:
+        np.random.seed(0)
+        lattice = ll_numba.initdat(size)
+        ll_numba.overrelax_step(lattice.copy(), size)
+        energy = np.zeros(nsteps+1)
+        order = np.zeros(nsteps+1)
+        cpu = 0.0
+        for it in range(1, nsteps+1):
+            cpu_start = time.process_time()
+            ll_numba.MC_step(lattice, temp, size)
+            for _ in range(nover):
+                ll_numba.overrelax_step(lattice, size)
+            if it > nsteps//2:
+                cpu += time.process_time() - cpu_start
+            energy[it] = ll_numba.all_energy(lattice, size)
+            order[it] = ll_numba.get_order_tensor(lattice, size)
+        half = nsteps//2 + 1
+        rates.append(ess_per_cpu((energy[half:], order[half:]), cpu))
+
+    print(f"\nOverrelaxation mixes, {size}x{size}, T* = {temp}:")
+    print("Metropolis:Overrelax | ESS/cpu-s | Gain")
+    print("---------------------+-----------+-----")
+    for nover, rate in zip(mixes, rates):
+        print(f"{'1:' + str(nover):^20s} | {rate:^9.2f} | {rate/rates[0]:^4.2f}")
+    return rates
+
+def compare_heatbath(size=64, temps=(0.3, 0.6, 1.0), nsteps=400):
+    """Effective samples per CPU-second of Metropolis and heat-bath sweeps"""
+    steps = {'Metropolis': ll_numba.MC_step, 'Heat-bath': ll_numba.heatbath_step}
+    rates = {name: [] for name in steps}
+    for temp in temps:
+        for name, step in steps.items():
+            np.random.seed(0)
+            ll_numba.seed(0)
+            lattice = ll_numba.initdat(size)
+            step(lattice.copy(), temp, size)
+            energy = np.zeros(nsteps+1)
+            order = np.zeros(nsteps+1)
+            cpu = 0.0
+            for it in range(1, nsteps+1):
+                cpu_start = time.process_time()
+                step(lattice, temp, size)
+                if it > nsteps//2:
+                    cpu += time.process_time() - cpu_start
+                energy[it] = ll_numba.all_energy(lattice, size)
+                order[it] = ll_numba.get_order_tensor(lattice, size)
+            half = nsteps//2 + 1
+            rates[name].append(ess_per_cpu((energy[half:], order[half:]), cpu))
+
+    print(f"\nHeat-bath vs Metropolis, {size}x{size} (ESS/cpu-s):")
+    print("   T*    | Metropolis | Heat-bath | Gain")
+    print("---------+------------+-----------+-----")
+    for temp, metro, heat in zip(temps, rates['Metropolis'], rates['Heat-bath']):
+        print(f"{temp:^9.2f}| {metro:^10.2f} | {heat:^9.2f} | {heat/metro:^4.2f}")
+    return rates
+
+def compare_multihit(size=64, temp=0.5, hits=(1, 2, 4, 8), nsteps=400):
+    """Time, accepted moves per site and ESS/cpu-s of nhit proposals per visited cell"""
+    times = []
+    moves = []
+    rates = []
+    for nhit in hits:
+        ll_numba.seed(0)
+        np.random.seed(0)
+        lattice = ll_numba.initdat(size)
+        ll_numba.MC_step_multihit(lattice.copy(), temp, size, nhit)
+        energy = np.zeros(nsteps+1)
+        order = np.zeros(nsteps+1)
+        accepted = 0.0
+        cpu = 0.0
+        for it in range(1, nsteps+1):
+            cpu_start = time.process_time()
+            ratio = ll_numba.MC_step_multihit(lattice, temp, size, nhit)
+            if it > nsteps//2:
+                cpu += time.process_time() - cpu_start
+                accepted += ratio*nhit
+            energy[it] = ll_numba.all_energy(lattice, size)
+            order[it] = ll_numba.get_order_tensor(lattice, size)
+        half = nsteps//2 + 1
+        times.append(cpu/(nsteps - nsteps//2))
+        moves.append(accepted/(nsteps - nsteps//2))
+        rates.append(ess_per_cpu((energy[half:], order[half:]), cpu))
+
+    print(f"\nMulti-hit Metropolis, {size}x{size}, T* = {temp}:")
+    print("Hits | s/step  | Accepted/site | ESS/cpu-s | Gain")
+    print("-----+---------+---------------+-----------+-----")
+    for nhit, t, m, rate in zip(hits, times, moves, rates):
+        print(f"{nhit:^4d} | {t:^7.4f} | {m:^13.2f} | {rate:^9.2f} | {rate/rates[0]:^4.2f}")
+    return rates
 
 if __name__ == '__main__':
-    compare_performance()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == 'blocked':
+        compare_blocked()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'threaded':
+        compare_threaded()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'overrelax':
+        compare_overrelax()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'heatbath':
+        compare_heatbath()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'multihit':
+        compare_multihit()
+    else:
+        compare_performance()
\ No newline at end of file
@@ -0,0 +1,155 @@
+import pytest
+import numpy as np
+import LebwohlLasherNumba as ll_numba
+import LebwohlLasherQuantized as ll_quant
+
+@pytest.mark.parametrize("mode, bound", [("float32", 2.3e-6), ("uint16", 2.9e-4)])
+def test_quantized_energy_bound(mode, bound):
+    nmax = 16
+    arr = np.random.random_sample((nmax, nmax)) * 2.0 * np.pi
+    stored = ll_quant.encode(arr, mode)
+    step = ll_quant.MODES[mode][1]
+    assert np.all((ll_quant.decode(stored, mode) >= 0) & (ll_quant.decode(stored, mode) < np.pi))
+    # Documented bound on the energy per site after storage
+    diff = abs(ll_quant.all_energy(stored, nmax, step) - ll_numba.all_energy(arr, nmax)) / nmax**2
+    assert diff <= bound
+    assert ll_quant.get_order(stored, nmax, step) == pytest.approx(ll_numba.get_order_tensor(arr, nmax), abs=1e-4)
+
+@pytest.mark.parametrize("mode", ["float32", "uint16"])
+def test_quantized_MC_step(mode):
+    nmax = 8
+    lattice = ll_quant.initdat(nmax, mode)
+    ratio = ll_quant.MC_step(lattice, 0.5, nmax, ll_quant.MODES[mode][1], mode == "uint16")
+    assert lattice.dtype == ll_quant.MODES[mode][0]
+    assert 0.0 <= ratio <= 1.0
+    assert np.all(ll_quant.decode(lattice, mode) < np.pi)
+
+def test_float32_kernels_match_float64():
+    nmax = 32
+    arr = ll_numba.initdat(nmax)
+    arr32 = arr.astype(np.float32)
+    assert ll_numba.one_energy(arr32, 0, 0, nmax) == pytest.approx(ll_numba.one_energy(arr, 0, 0, nmax), rel=1e-5)
+    assert ll_numba.all_energy(arr32, nmax) == pytest.approx(ll_numba.all_energy(arr, nmax), rel=1e-6)
+    assert ll_numba.get_order_tensor(arr32, nmax) == pytest.approx(ll_numba.get_order_tensor(arr, nmax), abs=1e-6)
+    assert 0.0 <= ll_numba.MC_step(arr32, 0.5, nmax) <= 1.0
+    assert arr32.dtype == np.float32
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_kernels_accept_views(dtype):
+    nmax = 8
+    lattice = ll_numba.initdat(2*nmax).astype(dtype)
+    view = lattice[::2, 1::2].T  # neither C- nor F-contiguous
+    copy = np.ascontiguousarray(view)
+    assert ll_numba.all_energy(view, nmax) == pytest.approx(ll_numba.all_energy(copy, nmax), rel=1e-5)
+    assert ll_numba.get_order_tensor(view, nmax) == pytest.approx(ll_numba.get_order_tensor(copy, nmax), rel=1e-5)
+    assert ll_numba.one_energy(view, 1, 2, nmax) == pytest.approx(ll_numba.one_energy(copy, 1, 2, nmax))
+    # Steps update the view in place, i.e. the parent lattice
+    before = lattice.copy()
+    assert 0.0 <= ll_numba.MC_step(lattice.T, 0.5, 2*nmax) <= 1.0
+    assert ll_numba.heatbath_step(view, 0.5, nmax) == 1.0
+    ll_numba.overrelax_step(view, nmax)
+    assert 0.0 <= ll_numba.MC_step_multihit(view, 0.5, nmax, 2) <= 1.0
+    assert not np.array_equal(lattice, before)
+
+def test_validate_precision():
+    report = ll_numba.validate(5, 16, 0.5, 1)
+    assert report['energy0_rel'] < 1e-6
+    assert report['order0_abs'] < 1e-6
+
+def test_blocked_layout_roundtrip():
+    import LebwohlLasherBlocked as ll_blocked
+    nmax, b = 12, 4
+    arr = ll_numba.initdat(nmax)
+    tiles = ll_blocked.to_blocked(arr, b)
+    assert tiles.shape == (3, 3, 4, 4) and tiles.flags['C_CONTIGUOUS']
+    assert np.array_equal(ll_blocked.from_blocked(tiles), arr)
+    assert ll_blocked.one_energy(tiles, 0, 0, 0, 0) == pytest.approx(ll_numba.one_energy(arr, 0, 0, nmax))
+    assert ll_blocked.all_energy(tiles) == pytest.approx(ll_numba.all_energy(arr, nmax))
+    assert 0.0 <= ll_blocked.MC_step(tiles, 0.5) <= 1.0
+    with pytest.raises(ValueError):
+        ll_blocked.to_blocked(arr, 5)
+
+def test_integrated_time():
+    from ll_autocorr import integrated_time, effective_samples, ess_per_cpu
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=20000)
+    assert integrated_time(x) == pytest.approx(0.5, abs=0.05)
+    # AR(1) with phi = 0.8 has tau_int = (1+phi)/(2(1-phi)) = 4.5
+    y = np.zeros_like(x)
+    for i in range(1, len(x)):
+        y[i] = 0.8*y[i-1] + x[i]
+    assert integrated_time(y) == pytest.approx(4.5, rel=0.15)
+    assert effective_samples(np.ones(10)) == 10
+    assert ess_per_cpu((x, y), 2.0) == pytest.approx(effective_samples(y)/2.0)
+
+def test_threaded_strips():
+    from concurrent.futures import ThreadPoolExecutor
+    import LebwohlLasherThreaded as ll_threaded
+    nmax = 12
+    arr = ll_numba.initdat(nmax)
+    strips = ll_threaded.make_strips(nmax, 5)
+    assert strips[0][0] == 0 and strips[-1][1] == nmax
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        energy, order = ll_threaded.observables(arr, nmax, pool, strips)
+        assert energy == pytest.approx(ll_numba.all_energy(arr, nmax))
+        assert order == pytest.approx(ll_numba.get_order_tensor(arr, nmax))
+        assert 0.0 <= ll_threaded.MC_step(arr, 0.5, nmax, pool, strips) <= 1.0
+        with pytest.raises(ValueError):
+            ll_threaded.MC_step(ll_numba.initdat(5), 0.5, 5, pool, strips)
+
+@pytest.mark.parametrize("dtype, rel", [(np.float64, 1e-10), (np.float32, 1e-4)])
+def test_overrelax_step_keeps_energy(dtype, rel):
+    nmax = 10
+    lattice = ll_numba.initdat(nmax).astype(dtype)
+    before = ll_numba.all_energy(lattice, nmax)
+    ll_numba.overrelax_step(lattice, nmax)
+    assert ll_numba.all_energy(lattice, nmax) == pytest.approx(before, rel=rel)
+
+def test_heatbath_step():
+    nmax = 10
+    ll_numba.seed(2)
+    lattice = ll_numba.initdat(nmax)
+    start = lattice.copy()
+    assert ll_numba.heatbath_step(lattice, 0.5, nmax) == 1.0
+    assert not np.allclose(lattice, start)
+    # Drawn as half a von Mises angle
+    assert np.all(np.abs(lattice) <= np.pi)
+
+def test_multihit_step():
+    nmax = 10
+    start = ll_numba.initdat(nmax)
+    # One hit draws the same random numbers as MC_step
+    plain, single = start.copy(), start.copy()
+    ll_numba.seed(4)
+    ratio = ll_numba.MC_step(plain, 0.5, nmax)
+    ll_numba.seed(4)
+    assert ll_numba.MC_step_multihit(single, 0.5, nmax, 1) == ratio
+    assert np.allclose(single, plain)
+    ratio = ll_numba.MC_step_multihit(start.astype(np.float32), 0.5, nmax, 4)
+    assert 0.0 < ratio <= 1.0
+
+def test_wanglandau_windows():
+    import ll_wanglandau as wl
+    windows = wl.make_windows(100, 3)
+    assert windows[0][0] == 0 and windows[-1][1] == 100
+    assert all(b0 < prev1 for (b0, _), (_, prev1) in zip(windows[1:], windows))
+    # Pieces of a known ln g with arbitrary offsets join back up
+    true = np.log1p(np.arange(100.0))**2
+    pieces = [true[b0:b1] + 7.0*k for k, (b0, b1) in enumerate(windows)]
+    assert np.allclose(wl.merge_windows(windows, pieces), true - true.min())
+    # ln g grows with the energy in the ordered phase, so <E> grows with T
+    lng, sweeps = wl.run_window(4, -3.0, -2.0, 0.1, lnf_final=0.05, check=20, s=1)
+    assert lng.shape == (10,) and lng.min() == 0.0 and lng[-1] > lng[0]
+    centres = -3.0 + (np.arange(10) + 0.5)*0.1
+    energy, cv = wl.thermodynamics(centres, lng, 4, [0.3, 1.0])
+    assert energy[0] < energy[1] and np.all(cv > 0.0)
+    # Cv is the slope of <H/N> = <E/N>/2
+    dT = 1e-4
+    energy, cv = wl.thermodynamics(centres, lng, 4, [0.6-dT, 0.6, 0.6+dT])
+    assert cv[1] == pytest.approx(0.5*(energy[2] - energy[0])/(2*dT)/16, rel=1e-4)
+
+def test_wanglandau_pool():
+    import ll_wanglandau as wl
+    centres, lng, runtime = wl.run(4, -3.0, -2.0, 2, de=0.1, processes=2, lnf_final=0.1, check=20)
+    assert centres.shape == lng.shape == (10,)
+    assert np.all(np.isfinite(lng)) and lng.min() == 0.0
@@ -0,0 +1,237 @@
+"""
+Wang-Landau density of states for the Lebwohl-Lasher model.
+
+The total energy E = all_energy (every bond counted twice, H = E/2) is
+binned in steps of de per site between emin and emax.  A walker makes
+the usual single-site moves, a Gaussian change of one angle, with the
+energy change from one_energy of that cell alone, and accepts a move
+from bin b to b' with probability min(1, g(b)/g(b')).  After every
+move ln g of the current bin grows by ln f and its visit count by one.
+When the visit histogram is flat (every bin at least flat times the
+mean) ln f is halved and the histogram reset, until ln f < lnf_final.
+The result is ln g(E) up to a constant, and from it
+
+    <A>(T) = sum_E A(E) g(E) exp(-E/(2T)) / sum_E g(E) exp(-E/(2T))
+
+at any temperature without more simulation.
+
+The energy range is split into overlapping windows, each sampled by its
+own walker that is confined to the window (moves leaving it are
+rejected).  Walkers run in a process pool, one window per task, and the
+pieces of ln g are joined by matching them on the overlaps.  The range
+should lie inside the energies the lattice can reach: a bin that is
+never visited keeps the histogram from becoming flat.
+
+Run at the command line by typing:
+
+python ll_wanglandau.py <SIZE> <EMIN> <EMAX> <WINDOWS> [<PROCESSES>]
+
+with EMIN, EMAX per site (e.g. -3.7 -1.0).  ln g(E) is written to
+LL-WL-Output-<date>.txt.
+"""
+
+import sys
+import time
+import datetime
+import multiprocessing
+import numpy as np
+from numba import jit
+from LebwohlLasherNumba import initdat, one_energy, all_energy, seed
+
+# all_energy counts every bond twice: H = BOND*E.
+BOND = 0.5
+
+#=======================================================================
+@jit(nopython=True)
+def enter_window(arr, E, elo, ehi, nmax, scale, maxsweeps):
+    """Drive the lattice into elo <= E < ehi by moves that never go further away, returns E"""
+    for sweep in range(maxsweeps):
+        if elo <= E < ehi:
+            return E
+        for k in range(nmax*nmax):
+            ix = np.random.randint(0, nmax)
+            iy = np.random.randint(0, nmax)
+            ang = np.random.normal(0, scale)
+            en0 = one_energy(arr, ix, iy, nmax)
+            arr[ix,iy] += ang
+            dE = 2.0*(one_energy(arr, ix, iy, nmax) - en0)
+            gap0 = max(elo - E, E - ehi, 0.0)
+            gap1 = max(elo - E - dE, E + dE - ehi, 0.0)
+            if gap1 <= gap0:
+                E += dE
+            else:
+                arr[ix,iy] -= ang
+    return E
+
+#=======================================================================
+@jit(nopython=True)
+def wl_sweeps(arr, E, lng, hist, lnf, elo, de, nmax, scale, nsweeps):
+    """nsweeps Wang-Landau sweeps of nmax*nmax moves inside the bins of lng, returns E"""
+    nsite = nmax*nmax
+    nbins = lng.shape[0]
+    b = min(int((E/nsite - elo)/de), nbins-1)
+    for sweep in range(nsweeps):
+        for k in range(nsite):
+            ix = np.random.randint(0, nmax)
+            iy = np.random.randint(0, nmax)
+            ang = np.random.normal(0, scale)
+            en0 = one_energy(arr, ix, iy, nmax)
+            arr[ix,iy] += ang
+            dE = 2.0*(one_energy(arr, ix, iy, nmax) - en0)
+            b1 = int(np.floor(((E + dE)/nsite - elo)/de))
+            if 0 <= b1 < nbins and (lng[b] >= lng[b1] or np.exp(lng[b] - lng[b1]) >= np.random.random()):
+                E += dE
+                b = b1
+            else:
+                arr[ix,iy] -= ang
+            lng[b] += lnf
+            hist[b] += 1
+    return E
+
+#=======================================================================
+def make_windows(nbins, nwin, overlap=0.5):
+    """
+    Split nbins energy bins into nwin windows of equal width, each
+    sharing a fraction overlap of its width with the next one.
+    Returns a list of (first bin, end bin).
+    """
+    width = nbins/(nwin - (nwin - 1)*overlap)
+    step = width*(1.0 - overlap)
+    return [(int(round(w*step)), min(nbins, int(round(w*step + width)))) for w in range(nwin)]
+
+#=======================================================================
+def run_window(nmax, elo, ehi, de, lnf_final=1e-6, flat=0.8, check=100, scale=0.5, s=None, maxsweeps=100000):
+    """
+    Wang-Landau walker on one window of per-site energies [elo, ehi).
+    Returns ln g of its bins, min 0, and the number of sweeps made.
+    """
+    if s is not None:
+        np.random.seed(s)
+        seed(s)
+    nbins = int(round((ehi - elo)/de))
+    arr = initdat(nmax)
+    E = enter_window(arr, all_energy(arr, nmax), elo*nmax*nmax, ehi*nmax*nmax, nmax, scale, maxsweeps)
+    if not elo*nmax*nmax <= E < ehi*nmax*nmax:
+        raise RuntimeError("walker could not reach the window [{}, {}) per site".format(elo, ehi))
+    lng = np.zeros(nbins)
+    hist = np.zeros(nbins, dtype=np.int64)
+    lnf = 1.0
+    sweeps = 0
+    while lnf >= lnf_final:
+        E = wl_sweeps(arr, E, lng, hist, lnf, elo, de, nmax, scale, check)
+        # Resync the running energy, it drifts by rounding
+        E = all_energy(arr, nmax)
+        sweeps += check
+        if hist.min() >= flat*hist.mean():
+            lnf /= 2.0
+            hist[:] = 0
+        elif sweeps >= maxsweeps:
+            raise RuntimeError("histogram of [{}, {}) not flat after {} sweeps".format(elo, ehi, sweeps))
+    return lng - lng.min(), sweeps
+
+#=======================================================================
+def _window_task(args):
+    """Pool entry point: run_window on one packed set of arguments"""
+    nmax, elo, ehi, de, lnf_final, flat, check, scale, s = args
+    return run_window(nmax, elo, ehi, de, lnf_final, flat, check, scale, s)
+
+#=======================================================================
+def merge_windows(windows, pieces):
+    """
+    Join the ln g of overlapping windows.  Each piece is shifted to
+    agree on average with the ones before it over the shared bins, and
+    the joined curve switches to it at the middle of the overlap.
+    """
+    nbins = windows[-1][1]
+    lng = np.full(nbins, np.nan)
+    b0, b1 = windows[0]
+    lng[b0:b1] = pieces[0]
+    end = b1
+    for (b0, b1), piece in zip(windows[1:], pieces[1:]):
+        shift = np.mean(lng[b0:end] - piece[:end-b0])
+        cut = (b0 + end)//2
+        lng[cut:b1] = piece[cut-b0:] + shift
+        end = b1
+    return lng - np.nanmin(lng)
+
+#=======================================================================
+def run(nmax, emin, emax, nwin, de=0.01, processes=None, lnf_final=1e-6, flat=0.8, check=100,
+        scale=0.5, overlap=0.5, s=0):
+    """
+    Wang-Landau over [emin, emax) per site with nwin windowed walkers
+    in a pool of processes.  Returns the per-site bin centres, ln g and
+    the runtime.
+    """
+    nbins = int(round((emax - emin)/de))
+    windows = make_windows(nbins, nwin, overlap)
+    seeds = np.random.SeedSequence(s).generate_state(nwin)
+    tasks = [(nmax, emin + b0*de, emin + b1*de, de, lnf_final, flat, check, scale, int(sd))
+             for (b0, b1), sd in zip(windows, seeds)]
+    initial = time.time()
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes or min(nwin, ctx.cpu_count())) as pool:
+        results = pool.map(_window_task, tasks)
+    runtime = time.time() - initial
+    lng = merge_windows(windows, [lng for lng, sweeps in results])
+    centres = emin + (np.arange(nbins) + 0.5)*de
+    return centres, lng, runtime
+
+#=======================================================================
+def thermodynamics(centres, lng, nmax, temps):
+    """
+    <E> and the heat capacity per site of H = E/2, (<H^2>-<H>^2)/(N T^2)
+    as in ll_stats, at each temperature from ln g over per-site bin centres.
+    """
+    N = nmax*nmax
+    temps = np.asarray(temps, dtype=float)
+    E = centres*N
+    lw = lng[None,:] - BOND*E[None,:]/temps[:,None]
+    w = np.exp(lw - lw.max(axis=1, keepdims=True))
+    w /= w.sum(axis=1, keepdims=True)
+    e = w @ E
+    e2 = w @ (E*E)
+    return e, BOND*BOND*(e2 - e*e)/(N*temps*temps)
+
+#=======================================================================
+def savedat(centres, lng, nmax, nwin, runtime):
+    """Save ln g(E) to file"""
+    current_datetime = datetime.datetime.now().strftime("%a-%d-%b-%Y-at-%I-%M-%S%p")
+    filename = "LL-WL-Output-{:s}.txt".format(current_datetime)
+    with open(filename,"w") as FileOut:
+        print("#=====================================================",file=FileOut)
+        print("# File created:        {:s}".format(current_datetime),file=FileOut)
+        print("# Size of lattice:     {:d}x{:d}".format(nmax,nmax),file=FileOut)
+        print("# Windows:             {:d}".format(nwin),file=FileOut)
+        print("# Run time (s):        {:8.6f}".format(runtime),file=FileOut)
+        print("#=====================================================",file=FileOut)
+        print("# E/N:       ln g(E):",file=FileOut)
+        print("#=====================================================",file=FileOut)
+        for e, g in zip(centres, lng):
+            print("  {:9.5f}  {:14.6f}".format(e, g),file=FileOut)
+    return filename
+
+#=======================================================================
+def main(program, nmax, emin, emax, nwin, processes=None):
+    """Main Wang-Landau run: ln g to file and <E>, Cv on a few temperatures"""
+    centres, lng, runtime = run(nmax, emin, emax, nwin, processes=processes)
+    savedat(centres, lng, nmax, nwin, runtime)
+    print("{}: Size: {:d}, E/N: [{:g}, {:g}), Windows: {:d}, Time: {:8.6f} s".format(
+        program, nmax, emin, emax, nwin, runtime))
+    temps = np.linspace(0.3, 1.5, 13)
+    energy, cv = thermodynamics(centres, lng, nmax, temps)
+    print("#   T*       E/N        Cv")
+    for T, e, c in zip(temps, energy, cv):
+        print("{:8.4f} {:9.5f} {:9.5f}".format(T, e/(nmax*nmax), c))
+
+#=======================================================================
+if __name__ == '__main__':
+    if int(len(sys.argv)) in (5, 6):
+        PROGNAME = sys.argv[0]
+        SIZE = int(sys.argv[1])
+        EMIN = float(sys.argv[2])
+        EMAX = float(sys.argv[3])
+        WINDOWS = int(sys.argv[4])
+        PROCESSES = int(sys.argv[5]) if len(sys.argv) == 6 else None
+        main(PROGNAME, SIZE, EMIN, EMAX, WINDOWS, PROCESSES)
+    else:
+        print("Usage: python {} <SIZE> <EMIN> <EMAX> <WINDOWS> [<PROCESSES>]".format(sys.argv[0]))